@@ -0,0 +1,228 @@
+"""
+Live device tracking for the Chat Analyzer.
+One long-lived `adb track-devices` process reports every change of the device
+list; for auto-ingest, one long-lived `adb shell` loop per online device reports
+when the export file appears, so nothing is re-spawned while waiting.
+Callbacks run on watcher threads: GUI callers must hop back to their own thread.
+stop() never waits for them, so it is safe to call from a GUI thread.
+"""
+
+import os
+import shlex
+import subprocess
+import threading
+
+REMOTE_EXPORT = "/sdcard/Download/aihelper_chat_export.json"
+POLL_SECONDS = 2
+RESTART_DELAY = 2.0  # wait before reconnecting when the adb server goes away
+
+# Prints "export <mtime>:<size>" once the file has been unchanged for one poll,
+# and "export " once it is gone; runs on the watch until the process is killed.
+EXPORT_WATCH_SCRIPT = (
+    'f={path}; p=; e=; '
+    'while :; do s=$(stat -c %Y:%s "$f" 2>/dev/null); '
+    'if [ "$s" = "$p" ] && [ "$s" != "$e" ]; then echo "export $s"; e=$s; fi; '
+    'p=$s; sleep {interval}; done'
+)
+
+
+def adb_command():
+    """adb invocation prefix; AIHELPER_ADB overrides it (e.g. a fake adb in tests)."""
+    return shlex.split(os.environ.get("AIHELPER_ADB", "adb"))
+
+
+def parse_device_list(payload):
+    """[(serial, state), ...] from `adb devices`-style lines."""
+    devices = []
+    for line in payload.splitlines():
+        parts = line.split("\t")
+        if len(parts) >= 2 and parts[0]:
+            devices.append((parts[0], parts[1].strip()))
+    return devices
+
+
+def read_track_stream(stream):
+    """
+    Yield one device list per update of a track-devices stream (binary file).
+    Each update is a 4-digit hex length followed by that many bytes of
+    "serial<TAB>state" lines; an empty payload means no devices.
+    """
+    while True:
+        header = stream.read(4)
+        if len(header) < 4:
+            return
+        try:
+            length = int(header, 16)
+        except ValueError:
+            return
+        payload = stream.read(length) if length else b""
+        if len(payload) < length:
+            return
+        yield parse_device_list(payload.decode("utf-8", "replace"))
+
+
+def retrieve_export(device, local_path, remote_path=REMOTE_EXPORT, adb=None):
+    """Pull the export from a device and delete it there; False if there was none."""
+    adb = adb or adb_command()
+    pull = subprocess.run(adb + ["-s", device, "pull", remote_path, local_path],
+                          capture_output=True, text=True, timeout=30)
+    if pull.returncode != 0:
+        return False
+    subprocess.run(adb + ["-s", device, "shell", "rm", remote_path],
+                   capture_output=True, timeout=10)
+    return True
+
+
+class DeviceWatcher:
+    """
+    Keeps `adb track-devices` open and calls on_devices(serials) with the online
+    devices whenever the list changes. With auto_ingest, on_export(serial) is
+    called each time a finished export file shows up on an online device.
+    """
+
+    def __init__(self, on_devices, on_export=None, on_error=None, adb=None,
+                 remote_path=REMOTE_EXPORT, poll_seconds=POLL_SECONDS,
+                 restart_delay=RESTART_DELAY, auto_ingest=False):
+        self.on_devices = on_devices
+        self.on_export = on_export
+        self.on_error = on_error
+        self.adb = list(adb) if adb else adb_command()
+        self.remote_path = remote_path
+        self.poll_seconds = poll_seconds
+        self.restart_delay = restart_delay
+        self.auto_ingest = auto_ingest
+
+        self.devices = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()  # of the current start(); each start gets a new one
+        self._stop.set()
+        self._track_proc = None
+        self._export_procs = {}  # serial -> adb shell process
+        self._thread = None
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Start tracking; a thread left over from a stop() that has not exited yet is ignored."""
+        with self._lock:
+            if not self._stop.is_set():
+                return
+            stop = self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._track, args=(stop,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop tracking without waiting: the old threads exit on their own once their processes are killed."""
+        with self._lock:
+            self._stop.set()
+            procs = [self._track_proc] + list(self._export_procs.values())
+            self._track_proc = None
+            self._export_procs.clear()
+            # Forget the list so a restarted stream reports it (and respawns export watchers).
+            self.devices = []
+        for proc in procs:
+            _kill(proc)
+
+    def running(self):
+        return not self._stop.is_set() and self._thread is not None and self._thread.is_alive()
+
+    def set_auto_ingest(self, enabled):
+        with self._lock:
+            self.auto_ingest = enabled
+            stop = self._stop
+        self._sync_export_watchers(stop)
+
+    # ---- device stream ----
+
+    def _track(self, stop):
+        reported = False  # the first frame after start() is always reported, even if empty
+        while not stop.is_set():
+            try:
+                proc = subprocess.Popen(self.adb + ["track-devices"], stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+            except OSError as e:
+                self._error("ADB not found" if isinstance(e, FileNotFoundError) else str(e))
+                return
+            with self._lock:
+                if stop.is_set():
+                    _kill(proc)
+                    return
+                self._track_proc = proc
+
+            for devices in read_track_stream(proc.stdout):
+                online = [serial for serial, state in devices if state == "device"]
+                with self._lock:
+                    # A stopped stream may still deliver a frame: it belongs to no one now.
+                    if stop.is_set():
+                        break
+                    changed = online != self.devices or not reported
+                    self.devices = online
+                if changed:
+                    reported = True
+                    self.on_devices(list(online))
+                    self._sync_export_watchers(stop)
+            _kill(proc)
+
+            # Stream ended (adb server killed/restarted): report no devices and reconnect.
+            with self._lock:
+                if stop.is_set():
+                    return
+                changed = bool(self.devices)
+                self.devices = []
+            if changed:
+                self.on_devices([])
+                self._sync_export_watchers(stop)
+            stop.wait(self.restart_delay)
+
+    # ---- export watchers ----
+
+    def _sync_export_watchers(self, stop):
+        with self._lock:
+            if stop.is_set():
+                return
+            wanted = set(self.devices) if self.auto_ingest and self.on_export else set()
+            gone = [s for s in self._export_procs if s not in wanted]
+            stale = [self._export_procs.pop(s) for s in gone]
+            new = [s for s in wanted if s not in self._export_procs]
+            for serial in new:
+                self._export_procs[serial] = None  # reserved until the process is up
+        for proc in stale:
+            _kill(proc)
+        for serial in new:
+            threading.Thread(target=self._watch_export, args=(serial, stop), daemon=True).start()
+
+    def _watch_export(self, serial, stop):
+        script = EXPORT_WATCH_SCRIPT.format(path=shlex.quote(self.remote_path), interval=self.poll_seconds)
+        try:
+            proc = subprocess.Popen(self.adb + ["-s", serial, "shell", script], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+        except OSError as e:
+            self._error(str(e))
+            return
+        with self._lock:
+            # Device left, auto-ingest was turned off or the watcher was stopped meanwhile
+            # (a restarted watcher may have reserved the same serial for its own thread).
+            if stop.is_set() or self._export_procs.get(serial, 0) is not None:
+                _kill(proc)
+                return
+            self._export_procs[serial] = proc
+
+        for line in proc.stdout:
+            kind, _, stamp = line.decode("utf-8", "replace").strip().partition(" ")
+            if kind == "export" and stamp and not stop.is_set():
+                self.on_export(serial)
+        _kill(proc)
+        with self._lock:
+            if self._export_procs.get(serial) is proc:
+                del self._export_procs[serial]
+
+    def _error(self, message):
+        if self.on_error:
+            self.on_error(message)
+
+
+def _kill(proc):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.kill()
+    proc.wait()
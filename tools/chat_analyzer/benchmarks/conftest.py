@@ -0,0 +1,152 @@
+"""
+Shared fixtures for the chat_analyzer scaling benchmarks.
+Exports are generated once per size with synth_export and cached for the session;
+ChatAnalyzer runs against recording stand-ins for its Tk widgets, so no display
+is needed.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+CHAT_ANALYZER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CHAT_ANALYZER_DIR)
+
+import main  # noqa: E402
+import synth_export  # noqa: E402
+from chat_model import ChatStore  # noqa: E402
+from code_check import ResultStore  # noqa: E402
+
+DEFAULT_SIZES = "1000,10000"
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--export-sizes", default=DEFAULT_SIZES,
+        help="comma separated message counts to benchmark (e.g. 1000,10000,100000,1000000)"
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "export_size" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("export_sizes").split(",") if s]
+        metafunc.parametrize("export_size", sizes, ids=[f"{s // 1000}k" for s in sizes], scope="session")
+
+
+class FakeTree:
+    def __init__(self):
+        self.rows = {}
+        self.selected = ()
+
+    def get_children(self):
+        return tuple(self.rows)
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.rows.pop(iid, None)
+
+    def insert(self, parent, index, iid=None, values=()):
+        if iid in self.rows:
+            raise main.tk.TclError(f"Item {iid} already exists")
+        self.rows[iid] = values
+        return iid
+
+    def selection(self):
+        return self.selected
+
+    def heading(self, column, **options):
+        pass
+
+
+class FakeVar:
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class FakeCombo(FakeVar):
+    def __init__(self):
+        super().__init__(main.ChatAnalyzer.ALL_FILTER)
+        self.options = {}
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+
+class FakeLabel:
+    def config(self, **kwargs):
+        self.options = kwargs
+
+
+class FakeText:
+    def __init__(self):
+        self.chunks = []
+
+    def insert(self, index, text, *tags):
+        self.chunks.append(text)
+
+    def image_create(self, index, image=None):
+        self.chunks.append(image)
+
+    def delete(self, *args):
+        self.chunks.clear()
+
+    def config(self, **kwargs):
+        pass
+
+
+def make_headless_analyzer(chat_store=None):
+    """ChatAnalyzer without a Tk root: widgets are replaced by recording fakes."""
+    analyzer = main.ChatAnalyzer.__new__(main.ChatAnalyzer)
+    analyzer.chat_store = chat_store
+    analyzer.current_session_messages = []
+    analyzer.latex_images = []
+    analyzer.latex_image_cache = {}
+    analyzer.prefetcher = None
+    analyzer.code_results = ResultStore()
+    analyzer.code_sessions = None
+    analyzer.sessions_tree = FakeTree()
+    analyzer.session_index = None
+    analyzer.session_page = 0
+    analyzer.page_var = FakeVar()
+    analyzer.status_var = FakeVar()
+    analyzer.mode_filter = FakeCombo()
+    analyzer.model_filter = FakeCombo()
+    analyzer.date_from_var = FakeVar()
+    analyzer.date_to_var = FakeVar()
+    analyzer.messages_text = FakeText()
+    analyzer.stats_labels = {name: FakeLabel() for name in ("Sessions", "Messages", "Avg Response", "Models")}
+    return analyzer
+
+
+@pytest.fixture(scope="session")
+def export_path(tmp_path_factory, export_size):
+    path = tmp_path_factory.getbasetemp() / f"export_{export_size}.json"
+    if not path.exists():
+        synth_export.write_export(str(path), export_size, seed=export_size)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def chat_data(export_path):
+    with open(export_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def chat_store(chat_data):
+    return ChatStore.from_export(chat_data)
+
+
+@pytest.fixture
+def analyzer(chat_store, monkeypatch):
+    # Text fallback path: no network renders, segmentation + latex_to_readable only.
+    monkeypatch.setattr(main, "LATEX_AVAILABLE", False)
+    return make_headless_analyzer(chat_store)
@@ -0,0 +1,59 @@
+"""
+Stand-in for adb used by test_adb_watcher.py. State lives in $FAKE_ADB_DIR:
+every invocation is appended to calls.log, `track-devices` streams one frame per
+line appended to the `track` file ("serial:state,serial:state", empty line = no
+devices, "EXIT" ends the stream), `shell` runs its command with the local sh and
+`pull` copies a local file, so device paths are plain paths on this machine.
+"""
+
+import os
+import shutil
+import sys
+import time
+
+
+def track_devices(state_dir):
+    path = os.path.join(state_dir, "track")
+    open(path, "a").close()
+    out = sys.stdout.buffer
+    pending = ""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            pending += f.read()
+            if "\n" not in pending:
+                time.sleep(0.01)
+                continue
+            line, pending = pending.split("\n", 1)
+            if line == "EXIT":
+                return 0
+            devices = [entry.split(":", 1) for entry in line.split(",") if entry]
+            payload = "".join(f"{serial}\t{state}\n" for serial, state in devices).encode("utf-8")
+            out.write(b"%04x" % len(payload) + payload)
+            out.flush()
+
+
+def main(argv):
+    state_dir = os.environ["FAKE_ADB_DIR"]
+    with open(os.path.join(state_dir, "calls.log"), "a", encoding="utf-8") as log:
+        log.write(" ".join(argv) + "\n")
+
+    if argv[:1] == ["-s"]:
+        argv = argv[2:]
+    command, args = argv[0], argv[1:]
+    if command == "track-devices":
+        return track_devices(state_dir)
+    if command == "shell":
+        sys.stdout.flush()
+        os.execvp("sh", ["sh", "-c", " ".join(args)])
+    if command == "pull":
+        if not os.path.exists(args[0]):
+            print(f"adb: error: remote object '{args[0]}' does not exist", file=sys.stderr)
+            return 1
+        shutil.copy(args[0], args[1])
+        return 0
+    print(f"fake adb: unsupported command {command}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,181 @@
+"""
+DeviceWatcher against fake_adb.py: live device updates from one track-devices
+stream, reconnection when the stream ends, and auto-ingest of a new export.
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+
+import pytest
+
+from adb_watcher import DeviceWatcher, retrieve_export
+
+FAKE_ADB = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_adb.py")]
+TIMEOUT = 10
+
+
+@pytest.fixture
+def adb_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_ADB_DIR", str(tmp_path))
+    return tmp_path
+
+
+def push_devices(adb_dir, line):
+    with open(adb_dir / "track", "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def calls(adb_dir, command):
+    with open(adb_dir / "calls.log", "r", encoding="utf-8") as f:
+        return [line for line in f if command in line.split()]
+
+
+def next_event(events):
+    return events.get(timeout=TIMEOUT)
+
+
+@pytest.fixture
+def watcher_factory():
+    watchers = []
+
+    def make(**kwargs):
+        events = queue.Queue()
+        watcher = DeviceWatcher(on_devices=events.put, adb=FAKE_ADB, **kwargs)
+        watchers.append(watcher)
+        return watcher, events
+
+    yield make
+    for watcher in watchers:
+        watcher.stop()
+
+
+def test_devices_follow_stream(adb_dir, watcher_factory):
+    watcher, events = watcher_factory()
+    watcher.start()
+
+    push_devices(adb_dir, "emulator-5554:device")
+    assert next_event(events) == ["emulator-5554"]
+
+    # An offline device is not selectable: no change is reported until it comes online.
+    push_devices(adb_dir, "emulator-5554:device,watch-1:offline")
+    push_devices(adb_dir, "emulator-5554:device,watch-1:device")
+    assert next_event(events) == ["emulator-5554", "watch-1"]
+
+    push_devices(adb_dir, "")
+    assert next_event(events) == []
+    assert len(calls(adb_dir, "track-devices")) == 1
+
+
+def test_reconnects_when_stream_ends(adb_dir, watcher_factory):
+    watcher, events = watcher_factory(restart_delay=0.05)
+    watcher.start()
+
+    push_devices(adb_dir, "watch-1:device")
+    assert next_event(events) == ["watch-1"]
+    push_devices(adb_dir, "EXIT")
+    assert next_event(events) == []
+
+    # The restarted stream reads the track file from the top again.
+    assert next_event(events) == ["watch-1"]
+    assert len(calls(adb_dir, "track-devices")) == 2
+
+
+def test_restart_reports_devices_again(adb_dir, watcher_factory):
+    remote = adb_dir / "aihelper_chat_export.json"
+    exports = queue.Queue()
+    watcher, events = watcher_factory(on_export=exports.put, remote_path=str(remote),
+                                      poll_seconds=0.1, auto_ingest=True)
+    watcher.start()
+    push_devices(adb_dir, "watch-1:device")
+    assert next_event(events) == ["watch-1"]
+
+    # Refresh: the new stream starts with the same list, which must still be reported
+    # and must bring the export watcher back.
+    watcher.stop()
+    watcher.start()
+    assert next_event(events) == ["watch-1"]
+    remote.write_text("{}", encoding="utf-8")
+    assert exports.get(timeout=TIMEOUT) == "watch-1"
+
+
+def test_restart_does_not_wait_for_a_busy_callback(adb_dir, watcher_factory):
+    release = threading.Event()
+    events = queue.Queue()
+
+    def on_devices(devices):
+        events.put(devices)
+        release.wait(TIMEOUT)  # e.g. a GUI callback that is slow to return
+
+    watcher, _ = watcher_factory()
+    watcher.on_devices = on_devices
+    watcher.start()
+    push_devices(adb_dir, "watch-1:device")
+    assert next_event(events) == ["watch-1"]
+
+    # The old thread is still inside the callback: stop() must not wait for it and
+    # start() must not mistake it for a running tracker.
+    start = time.perf_counter()
+    watcher.stop()
+    watcher.start()
+    assert time.perf_counter() - start < 0.5
+    assert next_event(events) == ["watch-1"]
+    assert len(calls(adb_dir, "track-devices")) == 2
+    release.set()
+
+
+def test_empty_list_reported_on_start(adb_dir, watcher_factory):
+    watcher, events = watcher_factory()
+    watcher.start()
+    push_devices(adb_dir, "")
+    assert next_event(events) == []
+
+
+def test_auto_ingest_new_export(adb_dir, watcher_factory, tmp_path):
+    remote = adb_dir / "aihelper_chat_export.json"
+    local = tmp_path / "pulled.json"
+    exports = queue.Queue()
+    watcher, events = watcher_factory(on_export=exports.put, remote_path=str(remote),
+                                      poll_seconds=0.1, auto_ingest=True)
+    watcher.start()
+    push_devices(adb_dir, "watch-1:device")
+    assert next_event(events) == ["watch-1"]
+
+    time.sleep(0.3)
+    assert exports.empty()
+    remote.write_text('{"sessions": [], "messages": []}', encoding="utf-8")
+    assert exports.get(timeout=TIMEOUT) == "watch-1"
+
+    assert retrieve_export("watch-1", str(local), str(remote), adb=FAKE_ADB)
+    assert local.read_text(encoding="utf-8").startswith('{"sessions"')
+    assert not remote.exists()
+    assert not retrieve_export("watch-1", str(local), str(remote), adb=FAKE_ADB)
+
+    # One long-lived shell per device, not one per poll.
+    assert len([c for c in calls(adb_dir, "shell") if "stat" in c]) == 1
+
+
+def test_auto_ingest_toggle(adb_dir, watcher_factory):
+    remote = adb_dir / "aihelper_chat_export.json"
+    remote.write_text("{}", encoding="utf-8")
+    exports = queue.Queue()
+    watcher, events = watcher_factory(on_export=exports.put, remote_path=str(remote), poll_seconds=0.1)
+    watcher.start()
+    push_devices(adb_dir, "watch-1:device")
+    assert next_event(events) == ["watch-1"]
+
+    time.sleep(0.3)
+    assert exports.empty()
+    watcher.set_auto_ingest(True)
+    assert exports.get(timeout=TIMEOUT) == "watch-1"
+
+
+def test_missing_adb_reports_error():
+    errors = queue.Queue()
+    watcher = DeviceWatcher(on_devices=lambda devices: None, on_error=errors.put,
+                            adb=["/nonexistent/adb"])
+    watcher.start()
+    assert errors.get(timeout=TIMEOUT) == "ADB not found"
+    watcher.stop()
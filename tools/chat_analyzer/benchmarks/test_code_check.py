@@ -0,0 +1,87 @@
+"""
+Sandboxed METODI_CODICE validation: statuses reported by the runner, limits,
+the sandbox environment, the result cache and snippet extraction from exports
+and the corpus. Every snippet is a real subprocess; the whole file takes a few
+seconds.
+"""
+
+import pytest
+
+from code_check import (FAIL, MISSING, PASS, TIMEOUT, ResultStore, check_snippets, code_session_ids,
+                        corpus_snippets, export_snippets, extract_code, run_snippet)
+
+
+def test_notebook_cell_semantics():
+    result = run_snippet("x = 2\ndisplay(x, 'a')\nx * 3")
+    assert result["status"] == PASS
+    assert result["output"].splitlines() == ["2", "'a'", "6"]
+
+
+@pytest.mark.parametrize("code, status, error", [
+    ("1 / 0", FAIL, "ZeroDivisionError"),
+    ("def f(:\n    pass", FAIL, "SyntaxError"),
+    ("import numpy_that_does_not_exist", MISSING, "ModuleNotFoundError"),
+    ("buffer = ' ' * (2 ** 31)", FAIL, "MemoryError"),
+])
+def test_failure_statuses(code, status, error):
+    result = run_snippet(code, memory_mb=256)
+    assert result["status"] == status
+    assert result["error"].startswith(error)
+
+
+def test_cpu_limit():
+    result = run_snippet("while True:\n    pass", cpu_seconds=1, wall_seconds=20)
+    assert result["status"] == TIMEOUT
+    assert result["runtime"] < 10
+
+
+def test_results_are_cached_by_content(tmp_path):
+    store = ResultStore(str(tmp_path))
+    snippets = [(1, "print('ok')"), (2, "print('ok')"), (3, "1 / 0"), (4, "import numpy_that_does_not_exist")]
+    seen = []
+    results = check_snippets(snippets, store, workers=2, on_result=lambda key, r, cached: seen.append(cached))
+    assert [results[k]["status"] for k in (1, 2, 3, 4)] == [PASS, PASS, FAIL, MISSING]
+    assert seen == [False] * 4
+
+    seen.clear()
+    check_snippets(snippets, store, workers=2, on_result=lambda key, r, cached: seen.append((key, cached)))
+    # Missing modules are a property of this machine, so they are re-run.
+    assert sorted(seen) == [(1, True), (2, True), (3, True), (4, False)]
+
+
+def test_cache_key_includes_limits(tmp_path):
+    store = ResultStore(str(tmp_path))
+    snippet = [(1, "while True:\n    pass")]
+    results = check_snippets(snippet, store, cpu_seconds=1, wall_seconds=20)
+    assert results[1]["status"] == TIMEOUT
+    assert store.get(snippet[0][1], cpu_seconds=1, wall_seconds=20) == results[1]
+    # A timeout under a tight limit is not the verdict for the default limits.
+    assert store.get(snippet[0][1]) is None
+
+
+def test_sandbox_environment(monkeypatch):
+    monkeypatch.setenv("AIHELPER_SECRET_TOKEN", "hunter2")
+    result = run_snippet("import os\nprint(sorted(os.environ))\nprint(os.path.realpath(os.environ['HOME']) == os.getcwd())")
+    names, home_is_scratch = result["output"].splitlines()
+    assert "AIHELPER_SECRET_TOKEN" not in names
+    assert "'MPLBACKEND'" in names
+    assert home_is_scratch == "True"
+
+
+def test_extract_code():
+    assert extract_code("  x = 1\n") == "x = 1"
+    fenced = "Ecco:\n```python\nx = 1\n```\ne poi\n```\nprint(x)\n```"
+    assert extract_code(fenced) == "x = 1\n\nprint(x)"
+
+
+def test_snippet_sources(chat_store):
+    code_sessions = code_session_ids(chat_store)
+    assert code_sessions
+    snippets = list(export_snippets(chat_store))
+    assert snippets
+    session_of = dict(zip(chat_store.message_ids, chat_store.message_sessions))
+    assert all(session_of[message_id] in code_sessions for message_id, _ in snippets)
+
+    examples = list(corpus_snippets())
+    assert len(examples) > 10
+    assert all(code.strip() for _, code in examples)
@@ -0,0 +1,130 @@
+"""
+Memory footprint of the compact ChatStore versus the plain json.load dicts,
+measured with tracemalloc on a 20k-message synthetic export, and lossless
+loading of null, malformed and missing fields.
+"""
+
+import gc
+import json
+import tracemalloc
+
+import pytest
+
+import synth_export
+from chat_model import ChatStore
+from conftest import make_headless_analyzer
+from session_export import export_sessions
+
+MESSAGES = 20_000
+# "Several-fold": the store must stay below a third of the dict model.
+MIN_REDUCTION = 3.0
+
+
+def traced(build):
+    """(result, bytes still allocated by build once it returns)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(scope="module")
+def export_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("memory") / "export.json"
+    synth_export.write_export(str(path), MESSAGES, seed=35)
+    return str(path)
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_store_is_several_times_smaller(export_path):
+    chat_data, dict_bytes = traced(lambda: load(export_path))
+    store, store_bytes = traced(lambda: ChatStore.from_export(chat_data))
+
+    reduction = dict_bytes / store_bytes
+    print(f"\ndicts {dict_bytes / 1e6:.1f} MB, ChatStore {store_bytes / 1e6:.1f} MB ({reduction:.1f}x)")
+    assert store.message_count == MESSAGES
+    assert reduction >= MIN_REDUCTION
+
+
+def test_store_round_trips_messages(export_path):
+    chat_data = load(export_path)
+    store = ChatStore.from_export(chat_data)
+
+    by_session = {}
+    for msg in chat_data["messages"]:
+        by_session.setdefault(msg["sessionId"], []).append(msg)
+    for session_id, messages in by_session.items():
+        expected = sorted(messages, key=lambda m: m["timestamp"])
+        assert [m.to_dict() for m in store.session_messages(session_id)] == expected
+
+    sessions = {s["id"]: s for s in chat_data["sessions"]}
+    for record in store.sessions():
+        original = sessions[record.id]
+        assert (record.model_id, record.title, record.timestamp, record.mode, record.mode_id) == (
+            original["modelId"], original["title"], original["timestamp"], original["mode"], original["modeId"])
+        assert record.message_count == len(by_session.get(record.id, []))
+
+    assistant = [len(m["content"]) for m in chat_data["messages"] if m["role"] == "assistant"]
+    assert store.average_length("assistant") == sum(assistant) // len(assistant)
+
+
+def test_null_and_missing_fields_load():
+    chat_data = {
+        "sessions": [
+            {"id": 1, "timestamp": None},
+            {"timestamp": 5, "title": "no id"},
+            {"id": None, "modelId": None},
+        ],
+        "messages": [
+            {"id": 1, "sessionId": 1, "role": "user", "content": "a", "timestamp": None},
+            {"id": None, "sessionId": None, "role": "assistant", "content": None, "timestamp": 3},
+            {"sessionId": 1, "role": "assistant"},
+            {"id": 4, "sessionId": "x", "role": "user", "content": "b", "timestamp": 2.5},
+        ],
+    }
+    store = ChatStore.from_export(chat_data)
+    assert store.message_count == 4 and store.session_count == 3
+    assert store.defaulted_fields == 8
+
+    records = [s for s in store.sessions()]
+    assert [s.timestamp for s in records] == [0, 5, 0]
+    # Each id-less session gets its own key; orphan messages stay out of all sessions.
+    assert len({s.id for s in records}) == 3
+    assert [s.message_count for s in records[1:]] == [0, 0]
+    assert records[0].message_count == 2
+
+    # Replaced values are kept and absent keys stay absent: records are written back as read.
+    written = [m.to_dict() for m in store.iter_messages()]
+    assert len(written) == len(chat_data["messages"])
+    assert all(m in written for m in chat_data["messages"])
+    assert [store.session(row).to_dict(store.session_extras.get(row))
+            for row in range(store.session_count)] == chat_data["sessions"]
+    assert store.session_messages(1)[1].content == ""
+
+
+def test_sessions_without_id_stay_distinct(tmp_path):
+    chat_data = {
+        "sessions": [{"title": "first", "timestamp": 2}, {"id": None, "title": "second", "timestamp": 1}],
+        "messages": [{"id": 1, "role": "user", "content": "orphan", "timestamp": 1}],
+    }
+    store = ChatStore.from_export(chat_data)
+    analyzer = make_headless_analyzer(store)
+    analyzer.populate_sessions()
+    assert len(analyzer.sessions_tree.rows) == 2
+
+    analyzer.sessions_tree.selected = ("1",)
+    assert analyzer.selected_session_rows() == [1]
+
+    path = str(tmp_path / "sessions.ndjson")
+    assert export_sessions(store, analyzer.session_index.rows, path) == (2, 0)
+    with open(path, "r", encoding="utf-8") as f:
+        assert [json.loads(line)["title"] for line in f] == ["first", "second"]
+    # The orphan message is still part of the store's own output.
+    assert [m.content for m in store.iter_messages()] == ["orphan"]
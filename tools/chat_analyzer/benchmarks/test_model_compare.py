@@ -0,0 +1,87 @@
+"""
+Cross-export comparison: query normalization, MinHash/LSH alignment and the
+per mode/model/cohort metrics. The export comparisons pair each --export-sizes
+export with a second one of the same size from another seed.
+"""
+
+import pytest
+
+import synth_export
+from chat_model import ChatStore
+from code_check import FAIL, PASS, ResultStore, extract_code
+from model_compare import Cohort, Exchange, align, compare, normalize, shingle_hashes, signature, similarity
+from session_index import parse_day
+
+
+def exchange(cohort, text):
+    return Exchange(cohort, "m", "general", normalize(text), 1000, 10, 0, None)
+
+
+@pytest.fixture(scope="module")
+def stores(export_size, chat_store):
+    other = ChatStore.from_export(synth_export.generate_export(export_size, seed=export_size + 1))
+    return [chat_store, other]
+
+
+def test_normalize():
+    assert normalize("  Calcola l'Integrale,   PERCHÉ?\n") == "calcola l integrale perche"
+    assert normalize("?!") == ""
+
+
+def test_signature_estimates_jaccard():
+    a = shingle_hashes(normalize("calcola la derivata della funzione seno di x al quadrato"))
+    b = shingle_hashes(normalize("calcola la derivata della funzione coseno di x al quadrato"))
+    jaccard = len(a & b) / len(a | b)
+    assert abs(similarity(signature(a), signature(b)) - jaccard) < 0.25
+    assert similarity(signature(a), signature(a)) == 1.0
+
+
+def test_align_groups_near_duplicates():
+    exchanges = [
+        exchange(0, "Calcola la derivata di x al quadrato"),
+        exchange(1, "calcola la derivata di x al quadrato!"),
+        exchange(1, "Calcola la derivata di x alla quarta"),
+        exchange(0, "che tempo fa domani a Milano"),
+        exchange(1, "traduci in inglese per favore"),
+    ]
+    groups = align(exchanges)
+    assert groups[0] == groups[1]
+    assert groups[3] != groups[0] and groups[4] != groups[0] and groups[3] != groups[4]
+
+
+def test_compare_exports(stores):
+    cohorts = [Cohort("a"), Cohort("b")]
+    rows, groups, queries = compare(cohorts, stores)
+    assert groups > 0 and queries > 0
+    assert {row["cohort"] for row in rows} == {"a", "b"}
+    assert sum(row["queries"] for row in rows) == queries
+    for row in rows:
+        assert row["latency_s"] > 0 and row["length"] > 0
+        assert row["code_pass_rate"] is None
+
+
+def test_compare_date_ranges(stores):
+    store = stores[0]
+    middle = sorted(store.session_timestamps)[store.session_count // 2]
+    cohorts = [Cohort("early", end=middle), Cohort("late", start=middle)]
+    rows, groups, queries = compare(cohorts, [store, store])
+    assert groups > 0
+    assert {row["cohort"] for row in rows} == {"early", "late"}
+
+    # A range past the end of the export has nothing to align with.
+    cohorts = [Cohort("all"), Cohort("future", start=parse_day("2100-01-01"))]
+    assert compare(cohorts, [store, store])[1:] == (0, 0)
+
+
+def test_code_pass_rate(stores, tmp_path):
+    results = ResultStore(str(tmp_path))
+    codes = [extract_code(m.content) for store in stores for m in store.iter_messages()
+             if m.role == "assistant" and "import" in m.content]
+    assert codes
+    for i, code in enumerate(codes):
+        results.put(code, {"status": PASS if i % 2 else FAIL, "runtime": 0.1, "output": "", "error": ""})
+
+    rows, _, _ = compare([Cohort("a"), Cohort("b")], stores, code_results=results)
+    code_rows = [row for row in rows if row["mode"] == "metodi_code"]
+    assert code_rows
+    assert all(0 <= row["code_pass_rate"] <= 1 for row in code_rows if row["code_checked"])
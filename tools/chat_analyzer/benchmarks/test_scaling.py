@@ -0,0 +1,132 @@
+"""
+Scaling benchmarks for chat_analyzer hot paths (pytest-benchmark).
+
+    pip install pytest pytest-benchmark
+    python -m pytest benchmarks --export-sizes 1000,10000,100000,1000000
+
+Large sizes run a single round each; compare runs with --benchmark-autosave and
+pytest-benchmark compare.
+"""
+
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from chat_model import ChatStore  # noqa: E402
+from chat_snapshot import open_snapshot, snapshot_path, write_snapshot  # noqa: E402
+from latex_cache.segments import LATEX, SALVAGED, iter_formulas, iter_segments  # noqa: E402
+from model_compare import Cohort, align, iter_exchanges  # noqa: E402
+from session_index import PAGE_SIZE, SORT_COLUMNS  # noqa: E402
+
+# Above this size every benchmark runs once instead of calibrating rounds.
+SINGLE_ROUND_SIZE = 100_000
+
+
+def run(benchmark, export_size, fn, *args):
+    if export_size >= SINGLE_ROUND_SIZE:
+        return benchmark.pedantic(fn, args=args, rounds=1, iterations=1)
+    return benchmark(fn, *args)
+
+
+def test_load(benchmark, export_size, export_path):
+    def load():
+        with open(export_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    data = run(benchmark, export_size, load)
+    assert len(data["messages"]) == export_size
+
+
+def test_build_chat_store(benchmark, export_size, chat_data):
+    store = run(benchmark, export_size, ChatStore.from_export, chat_data)
+    assert store.message_count == export_size
+
+
+def test_reopen_snapshot(benchmark, export_size, export_path, chat_store):
+    snap_path = snapshot_path(export_path)
+    if not os.path.exists(snap_path):
+        write_snapshot(chat_store, snap_path, export_path)
+
+    def reopen():
+        # What the analyzer needs before first interaction: session list + statistics.
+        store = open_snapshot(snap_path, export_path)
+        store.sessions()
+        store.average_length("assistant")
+        return store
+
+    store = run(benchmark, export_size, reopen)
+    assert store.message_count == export_size
+
+
+def test_update_statistics(benchmark, export_size, analyzer):
+    run(benchmark, export_size, analyzer.update_statistics)
+    assert analyzer.stats_labels["Messages"].options["text"] == str(export_size)
+
+
+def test_populate_sessions(benchmark, export_size, analyzer):
+    run(benchmark, export_size, analyzer.populate_sessions)
+    assert len(analyzer.sessions_tree.rows) == min(PAGE_SIZE, analyzer.chat_store.session_count)
+
+
+@pytest.mark.parametrize("column", SORT_COLUMNS)
+def test_sort_sessions(benchmark, export_size, analyzer, column):
+    analyzer.populate_sessions()
+
+    def sort_fresh():
+        # Drop the cached order so every round pays for the sort itself.
+        analyzer.session_index._orders.pop(column, None)
+        analyzer.session_index.sort_column = None
+        analyzer.sort_sessions(column)
+
+    run(benchmark, export_size, sort_fresh)
+    assert len(analyzer.session_index.rows) == analyzer.chat_store.session_count
+
+
+def test_filter_sessions(benchmark, export_size, analyzer):
+    analyzer.populate_sessions()
+    analyzer.mode_filter.set("analysis2")
+    run(benchmark, export_size, analyzer.apply_session_filters)
+    assert 0 < len(analyzer.session_index.rows) < analyzer.chat_store.session_count
+
+
+def test_segmentation(benchmark, export_size, chat_data):
+    contents = [m["content"] for m in chat_data["messages"] if m["role"] == "assistant"]
+
+    def segment_all():
+        return sum(1 for content in contents for kind, _ in iter_segments(content) if kind in (LATEX, SALVAGED))
+
+    assert run(benchmark, export_size, segment_all) > 0
+
+
+def test_display_largest_session(benchmark, export_size, analyzer):
+    store = analyzer.chat_store
+    session_id = max(store.session_ranges, key=store.message_count_for)
+
+    run(benchmark, export_size, analyzer.display_session_messages, session_id)
+    assert len(analyzer.current_session_messages) == store.message_count_for(session_id)
+
+
+def test_latex_to_readable(benchmark, export_size, analyzer, chat_data):
+    formulas = [
+        formula
+        for m in chat_data["messages"] if m["role"] == "assistant"
+        for formula in iter_formulas(m["content"])
+    ]
+
+    def convert_all():
+        return [analyzer.latex_to_readable(formula) for formula in formulas]
+
+    assert len(run(benchmark, export_size, convert_all)) == len(formulas)
+
+
+def test_align_queries(benchmark, export_size, chat_store):
+    # Two halves of the same export stand in for two exports of the same size.
+    middle = sorted(chat_store.session_timestamps)[chat_store.session_count // 2]
+    cohorts = [Cohort("early", end=middle), Cohort("late", start=middle)]
+    exchanges = [ex for i, c in enumerate(cohorts) for ex in iter_exchanges(chat_store, i, c.start, c.end)]
+
+    groups = run(benchmark, export_size, align, exchanges)
+    assert len(groups) == len(exchanges)
@@ -0,0 +1,84 @@
+"""
+Bulk session export: NDJSON/Markdown output, gzip, cancellation and memory that
+does not grow with the size of the output, on each --export-sizes export.
+"""
+
+import gzip
+import json
+import os
+import threading
+import tracemalloc
+
+import pytest
+
+from session_export import ExportCancelled, export_sessions, format_for
+
+
+def test_format_for():
+    assert format_for("a.ndjson") == ("ndjson", False)
+    assert format_for("a.jsonl.gz") == ("ndjson", True)
+    assert format_for("a.md.gz") == ("markdown", True)
+
+
+def test_ndjson_gzip_round_trip(export_size, chat_store, tmp_path):
+    path = str(tmp_path / "all.ndjson.gz")
+    rows = range(chat_store.session_count)
+    progress = []
+    assert export_sessions(chat_store, rows, path, on_progress=lambda d, t: progress.append((d, t))) \
+        == (chat_store.session_count, export_size)
+    assert progress[-1] == (chat_store.session_count, chat_store.session_count)
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    sessions = [r for r in records if r.pop("type") == "session"]
+    messages = [r for r in records if "sessionId" in r]
+    assert [s["id"] for s in sessions] == list(chat_store.session_ids)
+    assert messages == [m.to_dict() for m in chat_store.iter_messages()]
+
+
+def test_markdown_keeps_latex_and_fences_code(chat_store, tmp_path):
+    path = str(tmp_path / "some.md")
+    rows = list(range(50))
+    export_sessions(chat_store, rows, path)
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    assert text.count("\n## ") == len(rows)
+    formulas = [m.content for row in rows for m in chat_store.session_messages(chat_store.session_ids[row])
+                if m.role == "assistant" and "$" in m.content]
+    assert formulas and all(content in text for content in formulas)
+    if any(chat_store.session(row).mode_id == "metodi_code" for row in rows):
+        assert "```python\n" in text
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_file_mode_follows_umask(chat_store, tmp_path):
+    path = str(tmp_path / "history.ndjson")
+    export_sessions(chat_store, range(3), path)
+    mask = os.umask(0)
+    os.umask(mask)
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~mask
+
+
+def test_cancel_leaves_no_file(chat_store, tmp_path):
+    path = str(tmp_path / "cancelled.ndjson")
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(ExportCancelled):
+        export_sessions(chat_store, range(chat_store.session_count), path, cancel=cancel)
+    assert os.listdir(tmp_path) == []
+
+
+def export_peak(store, rows, path):
+    tracemalloc.start()
+    try:
+        export_sessions(store, rows, path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_does_not_grow_with_output(chat_store, tmp_path):
+    tenth = export_peak(chat_store, range(chat_store.session_count // 10), str(tmp_path / "tenth.ndjson"))
+    full = export_peak(chat_store, range(chat_store.session_count), str(tmp_path / "all.ndjson"))
+    # Ten times the output, but still one decoded session plus buffers at a time.
+    assert full < 2 * tenth
@@ -0,0 +1,77 @@
+"""
+SessionIndex: cached sort orders and filters agree with sorting and filtering
+the session records directly, on each --export-sizes export. Timings of the
+same operations are in test_scaling.py.
+"""
+
+import pytest
+
+from session_index import ALL, SORT_COLUMNS, SessionIndex, day_after, parse_day
+
+KEYS = {
+    "title": lambda s: (s.title or "").casefold(),
+    "model": lambda s: s.model_id or "",
+    "date": lambda s: s.timestamp,
+    "msgs": lambda s: s.message_count,
+}
+
+
+def ids(records):
+    return [s.id for s in records]
+
+
+def all_rows(index):
+    return ids(index.store.session(row) for row in index.rows)
+
+
+def test_default_view_is_newest_first(chat_store):
+    index = SessionIndex(chat_store, page_size=50)
+    expected = sorted(chat_store.sessions(), key=lambda s: s.timestamp, reverse=True)
+    assert all_rows(index) == ids(expected)
+    assert ids(index.page(0)) == ids(expected[:50])
+    assert index.page_count == -(-chat_store.session_count // 50)
+
+
+@pytest.mark.parametrize("column", SORT_COLUMNS)
+def test_sort_columns(chat_store, column):
+    index = SessionIndex(chat_store)
+    index.sort_by(column)
+    if column != "date":
+        ascending = sorted(chat_store.sessions(), key=KEYS[column])
+        expected = ascending[::-1] if index.descending else ascending
+        assert [KEYS[column](s) for s in index.page(0)] == [KEYS[column](s) for s in expected[:len(index.page(0))]]
+        assert sorted(all_rows(index)) == sorted(ids(expected))
+    index.sort_by(column)  # second click flips the direction
+    keys = [KEYS[column](chat_store.session(row)) for row in index.rows]
+    assert keys == sorted(keys, reverse=index.descending)
+
+
+def test_filters(chat_store):
+    index = SessionIndex(chat_store)
+    sessions = chat_store.sessions()
+    mode = index.mode_choices()[0]
+    model = index.model_choices()[0]
+    start = parse_day("2026-01-10")
+    end = day_after(parse_day("2026-02-10"))
+
+    index.set_filters(mode=mode, model=model, start=start, end=end)
+    expected = [
+        s for s in sessions
+        if (s.mode_id or s.mode) == mode and s.model_id == model and start <= s.timestamp < end
+    ]
+    assert expected
+    assert sorted(all_rows(index)) == sorted(ids(expected))
+
+    # Sorting keeps the filter; an unknown value matches nothing; ALL clears it.
+    index.sort_by("msgs")
+    assert sorted(all_rows(index)) == sorted(ids(expected))
+    index.set_filters(model="unknown/model")
+    assert index.rows.tolist() == [] and index.page_count == 1
+    index.set_filters(mode=ALL, model=ALL)
+    assert len(index.rows) == chat_store.session_count
+
+
+def test_mode_choices_cover_sessions(chat_store):
+    index = SessionIndex(chat_store)
+    assert set(index.mode_choices()) == {s.mode_id or s.mode for s in chat_store.sessions()}
+    assert set(index.model_choices()) == {s.model_id for s in chat_store.sessions()}
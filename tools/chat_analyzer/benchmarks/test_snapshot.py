@@ -0,0 +1,98 @@
+"""
+Snapshot format: lossless round trip through write_snapshot/open_snapshot,
+staleness detection and the lifetime of the mapping. Runs on the same
+--export-sizes exports (and snapshots) as test_scaling.py.
+"""
+
+import json
+import os
+import time
+
+import pytest
+
+import chat_snapshot
+from chat_snapshot import open_snapshot, snapshot_path, write_snapshot
+
+
+@pytest.fixture
+def export(export_path, chat_store):
+    snap_path = snapshot_path(export_path)
+    if not os.path.exists(snap_path):
+        write_snapshot(chat_store, snap_path, export_path)
+    return export_path, chat_store
+
+
+def test_snapshot_matches_store(export):
+    path, store = export
+    snap = open_snapshot(snapshot_path(path), path)
+    assert snap is not None
+    try:
+        assert (snap.session_count, snap.message_count) == (store.session_count, store.message_count)
+        assert snap.average_length("assistant") == store.average_length("assistant")
+        assert snap.model_ids() == store.model_ids()
+        for a, b in zip(snap.sessions(), store.sessions()):
+            assert [getattr(a, k) for k in a.__slots__] == [getattr(b, k) for k in b.__slots__]
+        for session_id in store.session_ranges:
+            assert ([m.to_dict() for m in snap.session_messages(session_id)]
+                    == [m.to_dict() for m in store.session_messages(session_id)])
+    finally:
+        snap.close()
+
+
+def test_reopen_skips_parsing(export):
+    path, _ = export
+    start = time.perf_counter()
+    snap = open_snapshot(snapshot_path(path), path)
+    snap.sessions()
+    elapsed = time.perf_counter() - start
+    snap.close()
+    assert elapsed < 0.5
+
+
+def test_stale_snapshot_is_ignored(export, tmp_path):
+    path, store = export
+    copy = str(tmp_path / "export.json")
+    with open(path, "rb") as src, open(copy, "wb") as dst:
+        dst.write(src.read())
+    write_snapshot(store, snapshot_path(copy), copy)
+
+    os.utime(copy, ns=(0, 0))
+    assert open_snapshot(snapshot_path(copy), copy) is None
+
+
+def test_garbage_is_not_a_snapshot(tmp_path):
+    path = tmp_path / "broken.snap"
+    path.write_bytes(b"not a snapshot at all")
+    assert open_snapshot(str(path)) is None
+
+
+def test_incomplete_header_releases_file(tmp_path, monkeypatch):
+    header = json.dumps({"sections": {}}).encode("utf-8")
+    path = tmp_path / "incomplete.snap"
+    path.write_bytes(chat_snapshot._PREAMBLE.pack(chat_snapshot.MAGIC, chat_snapshot._PREAMBLE.size, len(header))
+                     + header)
+    opened = []
+
+    def recording_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(chat_snapshot, "open", recording_open, raising=False)
+    assert open_snapshot(str(path)) is None
+    assert len(opened) == 1 and opened[0].closed
+
+
+def test_close_waits_for_retained_handles(export):
+    path, store = export
+    snap = open_snapshot(snapshot_path(path), path)
+    session_id = next(iter(store.session_ranges))
+    handle = snap.retain()
+    snap.close()
+
+    # A worker that took a handle before the close keeps reading the mapping.
+    assert len(handle.session_messages(session_id)) == store.message_count_for(session_id)
+    with pytest.raises(ValueError):
+        snap.retain()
+    handle.release()
+    with pytest.raises(ValueError):
+        snap.session_messages(session_id)
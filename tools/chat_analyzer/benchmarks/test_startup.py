@@ -0,0 +1,79 @@
+"""
+Startup benchmarks: cold import of main.py and time to first paint / full UI.
+Each round runs in a fresh interpreter so module caches do not hide regressions;
+keep a baseline with --benchmark-autosave and gate with
+--benchmark-compare --benchmark-compare-fail=mean:20%.
+First-paint benchmarks need a display (run under xvfb-run on CI).
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import CHAT_ANALYZER_DIR
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 5
+NO_DISPLAY_EXIT = 3
+
+IMPORT_PROBE = """
+import json, time
+start = time.perf_counter()
+import main
+print(json.dumps({"import_s": time.perf_counter() - start}))
+"""
+
+# Drives the Tk loop by hand until the loading screen is drawn and the full UI is built.
+PAINT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import tkinter as tk
+import main
+imported = time.perf_counter()
+try:
+    root = tk.Tk()
+except tk.TclError:
+    sys.exit(%d)
+app = main.ChatAnalyzer(root, prefetch_workers=0)
+deadline = time.perf_counter() + 10
+while not app.ui_ready and time.perf_counter() < deadline:
+    root.update()
+ready = time.perf_counter()
+root.destroy()
+print(json.dumps({
+    "import_s": imported - start,
+    "first_paint_s": (app.first_paint or ready) - start,
+    "ui_ready_s": ready - start,
+}))
+""" % NO_DISPLAY_EXIT
+
+
+def run_probe(code):
+    proc = subprocess.run([sys.executable, "-c", code], cwd=CHAT_ANALYZER_DIR,
+                          capture_output=True, text=True, timeout=60)
+    if proc.returncode == NO_DISPLAY_EXIT:
+        pytest.skip("no display available for Tk")
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def record(benchmark, code):
+    samples = []
+    benchmark.pedantic(lambda: samples.append(run_probe(code)), rounds=ROUNDS, iterations=1)
+    for key in samples[0]:
+        benchmark.extra_info[f"{key}_min"] = min(s[key] for s in samples)
+    return samples
+
+
+def test_cold_import(benchmark):
+    samples = record(benchmark, IMPORT_PROBE)
+    assert all(s["import_s"] > 0 for s in samples)
+
+
+def test_time_to_first_paint(benchmark):
+    run_probe(PAINT_PROBE)  # skips early without a display
+    samples = record(benchmark, PAINT_PROBE)
+    assert all(s["first_paint_s"] <= s["ui_ready_s"] for s in samples)
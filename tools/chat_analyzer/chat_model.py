@@ -0,0 +1,351 @@
+"""
+Compact in-memory model for chat exports.
+Messages live in parallel array columns grouped by session, role/model/mode
+strings are stored once in string tables, audio paths are split into a shared
+directory plus file name, and each session's contents are kept as one
+zlib-compressed UTF-8 block decoded only when the session is opened.
+Views get lightweight slotted records on demand.
+"""
+
+import zlib
+from array import array
+
+SESSION_KEYS = ("id", "modelId", "title", "timestamp", "mode", "modeId")
+MESSAGE_KEYS = ("id", "sessionId", "role", "content", "timestamp", "audioPath")
+# audioPath is optional (absent = no audio); the other keys are filled with defaults
+# when absent, and ABSENT_KEYS in the extras lists them so they are not written back.
+REQUIRED_MESSAGE_KEYS = MESSAGE_KEYS[:5]
+ABSENT_KEYS = "__absent__"
+_SESSION_KEY_SET = frozenset(SESSION_KEYS)
+_REQUIRED_MESSAGE_KEY_SET = frozenset(REQUIRED_MESSAGE_KEYS)
+
+# Fast level: blocks are compressed once at load and decoded on every session open.
+COMPRESSION_LEVEL = 1
+
+# Stored for a message id that is null, missing or not an integer.
+MISSING_ID = -1
+# Export ids are Room autoincrement keys (>= 1), so negative keys are free for
+# internal use: messages without a usable sessionId are grouped under ORPHAN_SESSION,
+# and each session without a usable id gets its own key from missing_session_id().
+ORPHAN_SESSION = -1
+
+
+def missing_session_id(row):
+    """Internal key of a session row whose id is unusable; never written out."""
+    return -2 - row
+
+
+def _as_int(value, default):
+    """Integer for an int64 column, or the default for null, missing or non-numeric values."""
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+def _absent(record, keys):
+    return [key for key in keys if key not in record]
+
+
+def _with_extra(data, extra):
+    """Record dict with its extras applied: kept values restored, absent keys dropped."""
+    if extra:
+        data.update(extra)
+        for key in data.pop(ABSENT_KEYS, ()):
+            del data[key]
+    return data
+
+
+class StringTable:
+    """Interning table: each distinct string is stored once and referenced by index."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value):
+        """Index of a string already in the table, or None."""
+        return self._codes.get(value)
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class SessionRecord:
+    __slots__ = ("id", "model_id", "title", "timestamp", "mode", "mode_id", "message_count")
+
+    def __init__(self, id, model_id, title, timestamp, mode, mode_id, message_count):
+        self.id = id
+        self.model_id = model_id
+        self.title = title
+        self.timestamp = timestamp
+        self.mode = mode
+        self.mode_id = mode_id
+        self.message_count = message_count
+
+    def to_dict(self, extra=None):
+        """Session in export format."""
+        data = {
+            "id": self.id,
+            "modelId": self.model_id,
+            "title": self.title,
+            "timestamp": self.timestamp,
+            "mode": self.mode,
+            "modeId": self.mode_id,
+        }
+        return _with_extra(data, extra)
+
+
+class MessageRecord:
+    __slots__ = ("id", "session_id", "role", "content", "timestamp", "audio_path", "extra")
+
+    def __init__(self, id, session_id, role, content, timestamp, audio_path, extra=None):
+        self.id = id
+        self.session_id = session_id
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        self.audio_path = audio_path
+        self.extra = extra
+
+    def to_dict(self):
+        """Message in export format (used for clipboard/JSON output)."""
+        data = {
+            "id": self.id,
+            "sessionId": self.session_id,
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp,
+        }
+        if self.audio_path is not None:
+            data["audioPath"] = self.audio_path
+        return _with_extra(data, self.extra)
+
+
+class ChatStore:
+    """
+    Column store for one export. Message columns are ordered by session and, inside
+    a session, by timestamp, so a session is the contiguous slice session_ranges[sid].
+    """
+
+    def __init__(self):
+        self.strings = StringTable()  # roles, model ids, modes and audio directories
+
+        # Sessions, in export order
+        self.session_ids = array("q")
+        self.session_timestamps = array("q")
+        self.session_titles = []
+        self.session_models = array("l")
+        self.session_modes = array("l")
+        self.session_mode_ids = array("l")
+        self.session_extras = {}  # row -> unknown keys, kept for lossless output
+
+        # Messages, grouped by session
+        self.message_ids = array("q")
+        self.message_sessions = array("q")
+        self.message_timestamps = array("q")
+        self.message_roles = array("l")
+        self.message_lengths = array("l")   # content length in characters
+        self.message_offsets = array("l")   # end of the content in its session block (bytes)
+        self.audio_dirs = array("l")        # string code of the directory (with "/"), -1 = no audio
+        self.audio_files = []
+        self.message_extras = {}
+
+        self.session_ranges = {}  # session id -> (start, end) message rows
+        self.session_blocks = {}  # session id -> compressed UTF-8 contents
+        self.next_session_id = None
+        self.next_message_id = None
+        self.defaulted_fields = 0  # malformed id/sessionId/timestamp/content values replaced at load
+
+    # ---- building ----
+
+    def _int_field(self, record, key, default, extra):
+        """
+        Integer value of record[key]; a present but unusable value is replaced by the
+        default and kept in extra, so the record is still written back unchanged.
+        """
+        value = record.get(key)
+        if key in record and not isinstance(value, int):
+            self.defaulted_fields += 1
+            extra[key] = value
+        return _as_int(value, default)
+
+    def _optional_code(self, value):
+        return -1 if value is None else self.strings.code(value)
+
+    def _optional(self, code):
+        return None if code < 0 else self.strings[code]
+
+    @classmethod
+    def from_export(cls, chat_data):
+        store = cls()
+        store.next_session_id = chat_data.get("nextSessionId")
+        store.next_message_id = chat_data.get("nextMessageId")
+
+        for s in chat_data.get("sessions", []):
+            row = len(store.session_ids)
+            extra = {k: v for k, v in s.items() if k not in SESSION_KEYS}
+            if not s.keys() >= _SESSION_KEY_SET:
+                extra[ABSENT_KEYS] = _absent(s, SESSION_KEYS)
+            store.session_ids.append(store._int_field(s, "id", missing_session_id(row), extra))
+            store.session_timestamps.append(store._int_field(s, "timestamp", 0, extra))
+            store.session_titles.append(s.get("title"))
+            store.session_models.append(store._optional_code(s.get("modelId")))
+            store.session_modes.append(store._optional_code(s.get("mode")))
+            store.session_mode_ids.append(store._optional_code(s.get("modeId")))
+            if extra:
+                store.session_extras[row] = extra
+
+        # Group by session (first appearance order), then order by timestamp inside it.
+        messages = chat_data.get("messages", [])
+        message_extras = [None] * len(messages)
+        timestamps = []
+        groups = {}
+        for index, m in enumerate(messages):
+            extra = {k: v for k, v in m.items() if k not in MESSAGE_KEYS}
+            if not m.keys() >= _REQUIRED_MESSAGE_KEY_SET:
+                extra[ABSENT_KEYS] = _absent(m, REQUIRED_MESSAGE_KEYS)
+            session_id = store._int_field(m, "sessionId", ORPHAN_SESSION, extra)
+            timestamps.append(store._int_field(m, "timestamp", 0, extra))
+            message_extras[index] = extra or None
+            groups.setdefault(session_id, []).append(index)
+
+        for session_id, indices in groups.items():
+            indices.sort(key=timestamps.__getitem__)
+            start = len(store.message_ids)
+            block = bytearray()
+            for i in indices:
+                m = messages[i]
+                extra = message_extras[i] or {}
+                content = m.get("content", "")
+                if not isinstance(content, str):
+                    store.defaulted_fields += 1
+                    extra["content"] = content
+                    content = ""
+                block += content.encode("utf-8")
+                store.message_ids.append(store._int_field(m, "id", MISSING_ID, extra))
+                store.message_sessions.append(session_id)
+                store.message_timestamps.append(timestamps[i])
+                store.message_roles.append(store.strings.code(m.get("role", "?")))
+                store.message_lengths.append(len(content))
+                store.message_offsets.append(len(block))
+
+                audio_path = m.get("audioPath")
+                if audio_path is None:
+                    store.audio_dirs.append(-1)
+                    store.audio_files.append(None)
+                else:
+                    cut = audio_path.rfind("/") + 1
+                    store.audio_dirs.append(store.strings.code(audio_path[:cut]))
+                    store.audio_files.append(audio_path[cut:])
+
+                if extra:
+                    store.message_extras[len(store.message_ids) - 1] = extra
+            store.session_ranges[session_id] = (start, len(store.message_ids))
+            store.session_blocks[session_id] = zlib.compress(bytes(block), COMPRESSION_LEVEL)
+        return store
+
+    # ---- queries ----
+
+    @property
+    def session_count(self):
+        return len(self.session_ids)
+
+    @property
+    def message_count(self):
+        return len(self.message_ids)
+
+    def message_count_for(self, session_id):
+        start, end = self.session_ranges.get(session_id, (0, 0))
+        return end - start
+
+    def average_length(self, role):
+        """Integer mean content length of the messages with a role (0 if none)."""
+        code = self.strings.find(role)
+        total = count = 0
+        if code is not None:
+            for r, length in zip(self.message_roles, self.message_lengths):
+                if r == code:
+                    total += length
+                    count += 1
+        return total // max(count, 1)
+
+    def model_ids(self):
+        """Distinct model ids of the sessions ('?' for sessions without one)."""
+        return {self._optional(code) or "?" for code in set(self.session_models)}
+
+    def session(self, row):
+        return SessionRecord(
+            self.session_ids[row],
+            self._optional(self.session_models[row]),
+            self.session_titles[row],
+            self.session_timestamps[row],
+            self._optional(self.session_modes[row]),
+            self._optional(self.session_mode_ids[row]),
+            self.message_count_for(self.session_ids[row]),
+        )
+
+    def sessions(self):
+        return [self.session(row) for row in range(len(self.session_ids))]
+
+    def session_contents(self, session_id, start, end):
+        """Contents of message rows start..end of a session (one block decompressed)."""
+        block = zlib.decompress(self.session_blocks[session_id])
+        contents = []
+        offset = 0
+        for row in range(start, end):
+            next_offset = self.message_offsets[row]
+            contents.append(block[offset:next_offset].decode("utf-8"))
+            offset = next_offset
+        return contents
+
+    def session_messages(self, session_id):
+        """Messages of a session ordered by timestamp; decodes only this session's contents."""
+        start, end = self.session_ranges.get(session_id, (0, 0))
+        if start == end:
+            return []
+        records = []
+        for row, content in zip(range(start, end), self.session_contents(session_id, start, end)):
+            audio_dir = self.audio_dirs[row]
+            records.append(MessageRecord(
+                self.message_ids[row],
+                session_id,
+                self.strings[self.message_roles[row]],
+                content,
+                self.message_timestamps[row],
+                None if audio_dir < 0 else self.strings[audio_dir] + self.audio_files[row],
+                self.message_extras.get(row),
+            ))
+        return records
+
+    # ---- lifetime ----
+
+    def retain(self):
+        """
+        Keep the store readable on a worker thread until release(); take the handle
+        on the thread that owns the store. In-memory stores have nothing to hold.
+        """
+        return self
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+    def iter_messages(self):
+        """All messages, session by session (one block decoded at a time)."""
+        for session_id in self.session_ranges:
+            yield from self.session_messages(session_id)
@@ -0,0 +1,296 @@
+"""
+Memory-mapped columnar snapshot of a ChatStore.
+Written once after an export is parsed, then reopened with mmap: the session list
+and statistics read fixed-width columns in place and message contents are decoded
+one message at a time from an offset-indexed UTF-8 blob, so reopening does not
+parse anything.
+
+Layout (native byte order, checked on open):
+    magic (8) | header offset (u64) | header length (u64)
+    sections, 8-byte aligned: fixed-width columns ("q" int64, "i" int32) and
+    string blobs indexed by an int64 offsets column with n + 1 entries
+    header JSON: section table, string table, extras, source fingerprint
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+
+from chat_model import ChatStore, StringTable
+
+MAGIC = b"AIHSNAP1"
+VERSION = 1
+SNAPSHOT_SUFFIX = ".snap"
+_PREAMBLE = struct.Struct("<8sQQ")
+
+
+def snapshot_path(export_path):
+    return export_path + SNAPSHOT_SUFFIX
+
+
+def source_fingerprint(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _string_column(values):
+    """(offsets, blob) for a list of optional strings; None is stored as empty."""
+    offsets = array("q", [0])
+    blob = bytearray()
+    for value in values:
+        if value:
+            blob += value.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+class _SectionWriter:
+    def __init__(self, f):
+        self.f = f
+        self.sections = {}
+
+    def add(self, name, fmt, data):
+        """Append one section; data is an array or bytes-like object."""
+        offset = self.f.tell()
+        raw = data.tobytes() if isinstance(data, array) else data
+        self.f.write(raw)
+        self.f.write(b"\0" * (-len(raw) % 8))
+        self.sections[name] = [offset, len(raw), fmt]
+
+    def add_stream(self, name, chunks):
+        """Append a "B" section from an iterable of byte chunks without joining them."""
+        offset = self.f.tell()
+        length = 0
+        for chunk in chunks:
+            self.f.write(chunk)
+            length += len(chunk)
+        self.f.write(b"\0" * (-length % 8))
+        self.sections[name] = [offset, length, "B"]
+
+
+def write_snapshot(store, path, source_path=None):
+    """Write a ChatStore to path atomically; returns the path."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, 0, 0))
+            out = _SectionWriter(f)
+
+            out.add("session.ids", "q", array("q", store.session_ids))
+            out.add("session.timestamps", "q", array("q", store.session_timestamps))
+            out.add("session.models", "i", array("i", store.session_models))
+            out.add("session.modes", "i", array("i", store.session_modes))
+            out.add("session.mode_ids", "i", array("i", store.session_mode_ids))
+            title_offsets, title_blob = _string_column(store.session_titles)
+            out.add("session.title_offsets", "q", title_offsets)
+            out.add("session.title_blob", "B", title_blob)
+
+            group_ids = array("q", store.session_ranges)
+            bounds = array("q", [0])
+            content_offsets = array("q", [0])
+            base = 0
+            for start, end in store.session_ranges.values():
+                bounds.append(end)
+                for row in range(start, end):
+                    content_offsets.append(base + store.message_offsets[row])
+                base = content_offsets[-1]
+            out.add("group.ids", "q", group_ids)
+            out.add("group.bounds", "q", bounds)
+
+            out.add("message.ids", "q", array("q", store.message_ids))
+            out.add("message.sessions", "q", array("q", store.message_sessions))
+            out.add("message.timestamps", "q", array("q", store.message_timestamps))
+            out.add("message.roles", "i", array("i", store.message_roles))
+            out.add("message.lengths", "i", array("i", store.message_lengths))
+            out.add("message.audio_dirs", "i", array("i", store.audio_dirs))
+            audio_offsets, audio_blob = _string_column(store.audio_files)
+            out.add("message.audio_offsets", "q", audio_offsets)
+            out.add("message.audio_blob", "B", audio_blob)
+            out.add("message.content_offsets", "q", content_offsets)
+            out.add_stream("message.content_blob", (
+                "".join(store.session_contents(sid, start, end)).encode("utf-8")
+                for sid, (start, end) in store.session_ranges.items()
+            ))
+
+            header = {
+                "version": VERSION,
+                "byteorder": sys.byteorder,
+                "source": source_fingerprint(source_path) if source_path else None,
+                "strings": store.strings.values,
+                "null_titles": [row for row, title in enumerate(store.session_titles) if title is None],
+                "session_extras": store.session_extras,
+                "message_extras": store.message_extras,
+                "next_session_id": store.next_session_id,
+                "next_message_id": store.next_message_id,
+                "sections": out.sections,
+            }
+            header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            header_offset = f.tell()
+            f.write(header_bytes)
+            f.seek(0)
+            f.write(_PREAMBLE.pack(MAGIC, header_offset, len(header_bytes)))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class StringColumn:
+    """Read-only list of strings backed by an offsets column and a UTF-8 blob."""
+
+    def __init__(self, offsets, blob, null_rows=()):
+        self.offsets = offsets
+        self.blob = blob
+        self.null_rows = set(null_rows)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if row in self.null_rows:
+            return None
+        return str(self.blob[self.offsets[row]:self.offsets[row + 1]], "utf-8")
+
+
+class SnapshotStore(ChatStore):
+    """ChatStore whose columns are views into a memory-mapped snapshot file."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._handles = 0
+        self._closing = False
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._file.close()
+            raise
+        # A header that parses but does not describe the file must not leave it mapped
+        # (nor locked, on Windows) behind the exception.
+        try:
+            magic, header_offset, header_length = _PREAMBLE.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError(f"not a chat snapshot: {path}")
+            self.header = json.loads(self._mmap[header_offset:header_offset + header_length])
+            self._map_columns()
+        except BaseException:
+            self.close()
+            raise
+
+    def _map_columns(self):
+        self._view = memoryview(self._mmap)
+        self._columns = []
+        col = self._column
+
+        self.strings = StringTable()
+        for value in self.header["strings"]:
+            self.strings.code(value)
+
+        self.session_ids = col("session.ids")
+        self.session_timestamps = col("session.timestamps")
+        self.session_models = col("session.models")
+        self.session_modes = col("session.modes")
+        self.session_mode_ids = col("session.mode_ids")
+        self.session_titles = StringColumn(
+            col("session.title_offsets"), col("session.title_blob"), self.header["null_titles"])
+        self.session_extras = {int(row): extra for row, extra in self.header["session_extras"].items()}
+
+        self.message_ids = col("message.ids")
+        self.message_sessions = col("message.sessions")
+        self.message_timestamps = col("message.timestamps")
+        self.message_roles = col("message.roles")
+        self.message_lengths = col("message.lengths")
+        self.audio_dirs = col("message.audio_dirs")
+        self.audio_files = StringColumn(col("message.audio_offsets"), col("message.audio_blob"))
+        self.content_offsets = col("message.content_offsets")
+        self.content_blob = col("message.content_blob")
+        self.message_extras = {int(row): extra for row, extra in self.header["message_extras"].items()}
+
+        bounds = col("group.bounds")
+        self.session_ranges = dict(zip(col("group.ids"), zip(bounds[:-1], bounds[1:])))
+        self.next_session_id = self.header["next_session_id"]
+        self.next_message_id = self.header["next_message_id"]
+
+    def _column(self, name):
+        offset, length, fmt = self.header["sections"][name]
+        column = self._view[offset:offset + length].cast(fmt)
+        self._columns.append(column)
+        return column
+
+    def session_contents(self, session_id, start, end):
+        """Decode only the requested messages straight from the mapped blob."""
+        offsets = self.content_offsets
+        blob = self.content_blob
+        return [str(blob[offsets[row]:offsets[row + 1]], "utf-8") for row in range(start, end)]
+
+    def retain(self):
+        with self._lock:
+            if self._closing:
+                raise ValueError(f"snapshot is closed: {self.path}")
+            self._handles += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._handles -= 1
+            unmap = self._closing and self._handles == 0
+        if unmap:
+            self._unmap()
+
+    def close(self):
+        """
+        Release the mapping (views handed out by this store become invalid); while
+        worker handles are retained, it is released when the last one is.
+        """
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            unmap = self._handles == 0
+        if unmap:
+            self._unmap()
+
+    def _unmap(self):
+        self.session_titles = self.audio_files = None
+        for column in getattr(self, "_columns", ()):
+            column.release()
+        self._columns = []
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        self._mmap.close()
+        self._file.close()
+
+
+def open_snapshot(path, source_path=None):
+    """
+    Open a snapshot if it exists, matches this platform and format version and,
+    when source_path is given, was written from the current version of that file.
+    Returns a SnapshotStore or None.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        store = SnapshotStore(path)
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return None
+    header = store.header
+    stale = (
+        header.get("version") != VERSION
+        or header.get("byteorder") != sys.byteorder
+        or (source_path is not None and header.get("source") != source_fingerprint(source_path))
+    )
+    if stale:
+        store.close()
+        return None
+    return store
@@ -0,0 +1,321 @@
+"""
+Batch validator for METODI_CODICE answers.
+Every snippet (assistant messages of code sessions, `examples` of metodi_codice.json)
+runs as a notebook cell in its own Python subprocess with CPU-time and memory
+limits, a minimal environment, a stub `display` and the Agg matplotlib backend; a
+pool of workers keeps several of them running at once. Results are cached by hash
+of the content and the limits, so re-checking an export only runs the snippets
+that changed.
+
+Usage: python code_check.py --export chat_export.json [--corpus] [--workers 8]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+CODE_MODE = "METODI_CODICE"
+CODE_MODE_ID = "metodi_code"
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                           "app", "src", "main", "res", "raw", "metodi_codice.json")
+DEFAULT_ROOT = os.environ.get(
+    "AIHELPER_CODE_RESULTS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "code_results"),
+)
+
+PASS = "pass"
+FAIL = "fail"
+TIMEOUT = "timeout"
+MISSING = "missing"  # a module the snippet imports is not installed here: not the answer's fault
+
+CPU_SECONDS = 10
+MEMORY_MB = 1024
+WALL_SECONDS = 30
+MAX_OUTPUT = 2000
+
+# Same fence syntax the watch renders (MathMarkdownText.kt); bare answers are code already.
+_FENCE = re.compile(r"```[A-Za-z0-9_+\-.]*[ \t]*\r?\n([\s\S]*?)```")
+_MISSING_MODULE = re.compile(r"ModuleNotFoundError: No module named '([^']+)'")
+_FIGURES = "@@figures "
+_LIMIT_SIGNALS = {getattr(signal, name) for name in ("SIGXCPU", "SIGKILL") if hasattr(signal, name)}
+
+# Runs inside the sandbox: argv = cpu seconds, memory MB; the cell source comes on stdin.
+# Like Jupyter, a trailing expression is displayed.
+RUNNER = r'''
+import ast, sys, warnings
+try:
+    import resource
+except ImportError:
+    resource = None
+if resource is not None:
+    cpu, memory = int(sys.argv[1]), int(sys.argv[2]) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    if memory:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+warnings.filterwarnings("ignore", message=".*non-interactive.*")
+
+def display(*objs, **kwargs):
+    for obj in objs:
+        print(repr(obj))
+
+source = sys.stdin.read()
+tree = ast.parse(source, "<cell>")
+last = None
+if tree.body and isinstance(tree.body[-1], ast.Expr):
+    last = ast.Expression(tree.body.pop().value)
+namespace = {"__name__": "__main__", "display": display}
+exec(compile(tree, "<cell>", "exec"), namespace)
+if last is not None:
+    value = eval(compile(last, "<cell>", "eval"), namespace)
+    if value is not None:
+        display(value)
+sys.stdout.flush()
+pyplot = sys.modules.get("matplotlib.pyplot")
+print("@@figures %d" % (len(pyplot.get_fignums()) if pyplot else 0), file=sys.stderr)
+'''
+# Bump when RUNNER semantics change so cached results are not reused.
+RUNNER_VERSION = "1"
+
+SANDBOX_ENV = {
+    "MPLBACKEND": "Agg",
+    "OPENBLAS_NUM_THREADS": "1",
+    "OMP_NUM_THREADS": "1",
+    "MKL_NUM_THREADS": "1",
+    "PYTHONDONTWRITEBYTECODE": "1",
+    "PYTHONIOENCODING": "utf-8",
+}
+# Inherited from the caller; everything else (tokens, DISPLAY, PYTHONPATH...) stays out.
+# Python needs SYSTEMROOT to start on Windows.
+INHERITED_ENV = ("PATH", "SYSTEMROOT")
+
+
+def extract_code(content):
+    """Python source of an answer: its fenced blocks if any, otherwise the whole text."""
+    blocks = _FENCE.findall(content)
+    if blocks:
+        return "\n\n".join(block.strip("\n") for block in blocks)
+    return content.strip()
+
+
+def code_key(code, cpu_seconds=CPU_SECONDS, memory_mb=MEMORY_MB, wall_seconds=WALL_SECONDS):
+    """Cache key: a result only holds for the limits it ran under."""
+    limits = f"{cpu_seconds}:{memory_mb}:{wall_seconds}"
+    return hashlib.sha256(f"{RUNNER_VERSION}\0{limits}\0{code}".encode("utf-8")).hexdigest()
+
+
+def is_code_session(session):
+    return session.mode == CODE_MODE or session.mode_id == CODE_MODE_ID
+
+
+def code_session_ids(chat_store):
+    return {s.id for s in chat_store.sessions() if is_code_session(s)}
+
+
+def export_snippets(chat_store):
+    """(message id, code) for the assistant messages of METODI_CODICE sessions."""
+    for session_id in code_session_ids(chat_store):
+        for msg in chat_store.session_messages(session_id):
+            if msg.role == "assistant":
+                code = extract_code(msg.content)
+                if code:
+                    yield msg.id, code
+
+
+def corpus_snippets(path=CORPUS_PATH):
+    """(example id, code) for the reference examples of metodi_codice.json."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for example in data.get("examples", []):
+        code = example.get("code")
+        if code:
+            yield example.get("id"), code
+
+
+class ResultStore:
+    """Content-addressed JSON results, one file per snippet (same layout as the render store)."""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def path_for_key(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, code, **limits):
+        try:
+            with open(self.path_for_key(code_key(code, **limits)), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, code, result, **limits):
+        path = self.path_for_key(code_key(code, **limits))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+
+def run_snippet(code, cpu_seconds=CPU_SECONDS, memory_mb=MEMORY_MB, wall_seconds=WALL_SECONDS):
+    """
+    Run one snippet in a fresh interpreter inside a scratch directory.
+    Returns {"status", "runtime", "output", "error", "figures"}.
+    """
+    command = [sys.executable, "-c", RUNNER, str(cpu_seconds), str(memory_mb)]
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="code_check_") as scratch:
+        env = {key: os.environ[key] for key in INHERITED_ENV if key in os.environ}
+        env.update(SANDBOX_ENV, HOME=scratch)
+        try:
+            proc = subprocess.run(command, input=code, cwd=scratch, env=env, capture_output=True,
+                                  text=True, encoding="utf-8", errors="replace", timeout=wall_seconds)
+        except subprocess.TimeoutExpired as e:
+            output = e.stdout or ""
+            if isinstance(output, bytes):
+                output = output.decode("utf-8", "replace")
+            return {"status": TIMEOUT, "runtime": round(time.perf_counter() - start, 3),
+                    "output": output[-MAX_OUTPUT:], "error": f"wall time over {wall_seconds}s", "figures": 0}
+    runtime = round(time.perf_counter() - start, 3)
+
+    figures = 0
+    errors = []
+    for line in proc.stderr.splitlines():
+        if line.startswith(_FIGURES):
+            figures = int(line[len(_FIGURES):])
+        elif line.strip():
+            errors.append(line)
+
+    if proc.returncode == 0:
+        status, error = PASS, ""
+    elif resource_killed(proc.returncode):
+        status, error = TIMEOUT, f"CPU time over {cpu_seconds}s"
+    else:
+        error = errors[-1] if errors else f"exit code {proc.returncode}"
+        status = MISSING if _MISSING_MODULE.search(error) else FAIL
+    return {"status": status, "runtime": runtime, "output": proc.stdout[-MAX_OUTPUT:],
+            "error": error, "figures": figures}
+
+
+def resource_killed(returncode):
+    """True when the CPU limit (SIGXCPU, or SIGKILL at the hard limit) ended the process."""
+    return returncode < 0 and -returncode in _LIMIT_SIGNALS
+
+
+def check_snippets(snippets, store=None, workers=None, use_cache=True, on_result=None, **limits):
+    """
+    Validate (key, code) pairs on a pool of sandbox processes.
+    on_result(key, result, cached) is called on the calling thread as results arrive.
+    Returns {key: result}.
+    """
+    results = {}
+    pending = {}
+    for key, code in snippets:
+        cached = store.get(code, **limits) if store and use_cache else None
+        if cached is not None:
+            results[key] = cached
+            if on_result:
+                on_result(key, cached, True)
+        else:
+            pending.setdefault(code, []).append(key)
+
+    # The sandboxes are the processes; threads only wait on them.
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_snippet, code, **limits): code for code in pending}
+        for future in as_completed(futures):
+            code = futures[future]
+            result = future.result()
+            # Missing modules depend on this machine, not on the snippet: re-run them next time.
+            if store and result["status"] != MISSING:
+                store.put(code, result, **limits)
+            for key in pending[code]:
+                results[key] = result
+                if on_result:
+                    on_result(key, result, False)
+    return results
+
+
+def summarize(results):
+    counts = {PASS: 0, FAIL: 0, TIMEOUT: 0, MISSING: 0}
+    for result in results.values():
+        counts[result["status"]] += 1
+    return counts
+
+
+BADGES = {PASS: "✓", FAIL: "✗", TIMEOUT: "⏱", MISSING: "⚠"}
+
+
+def badge_text(result):
+    """Short label for the message view."""
+    if result is None:
+        return "· not checked"
+    status = result["status"]
+    if status == PASS:
+        figures = result.get("figures", 0)
+        return f"✓ runs {result['runtime']:.2f}s" + (f", {figures} plot(s)" if figures else "")
+    if status == MISSING:
+        match = _MISSING_MODULE.search(result["error"])
+        return f"⚠ needs {match.group(1) if match else 'a module'}"
+    if status == TIMEOUT:
+        return f"⏱ {result['error']}"
+    return f"✗ {result['error'][:60]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run METODI_CODICE answers and examples in a sandbox")
+    parser.add_argument("--export", help="chat export whose METODI_CODICE answers are checked")
+    parser.add_argument("--corpus", nargs="?", const=CORPUS_PATH, metavar="JSON",
+                        help="also check the metodi_codice.json examples (default corpus if no path)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cpu-seconds", type=int, default=CPU_SECONDS)
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_MB, help="address-space limit (0 = none)")
+    parser.add_argument("--timeout", type=float, default=WALL_SECONDS, help="wall-clock limit per snippet")
+    parser.add_argument("--no-cache", action="store_true", help="re-run snippets with a cached result")
+    args = parser.parse_args()
+    if not args.export and not args.corpus:
+        parser.error("nothing to check: pass --export and/or --corpus")
+
+    snippets = []
+    if args.export:
+        from chat_model import ChatStore
+        with open(args.export, "r", encoding="utf-8") as f:
+            store = ChatStore.from_export(json.load(f))
+        snippets += [(f"message {key}", code) for key, code in export_snippets(store)]
+    if args.corpus:
+        snippets += [(f"example {key}", code) for key, code in corpus_snippets(args.corpus)]
+
+    cached_count = 0
+
+    def report(key, result, cached):
+        nonlocal cached_count
+        cached_count += cached
+        if result["status"] != PASS:
+            print(f"{BADGES[result['status']]} {key}: {result['error']}")
+
+    start = time.perf_counter()
+    results = check_snippets(snippets, ResultStore(), workers=args.workers, use_cache=not args.no_cache,
+                             on_result=report, cpu_seconds=args.cpu_seconds,
+                             memory_mb=args.memory_mb, wall_seconds=args.timeout)
+    counts = summarize(results)
+    print(f"✓ {counts[PASS]} passed, ✗ {counts[FAIL]} failed, ⏱ {counts[TIMEOUT]} timed out, "
+          f"⚠ {counts[MISSING]} missing modules ({cached_count} cached) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 1 if counts[FAIL] or counts[TIMEOUT] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
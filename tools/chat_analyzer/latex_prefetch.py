@@ -0,0 +1,196 @@
+"""
+Background LaTeX prefetcher for the Chat Analyzer.
+Ranks every formula of a loaded export by frequency and session recency and fills
+the shared render store from a small thread pool, so opening a session usually
+finds its formulas already on disk.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from latex_cache.segments import iter_formulas, render_payload, strip_delimiters
+from latex_cache.store import fetch_png, payload_key
+
+# Queue tiers: formulas of the open session always come first.
+TIER_SESSION = 0
+TIER_BACKGROUND = 1
+
+
+def rank_formulas(chat_store):
+    """
+    Collect assistant formulas of a loaded export (chat_model.ChatStore).
+    Returns ({payload: score}, {session_id: [payload, ...]}); higher score = fetch sooner.
+    """
+    by_recency = sorted(chat_store.sessions(), key=lambda s: s.timestamp)
+    # 0.0 for the oldest session, 1.0 for the newest one.
+    recency = {
+        s.id: (i / (len(by_recency) - 1) if len(by_recency) > 1 else 1.0)
+        for i, s in enumerate(by_recency)
+    }
+
+    counts = {}
+    best_recency = {}
+    session_payloads = {}
+    for msg in chat_store.iter_messages():
+        if msg.role != "assistant":
+            continue
+        sid = msg.session_id
+        for formula in iter_formulas(msg.content):
+            latex, is_display = strip_delimiters(formula)
+            if not latex:
+                continue
+            payload = render_payload(latex, is_display)
+            counts[payload] = counts.get(payload, 0) + 1
+            best_recency[payload] = max(best_recency.get(payload, 0.0), recency.get(sid, 0.0))
+            session_payloads.setdefault(sid, []).append(payload)
+
+    scores = {p: counts[p] * (1.0 + best_recency[p]) for p in counts}
+    return scores, session_payloads
+
+
+class LatexPrefetcher:
+    def __init__(self, store, workers=4, rate_limit=8.0, fetch=fetch_png, on_progress=None):
+        """
+        store: latex_cache RenderStore to fill.
+        workers: concurrent fetches.
+        rate_limit: max fetch starts per second across all workers (0 = unlimited).
+        on_progress: called from worker threads with (done, total, failed).
+        """
+        self.store = store
+        self.workers = max(1, workers)
+        self.min_interval = 1.0 / rate_limit if rate_limit > 0 else 0.0
+        self.fetch = fetch
+        self.on_progress = on_progress
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._selections = itertools.count(1)
+        self._priority = {}
+        self._session_payloads = {}
+        self._done = set()
+        self._failed = set()
+        self._total = 0
+        self._generation = 0
+        self._loads = 0
+        self._selected_session = None
+        self._next_start = 0.0
+        self._threads = []
+        self._stopped = False
+
+    def load(self, chat_store):
+        """
+        Replace the queue with every formula of a freshly loaded export.
+        Ranking scans the whole export, so call this off the UI thread: the queue is
+        built without the lock and swapped in at the end, and a load overtaken by a
+        newer one is dropped.
+        """
+        with self._cond:
+            self._loads += 1
+            ticket = self._loads
+        scores, session_payloads = rank_formulas(chat_store)
+        heap = []
+        priority = {}
+        for payload, score in scores.items():
+            if self.store.contains_key(payload_key(payload)):
+                continue
+            priority[payload] = (TIER_BACKGROUND, -score, 0)
+            heap.append((priority[payload], next(self._seq), payload))
+        heapq.heapify(heap)
+
+        with self._cond:
+            if ticket != self._loads:
+                return
+            self._generation += 1
+            self._heap = heap
+            self._priority = priority
+            self._done = set()
+            self._failed = set()
+            self._session_payloads = session_payloads
+            self._total = len(priority)
+            # A session opened while ranking ran still goes first.
+            if self._selected_session is not None:
+                self._prioritize(self._selected_session)
+            self._cond.notify_all()
+        self._ensure_workers()
+
+    def prioritize_session(self, session_id):
+        """Move the formulas of the selected session to the front of the queue."""
+        with self._cond:
+            self._selected_session = session_id
+            self._prioritize(session_id)
+            self._cond.notify_all()
+
+    def _prioritize(self, session_id):
+        # The latest selection outranks sessions opened before it.
+        selection = -next(self._selections)
+        for order, payload in enumerate(self._session_payloads.get(session_id, ())):
+            current = self._priority.get(payload)
+            if current is not None and current[:2] != (TIER_SESSION, selection):
+                # Keep message order inside the session so the top of the view fills first.
+                self._push(payload, (TIER_SESSION, selection, order))
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return len(self._done), self._total, len(self._failed)
+
+    def _push(self, payload, priority):
+        self._priority[payload] = priority
+        heapq.heappush(self._heap, (priority, next(self._seq), payload))
+
+    def _pop(self):
+        """Block until a queued payload is available; stale heap entries are skipped."""
+        with self._cond:
+            while not self._stopped:
+                while self._heap:
+                    priority, _, payload = heapq.heappop(self._heap)
+                    if self._priority.get(payload) == priority:
+                        del self._priority[payload]
+                        return payload, self._generation
+                self._cond.wait()
+            return None, None
+
+    def _wait_for_rate_slot(self):
+        if not self.min_interval:
+            return
+        with self._cond:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            payload, generation = self._pop()
+            if payload is None:
+                return
+            ok = True
+            key = payload_key(payload)
+            if not self.store.contains_key(key):
+                self._wait_for_rate_slot()
+                try:
+                    self.store.put_key(key, self.fetch(payload))
+                except Exception:
+                    ok = False
+            with self._cond:
+                if generation != self._generation:
+                    continue
+                (self._done if ok else self._failed).add(payload)
+                progress = (len(self._done), self._total, len(self._failed))
+            if self.on_progress:
+                self.on_progress(*progress)
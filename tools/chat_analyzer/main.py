@@ -5,29 +5,46 @@ GUI application for analyzing chat history - VS Code Dark Theme
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
+import argparse
 import json
-import subprocess
 import os
 from datetime import datetime
 import threading
 import re
 import io
-import tempfile
-import urllib.parse
-import urllib.request
-
-# LaTeX image support for online rendering
-try:
-    from PIL import Image, ImageTk
-    LATEX_AVAILABLE = True
-except ImportError:
-    LATEX_AVAILABLE = False
+import sys
+import time
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from latex_cache.segments import TEXT, LATEX, iter_segments, render_payload, strip_delimiters
+from latex_cache.store import RenderStore, fetch_png
+from adb_watcher import DeviceWatcher, retrieve_export
+from chat_model import ChatStore
+from code_check import (PASS, MISSING, ResultStore, badge_text, check_snippets, code_session_ids,
+                        export_snippets, extract_code)
+from chat_snapshot import open_snapshot, snapshot_path, write_snapshot
+from latex_prefetch import LatexPrefetcher
+from model_compare import COLUMNS as COMPARE_COLUMNS, Cohort, compare, format_row, load_store
+from session_export import ExportCancelled, export_sessions
+from session_index import ALL, SORT_COLUMNS, SessionIndex, day_after, parse_day
+from perf_trace import trace
+
+# LaTeX image support for online rendering (Pillow is imported on first render)
+LATEX_AVAILABLE = importlib.util.find_spec("PIL") is not None
+if not LATEX_AVAILABLE:
     print("Warning: pillow not installed. Online LaTeX image rendering disabled.")
     print("Install with: pip install pillow")
 
+# Build the full UI at the latest this long after start, even if no Expose arrives.
+UI_BUILD_FALLBACK_MS = 300
+
 
 class ChatAnalyzer:
-    def __init__(self, root):
+    SESSION_HEADINGS = {"title": "Title", "model": "Model", "date": "Date", "msgs": "#"}
+    ALL_FILTER = "All"
+
+    def __init__(self, root, prefetch_workers=4, prefetch_rate=8.0, use_snapshots=True, auto_ingest=False):
         self.root = root
         self.root.title("AI Helper WearOS - Chat Analyzer")
         self.root.geometry("1000x750")
@@ -51,13 +68,74 @@ class ChatAnalyzer:
 
         self.root.configure(bg=self.colors["bg"])
 
-        self.chat_data = None
+        self.chat_store = None
+        self.session_index = None
+        self.session_page = 0
+        self.use_snapshots = use_snapshots
         self.current_session_messages = []
         self.latex_images = []  # Keep references to prevent garbage collection
         self.latex_image_cache = {}
+        self.render_store = RenderStore()
+        self.prefetcher = None
+        if LATEX_AVAILABLE and prefetch_workers > 0:
+            self.prefetcher = LatexPrefetcher(
+                self.render_store,
+                workers=prefetch_workers,
+                rate_limit=prefetch_rate,
+                on_progress=self.on_prefetch_progress
+            )
+
+        self.auto_ingest = auto_ingest
+        self.device_watcher = DeviceWatcher(
+            on_devices=lambda devices: self.root.after(0, lambda: self.on_devices_changed(devices)),
+            on_export=lambda device: self.root.after(0, lambda: self.on_export_available(device)),
+            on_error=lambda message: self.root.after(0, lambda: self.status_var.set(f"✗ {message[:30]}")),
+            auto_ingest=auto_ingest
+        )
+        self.retrieving = set()
+
+        self.code_results = ResultStore()
+        self.code_sessions = None  # ids of METODI_CODICE sessions, computed on first display
+        self.code_check_running = False
+
+        self.export_cancel = None  # threading.Event of the running bulk export
+        self.copy_running = False
+
+        self.compare_window = None
+        self.compare_cohorts = []  # Cohort list; path None = the export loaded in the main window
+
+        self.trace_overlay = None
+        self.first_paint = None  # perf_counter() when the loading screen was first drawn
+        self.ui_ready = False
+        self.pending_export = None
+        self.load_generation = 0
 
         self.setup_styles()
-        self.create_widgets()
+
+        # Paint a loading screen right away; widgets are built once it is on screen.
+        self.loading_label = tk.Label(self.root, text="⏳ Loading Chat Analyzer...", font=("Consolas", 12),
+                                      fg=self.colors["text_dim"], bg=self.colors["bg"])
+        self.loading_label.pack(expand=True)
+        self.loading_label.bind("<Expose>", self.on_first_paint)
+        self.root.after(UI_BUILD_FALLBACK_MS, self.build_ui)
+
+    def on_first_paint(self, event=None):
+        if self.first_paint is None:
+            self.first_paint = time.perf_counter()
+            self.root.after_idle(self.build_ui)
+
+    def build_ui(self):
+        if self.ui_ready:
+            return
+        with trace.span("build_ui"):
+            self.loading_label.destroy()
+            self.create_widgets()
+            if trace.enabled():
+                self.create_trace_overlay()
+        self.ui_ready = True
+        if self.pending_export:
+            self.load_json_from_path(self.pending_export)
+            self.pending_export = None
 
     def setup_styles(self):
         style = ttk.Style()
@@ -115,9 +193,22 @@ class ChatAnalyzer:
         retrieve_btn = ttk.Button(adb_frame, text="📥 Retrieve & Clean", command=self.retrieve_from_device)
         retrieve_btn.pack(side=tk.LEFT, padx=3)
 
+        self.auto_ingest_var = tk.BooleanVar(value=self.auto_ingest)
+        auto_check = tk.Checkbutton(adb_frame, text="Auto-ingest", variable=self.auto_ingest_var,
+                                    command=self.toggle_auto_ingest, font=("Consolas", 9),
+                                    fg=c["text"], bg=c["sidebar"], selectcolor=c["bg"],
+                                    activebackground=c["sidebar"], activeforeground=c["text"])
+        auto_check.pack(side=tk.LEFT, padx=3)
+
         load_btn = ttk.Button(adb_frame, text="📂 Load File", command=self.load_json_file)
         load_btn.pack(side=tk.LEFT, padx=3)
 
+        check_btn = ttk.Button(adb_frame, text="🧪 Check Code", command=self.check_code_answers)
+        check_btn.pack(side=tk.LEFT, padx=3)
+
+        compare_btn = ttk.Button(adb_frame, text="⚖ Compare", command=self.open_comparison)
+        compare_btn.pack(side=tk.LEFT, padx=3)
+
         # Status
         self.status_var = tk.StringVar(value="Ready")
         status_label = ttk.Label(adb_frame, textvariable=self.status_var, style="Stats.TLabel", background=c["sidebar"])
@@ -156,14 +247,51 @@ class ChatAnalyzer:
         tk.Label(sessions_header, text="📋 Sessions", font=("Consolas", 10, "bold"),
                 fg=c["blue"], bg=c["sidebar"]).pack(side=tk.LEFT)
 
+        # Filters: mode / model comboboxes and a YYYY-MM-DD date range
+        filter_frame = tk.Frame(left_frame, bg=c["sidebar"])
+        filter_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        self.mode_filter = ttk.Combobox(filter_frame, width=14, state="readonly", font=("Consolas", 9))
+        self.mode_filter.pack(side=tk.LEFT, padx=(0, 4))
+        self.model_filter = ttk.Combobox(filter_frame, width=18, state="readonly", font=("Consolas", 9))
+        self.model_filter.pack(side=tk.LEFT)
+        for combo in (self.mode_filter, self.model_filter):
+            combo["values"] = (self.ALL_FILTER,)
+            combo.current(0)
+            combo.bind("<<ComboboxSelected>>", self.apply_session_filters)
+
+        date_frame = tk.Frame(left_frame, bg=c["sidebar"])
+        date_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        self.date_from_var = tk.StringVar()
+        self.date_to_var = tk.StringVar()
+        for label, var in (("From", self.date_from_var), ("To", self.date_to_var)):
+            tk.Label(date_frame, text=label, font=("Consolas", 9),
+                     fg=c["text_dim"], bg=c["sidebar"]).pack(side=tk.LEFT)
+            entry = tk.Entry(date_frame, textvariable=var, width=11, font=("Consolas", 9),
+                             bg=c["bg"], fg=c["text"], insertbackground=c["text"], relief=tk.FLAT)
+            entry.pack(side=tk.LEFT, padx=(4, 8))
+            entry.bind("<Return>", self.apply_session_filters)
+            entry.bind("<FocusOut>", self.apply_session_filters)
+
+        # Pager (packed before the tree so it stays visible at the bottom)
+        pager_frame = tk.Frame(left_frame, bg=c["sidebar"])
+        pager_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=(0, 5))
+        prev_btn = ttk.Button(pager_frame, text="◀", width=3,
+                              command=lambda: self.show_session_page(self.session_page - 1))
+        prev_btn.pack(side=tk.LEFT)
+        next_btn = ttk.Button(pager_frame, text="▶", width=3,
+                              command=lambda: self.show_session_page(self.session_page + 1))
+        next_btn.pack(side=tk.RIGHT)
+        self.page_var = tk.StringVar(value="")
+        tk.Label(pager_frame, textvariable=self.page_var, font=("Consolas", 9),
+                 fg=c["text_dim"], bg=c["sidebar"]).pack(side=tk.LEFT, expand=True)
+
         self.sessions_tree = ttk.Treeview(left_frame,
-                                         columns=("title", "model", "date", "msgs"),
+                                         columns=SORT_COLUMNS,
                                          show="headings",
                                          height=20)
-        self.sessions_tree.heading("title", text="Title")
-        self.sessions_tree.heading("model", text="Model")
-        self.sessions_tree.heading("date", text="Date")
-        self.sessions_tree.heading("msgs", text="#")
+        for column in SORT_COLUMNS:
+            self.sessions_tree.heading(column, text=self.SESSION_HEADINGS[column],
+                                       command=lambda col=column: self.sort_sessions(col))
         self.sessions_tree.column("title", width=120)
         self.sessions_tree.column("model", width=80)
         self.sessions_tree.column("date", width=80)
@@ -191,6 +319,11 @@ class ChatAnalyzer:
                             command=self.copy_session_json)
         copy_btn.pack(side=tk.RIGHT, padx=5)
 
+        self.export_btn = tk.Button(msg_header, text="💾 Export...", font=("Consolas", 9),
+                                    bg=c["accent"], fg="white", relief=tk.FLAT,
+                                    command=self.show_export_menu)
+        self.export_btn.pack(side=tk.RIGHT, padx=5)
+
         # Messages text
         self.messages_text = scrolledtext.ScrolledText(
             right_frame,
@@ -212,64 +345,120 @@ class ChatAnalyzer:
         self.messages_text.tag_configure("timestamp", foreground=c["text_dim"])
         self.messages_text.tag_configure("latex", foreground=c["yellow"], font=("Consolas", 10))
         self.messages_text.tag_configure("separator", foreground=c["border"])
-
-        # Initial refresh
-        self.root.after(500, self.refresh_devices)
+        self.messages_text.tag_configure("badge_pass", foreground=c["green"], font=("Consolas", 9))
+        self.messages_text.tag_configure("badge_fail", foreground=c["orange"], font=("Consolas", 9))
+        # A missing module says nothing about the answer: neither pass nor fail colours.
+        self.messages_text.tag_configure("badge_missing", foreground=c["text"], font=("Consolas", 9))
+        self.messages_text.tag_configure("badge_none", foreground=c["text_dim"], font=("Consolas", 9))
+
+        # Device list is kept current by one long-lived `adb track-devices` stream
+        self.device_watcher.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         if not LATEX_AVAILABLE:
             self.root.after(
                 1000,
                 lambda: self.status_var.set("⚠ LaTeX renderer non disponibile (fallback testuale)")
             )
 
+    def create_trace_overlay(self):
+        """Live span timings over the message pane (F12 toggles, Ctrl+Shift+T exports)."""
+        c = self.colors
+        self.trace_overlay = tk.Label(
+            self.messages_text, justify=tk.LEFT, anchor="nw", font=("Consolas", 8),
+            fg=c["yellow"], bg=c["sidebar"], relief=tk.SOLID, bd=1, padx=6, pady=4
+        )
+        self.trace_overlay.place(relx=1.0, rely=0.0, x=-20, y=4, anchor="ne")
+        self.root.bind("<F12>", self.toggle_trace_overlay)
+        self.root.bind("<Control-T>", self.export_trace)
+        self.refresh_trace_overlay()
+
+    def refresh_trace_overlay(self):
+        if self.trace_overlay.winfo_ismapped():
+            lines = trace.summary_lines()
+            self.trace_overlay.config(text="\n".join(lines) if lines else "⏱ tracing: no spans yet")
+        self.root.after(500, self.refresh_trace_overlay)
+
+    def toggle_trace_overlay(self, event=None):
+        if self.trace_overlay.winfo_ismapped():
+            self.trace_overlay.place_forget()
+        else:
+            self.trace_overlay.place(relx=1.0, rely=0.0, x=-20, y=4, anchor="ne")
+
+    def export_trace(self, event=None):
+        path = trace.output_path() or filedialog.asksaveasfilename(
+            title="Save Chrome Trace",
+            defaultextension=".json",
+            initialfile="chat_analyzer_trace.json",
+            filetypes=[("Chrome trace", "*.json")]
+        )
+        if path:
+            trace.export_chrome_trace(path)
+            self.status_var.set(f"✓ Trace saved to {os.path.basename(path)}")
+
     def refresh_devices(self):
-        try:
-            result = subprocess.run(["adb", "devices"], capture_output=True, text=True, timeout=5)
-            devices = []
-            for line in result.stdout.strip().split("\n")[1:]:
-                if "\tdevice" in line:
-                    devices.append(line.split("\t")[0])
-
-            self.device_combo["values"] = devices
-            if devices:
-                self.device_combo.current(0)
-                self.status_var.set(f"✓ {len(devices)} device(s) found")
-            else:
-                self.status_var.set("⚠ No devices")
-        except FileNotFoundError:
-            self.status_var.set("✗ ADB not found")
-        except Exception as e:
-            self.status_var.set(f"✗ {str(e)[:30]}")
+        """Reconnect the device watcher (e.g. after installing adb or restarting its server)."""
+        self.device_watcher.stop()
+        self.device_watcher.start()
+        self.status_var.set("⏳ Tracking devices...")
+
+    def on_devices_changed(self, devices):
+        current = self.device_combo.get()
+        self.device_combo["values"] = devices
+        if current in devices:
+            self.device_combo.set(current)
+        elif devices:
+            self.device_combo.current(0)
+        else:
+            self.device_combo.set("")
+
+        if devices:
+            self.status_var.set(f"✓ {len(devices)} device(s) connected")
+        else:
+            self.status_var.set("⚠ No devices")
+
+    def toggle_auto_ingest(self):
+        self.auto_ingest = self.auto_ingest_var.get()
+        self.device_watcher.set_auto_ingest(self.auto_ingest)
+        self.status_var.set("✓ Auto-ingest on" if self.auto_ingest else "Auto-ingest off")
 
-    def retrieve_from_device(self):
-        device = self.device_combo.get()
+    def on_export_available(self, device):
+        if self.auto_ingest:
+            self.status_var.set(f"⏳ New export on {device[:15]}")
+            self.retrieve_from_device(device, quiet=True)
+
+    def on_close(self):
+        self.device_watcher.stop()
+        self.root.destroy()
+
+    def retrieve_from_device(self, device=None, quiet=False):
+        device = device or self.device_combo.get()
         if not device:
             messagebox.showwarning("Warning", "No device selected")
             return
+        if device in self.retrieving:
+            return
+        self.retrieving.add(device)
 
         self.status_var.set("⏳ Retrieving...")
 
         def do_retrieve():
             try:
-                remote_path = "/sdcard/Download/aihelper_chat_export.json"
                 local_path = os.path.join(os.getcwd(), "chat_export.json")
-
-                pull = subprocess.run(["adb", "-s", device, "pull", remote_path, local_path],
-                                      capture_output=True, text=True, timeout=30)
-
-                if pull.returncode != 0:
+                if not retrieve_export(device, local_path, adb=self.device_watcher.adb):
                     self.root.after(0, lambda: self.status_var.set("⚠ No export found"))
-                    self.root.after(0, lambda: messagebox.showinfo("Info",
-                        "Export file not found.\n\nIn the app: Settings → 📤 Export Chat"))
+                    if not quiet:
+                        self.root.after(0, lambda: messagebox.showinfo("Info",
+                            "Export file not found.\n\nIn the app: Settings → 📤 Export Chat"))
                     return
 
-                subprocess.run(["adb", "-s", device, "shell", "rm", remote_path],
-                              capture_output=True, timeout=10)
-
                 self.root.after(0, lambda: self.load_json_from_path(local_path))
                 self.root.after(0, lambda: self.status_var.set(f"✓ Retrieved from {device[:15]}"))
 
             except Exception as e:
-                self.root.after(0, lambda: self.status_var.set(f"✗ {str(e)[:25]}"))
+                error = e
+                self.root.after(0, lambda: self.status_var.set(f"✗ {str(error)[:25]}"))
+            finally:
+                self.root.after(0, lambda: self.retrieving.discard(device))
 
         threading.Thread(target=do_retrieve, daemon=True).start()
 
@@ -282,51 +471,180 @@ class ChatAnalyzer:
             self.load_json_from_path(filepath)
 
     def load_json_from_path(self, filepath):
+        """Parse the export on a worker thread; widgets are filled back on the Tk thread."""
+        if not self.ui_ready:
+            self.pending_export = filepath
+            return
+
+        self.load_generation += 1
+        generation = self.load_generation
+        self.status_var.set(f"⏳ Loading {os.path.basename(filepath)}...")
+
+        def do_load():
+            snap_path = snapshot_path(filepath)
+            store = None
+            try:
+                if self.use_snapshots:
+                    with trace.span("open_snapshot"):
+                        store = open_snapshot(snap_path, filepath)
+                from_snapshot = store is not None
+                if store is None:
+                    with trace.span("json.load", path=os.path.basename(filepath)):
+                        with open(filepath, "r", encoding="utf-8") as f:
+                            data = json.load(f)
+                    with trace.span("ChatStore.from_export"):
+                        store = ChatStore.from_export(data)
+                    del data
+            except Exception as e:
+                error = e
+                self.root.after(0, lambda: self.on_export_failed(generation, error))
+                return
+            # Held until this thread is done, even if a newer load replaces the store meanwhile.
+            store.retain()
+            self.root.after(0, lambda: self.on_export_loaded(generation, filepath, store, from_snapshot))
+
+            try:
+                # Ranking scans every message: do it here and only hand the queue to the prefetcher.
+                if self.prefetcher and generation == self.load_generation:
+                    with trace.span("prefetch.rank"):
+                        self.prefetcher.load(store)
+
+                # Written after the UI has its data; the next open of this export maps it instead.
+                if self.use_snapshots and not from_snapshot:
+                    try:
+                        with trace.span("write_snapshot"):
+                            write_snapshot(store, snap_path, filepath)
+                    except OSError:
+                        pass
+            finally:
+                store.release()
+
+        threading.Thread(target=do_load, daemon=True).start()
+
+    def on_export_failed(self, generation, error):
+        if generation == self.load_generation:
+            self.status_var.set("✗ Load failed")
+            messagebox.showerror("Error", f"Failed to load: {error}")
+
+    def on_export_loaded(self, generation, filepath, store, from_snapshot=False):
+        # A newer load started meanwhile: drop this result.
+        if generation != self.load_generation:
+            store.close()
+            return
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                self.chat_data = json.load(f)
-            self.update_statistics()
-            self.populate_sessions()
-            self.status_var.set(f"✓ Loaded {os.path.basename(filepath)}")
+            previous = self.chat_store
+            self.chat_store = store
+            self.code_sessions = None
+            # Workers still reading the old store hold handles: the mapping goes with the last one.
+            if previous is not None:
+                previous.close()
+            with trace.span("update_statistics"):
+                self.update_statistics()
+            with trace.span("populate_sessions"):
+                self.populate_sessions()
+            status = f"✓ Loaded {os.path.basename(filepath)}" + (" (snapshot)" if from_snapshot else "")
+            if store.defaulted_fields:
+                status += f" ⚠ {store.defaulted_fields} malformed field(s)"
+            self.status_var.set(status)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load: {e}")
 
     def update_statistics(self):
-        if not self.chat_data:
+        store = self.chat_store
+        if not store:
             return
 
-        sessions = self.chat_data.get("sessions", [])
-        messages = self.chat_data.get("messages", [])
-        ai_msgs = [m for m in messages if m.get("role") == "assistant"]
-        avg_len = sum(len(m.get("content", "")) for m in ai_msgs) // max(len(ai_msgs), 1)
-        models = set(s.get("modelId", "?").split("/")[-1][:10] for s in sessions)
+        avg_len = store.average_length("assistant")
+        models = set(model_id.split("/")[-1][:10] for model_id in store.model_ids())
 
-        self.stats_labels["Sessions"].config(text=str(len(sessions)))
-        self.stats_labels["Messages"].config(text=str(len(messages)))
+        self.stats_labels["Sessions"].config(text=str(store.session_count))
+        self.stats_labels["Messages"].config(text=str(store.message_count))
         self.stats_labels["Avg Response"].config(text=f"{avg_len}")
         self.stats_labels["Models"].config(text=", ".join(models)[:20] if models else "-")
 
     def populate_sessions(self):
-        self.sessions_tree.delete(*self.sessions_tree.get_children())
-        if not self.chat_data:
+        """Index the sessions and show the first page; only one page of rows is ever inserted."""
+        self.session_index = SessionIndex(self.chat_store) if self.chat_store else None
+        self.update_session_filters()
+        self.apply_session_filters()
+
+    def update_session_filters(self):
+        index = self.session_index
+        for combo, choices in ((self.mode_filter, index.mode_choices() if index else []),
+                               (self.model_filter, index.model_choices() if index else [])):
+            current = combo.get()
+            combo["values"] = (self.ALL_FILTER,) + tuple(choices)
+            combo.set(current if current in choices else self.ALL_FILTER)
+
+    def apply_session_filters(self, event=None):
+        if not self.session_index:
+            self.show_session_page(0)
             return
+        try:
+            start = parse_day(self.date_from_var.get())
+            end = parse_day(self.date_to_var.get())
+        except ValueError:
+            self.status_var.set("⚠ Dates are YYYY-MM-DD")
+            return
+        mode, model = self.mode_filter.get(), self.model_filter.get()
+        with trace.span("filter_sessions"):
+            self.session_index.set_filters(
+                mode=ALL if mode == self.ALL_FILTER else mode,
+                model=ALL if model == self.ALL_FILTER else model,
+                start=start,
+                end=None if end is None else day_after(end),
+            )
+        self.show_session_page(0)
+
+    def sort_sessions(self, column):
+        if not self.session_index:
+            return
+        with trace.span("sort_sessions", column=column):
+            self.session_index.sort_by(column)
+        self.show_session_page(0)
 
-        sessions = self.chat_data.get("sessions", [])
-        messages = self.chat_data.get("messages", [])
+    def show_session_page(self, page):
+        self.sessions_tree.delete(*self.sessions_tree.get_children())
+        index = self.session_index
+        if not index:
+            self.page_var.set("")
+            return
 
-        for s in sorted(sessions, key=lambda x: x.get("timestamp", 0), reverse=True):
-            sid = s.get("id")
-            title = s.get("title", "Untitled")[:20]
-            model = s.get("modelId", "").split("/")[-1][:12]
-            ts = s.get("timestamp", 0)
+        self.session_page = max(0, min(page, index.page_count - 1))
+        # Rows, not session ids, are the item ids: ids may repeat or be missing in an export.
+        for row in index.page_rows(self.session_page):
+            s = self.chat_store.session(row)
+            title = ("Untitled" if s.title is None else s.title)[:20]
+            model = (s.model_id or "").split("/")[-1][:12]
+            ts = s.timestamp
             date = datetime.fromtimestamp(ts / 1000).strftime("%m/%d %H:%M") if ts else "-"
-            count = len([m for m in messages if m.get("sessionId") == sid])
-            self.sessions_tree.insert("", tk.END, iid=str(sid), values=(title, model, date, count))
+            self.sessions_tree.insert("", tk.END, iid=str(row), values=(title, model, date, s.message_count))
+
+        arrow = " ▼" if index.descending else " ▲"
+        for column in SORT_COLUMNS:
+            text = self.SESSION_HEADINGS[column] + (arrow if column == index.sort_column else "")
+            self.sessions_tree.heading(column, text=text)
+        self.page_var.set(f"Page {self.session_page + 1}/{index.page_count} · {len(index.rows)} sessions")
 
     def on_session_select(self, event):
         sel = self.sessions_tree.selection()
         if sel:
-            self.display_session_messages(int(sel[0]))
+            session_id = self.chat_store.session_ids[int(sel[0])]
+            if self.prefetcher:
+                self.prefetcher.prioritize_session(session_id)
+            with trace.span("display_session", session=session_id):
+                self.display_session_messages(session_id)
+
+    def on_prefetch_progress(self, done, total, failed):
+        """Called from prefetch worker threads; throttled to keep the Tk queue small."""
+        finished = done + failed
+        if finished == total:
+            text = f"✓ LaTeX prefetched {done}/{total}" + (f" ({failed} failed)" if failed else "")
+        elif finished % 25 == 0:
+            text = f"⏳ LaTeX prefetch {finished}/{total}"
+        else:
+            return
+        self.root.after(0, lambda: self.status_var.set(text))
 
     def display_session_messages(self, session_id):
         self.messages_text.config(state=tk.NORMAL)
@@ -334,25 +652,27 @@ class ChatAnalyzer:
         # Reset image references per session to avoid unbounded growth/memory pressure.
         self.latex_images.clear()
 
-        if not self.chat_data:
+        if not self.chat_store:
             return
 
-        messages = self.chat_data.get("messages", [])
-        self.current_session_messages = sorted(
-            [m for m in messages if m.get("sessionId") == session_id],
-            key=lambda m: m.get("timestamp", 0)
-        )
+        self.current_session_messages = self.chat_store.session_messages(session_id)
+        if self.code_sessions is None:
+            self.code_sessions = code_session_ids(self.chat_store)
+        is_code = session_id in self.code_sessions
 
         for msg in self.current_session_messages:
-            role = msg.get("role", "?")
-            content = msg.get("content", "")
-            ts = msg.get("timestamp", 0)
+            role = msg.role
+            content = msg.content
+            ts = msg.timestamp
             time_str = datetime.fromtimestamp(ts / 1000).strftime("%H:%M:%S") if ts else ""
 
             # Role header
             icons = {"user": "👤 You", "assistant": "🤖 AI", "system": "⚙️ System"}
             self.messages_text.insert(tk.END, f"\n{icons.get(role, role)} ", role)
-            self.messages_text.insert(tk.END, f"[{time_str}]\n", "timestamp")
+            self.messages_text.insert(tk.END, f"[{time_str}]", "timestamp")
+            if is_code and role == "assistant":
+                self.insert_code_badge(msg.id, self.code_results.get(extract_code(content)))
+            self.messages_text.insert(tk.END, "\n")
 
             # Content with LaTeX highlighting
             self.insert_with_latex(content)
@@ -360,90 +680,194 @@ class ChatAnalyzer:
 
         self.messages_text.config(state=tk.DISABLED)
 
-    def insert_with_latex(self, content):
-        """Insert text with LaTeX formulas rendered as images"""
-        # Pattern for LaTeX:
-        # - $$...$$ (display)
-        # - $...$ (inline, also multiline when model wraps badly)
-        # - \[...\], \(...\)
-        # - \begin{...}...\end{...}
-        #
-        # IMPORTANT: keep $$...$$ before $...$ to avoid partial captures.
-        latex_pattern = (
-            r'(\\begin\{[^}]+\}[\s\S]*?\\end\{[^}]+\}'
-            r'|\\\[[\s\S]*?\\\]'
-            r'|\\\([\s\S]*?\\\)'
-            r'|\$\$[\s\S]*?\$\$'
-            # Inline math must not start/end on a '$' that belongs to '$$...$$'
-            # Multiline inline is allowed because model outputs can wrap badly.
-            # Lookarounds prevent grabbing delimiters that belong to $$...$$ blocks.
-            r'|(?<![\\$])\$(?!\$)[\s\S]*?(?<![\\$])\$(?!\$))'
+    def insert_code_badge(self, message_id, result, index=tk.END):
+        status = result["status"] if result else None
+        style = ("badge_none" if status is None else "badge_pass" if status == PASS
+                 else "badge_missing" if status == MISSING else "badge_fail")
+        self.messages_text.insert(index, f"  {badge_text(result)}", (style, f"badge-{message_id}"))
+
+    def update_code_badge(self, message_id, result):
+        """Replace the badge of a message if it is in the open session."""
+        ranges = self.messages_text.tag_ranges(f"badge-{message_id}")
+        if not ranges:
+            return
+        self.messages_text.config(state=tk.NORMAL)
+        self.messages_text.delete(ranges[0], ranges[1])
+        self.insert_code_badge(message_id, result, ranges[0])
+        self.messages_text.config(state=tk.DISABLED)
+
+    def check_code_answers(self):
+        """Run every METODI_CODICE answer of the export in the sandbox pool (cached by content)."""
+        if not self.chat_store:
+            messagebox.showwarning("Warning", "Load an export first")
+            return
+        if self.code_check_running:
+            return
+        snippets = list(export_snippets(self.chat_store))
+        if not snippets:
+            self.status_var.set("⚠ No METODI_CODICE answers")
+            return
+        self.code_check_running = True
+        total = len(snippets)
+        progress = {"done": 0, "passed": 0}
+        self.status_var.set(f"⏳ Checking {total} code answers...")
+
+        def on_result(message_id, result, cached):
+            # Checker thread: count here, touch widgets on the Tk thread.
+            progress["done"] += 1
+            progress["passed"] += result["status"] == PASS
+            done, passed = progress["done"], progress["passed"]
+            self.root.after(0, lambda: self.on_code_result(message_id, result, done, passed, total))
+
+        def do_check():
+            try:
+                with trace.span("check_code", snippets=total):
+                    check_snippets(snippets, self.code_results, on_result=on_result)
+            except Exception as e:
+                error = e
+                self.root.after(0, lambda: self.status_var.set(f"✗ {str(error)[:25]}"))
+            finally:
+                self.root.after(0, lambda: setattr(self, "code_check_running", False))
+
+        threading.Thread(target=do_check, daemon=True).start()
+
+    def on_code_result(self, message_id, result, done, passed, total):
+        self.update_code_badge(message_id, result)
+        if done == total:
+            self.status_var.set(f"✓ Code check: {passed}/{total} passed")
+        elif done % 10 == 0:
+            self.status_var.set(f"⏳ Checked {done}/{total} code answers")
+
+    def open_comparison(self):
+        """Window for comparing models on similar queries across exports or date ranges."""
+        if self.compare_window is not None and self.compare_window.winfo_exists():
+            self.compare_window.lift()
+            return
+        c = self.colors
+        win = self.compare_window = tk.Toplevel(self.root, bg=c["bg"])
+        win.title("Compare models")
+        win.geometry("900x500")
+
+        controls = ttk.Frame(win, style="Sidebar.TFrame", padding=8)
+        controls.pack(fill=tk.X)
+        self.compare_from_var = tk.StringVar()
+        self.compare_to_var = tk.StringVar()
+        for label, var in (("From", self.compare_from_var), ("To", self.compare_to_var)):
+            ttk.Label(controls, text=label, background=c["sidebar"]).pack(side=tk.LEFT, padx=(0, 4))
+            tk.Entry(controls, textvariable=var, width=11, font=("Consolas", 9), bg=c["bg"], fg=c["text"],
+                     insertbackground=c["text"], relief=tk.FLAT).pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Button(controls, text="➕ Current", command=lambda: self.add_cohort(None)).pack(side=tk.LEFT, padx=3)
+        ttk.Button(controls, text="➕ Export...", command=self.add_cohort_file).pack(side=tk.LEFT, padx=3)
+        ttk.Button(controls, text="🗑 Clear", command=self.clear_cohorts).pack(side=tk.LEFT, padx=3)
+        ttk.Button(controls, text="▶ Compare", command=self.run_comparison).pack(side=tk.LEFT, padx=3)
+
+        self.compare_status_var = tk.StringVar(value="Add two or more exports or date ranges")
+        ttk.Label(controls, textvariable=self.compare_status_var, style="Stats.TLabel",
+                  background=c["sidebar"]).pack(side=tk.RIGHT, padx=10)
+
+        self.cohort_list = tk.Listbox(win, height=4, font=("Consolas", 9), bg=c["sidebar"], fg=c["text"],
+                                      selectbackground=c["selection"], relief=tk.FLAT)
+        self.cohort_list.pack(fill=tk.X, padx=8, pady=(8, 4))
+
+        self.compare_tree = ttk.Treeview(win, columns=COMPARE_COLUMNS, show="headings")
+        for column in COMPARE_COLUMNS:
+            self.compare_tree.heading(column, text=column)
+            self.compare_tree.column(column, width=90 if column in ("Mode", "Model", "Cohort") else 70)
+        self.compare_tree.pack(fill=tk.BOTH, expand=True, padx=8, pady=(4, 8))
+
+        for cohort in self.compare_cohorts:
+            self.cohort_list.insert(tk.END, cohort.label)
+
+    def add_cohort(self, path):
+        try:
+            start = parse_day(self.compare_from_var.get())
+            end = parse_day(self.compare_to_var.get())
+        except ValueError:
+            self.compare_status_var.set("⚠ Dates are YYYY-MM-DD")
+            return
+        if path is None and not self.chat_store:
+            self.compare_status_var.set("⚠ No export loaded")
+            return
+        label = "current" if path is None else os.path.basename(path)
+        if start is not None or end is not None:
+            label += f"@{self.compare_from_var.get().strip()}..{self.compare_to_var.get().strip()}"
+        self.compare_cohorts.append(Cohort(label, path, start, None if end is None else day_after(end)))
+        self.cohort_list.insert(tk.END, label)
+
+    def add_cohort_file(self):
+        path = filedialog.askopenfilename(
+            parent=self.compare_window,
+            title="Add Export to Compare",
+            filetypes=[("JSON", "*.json"), ("All", "*.*")]
         )
-        latex_regex = re.compile(latex_pattern, re.DOTALL)
-
-        parts = latex_regex.split(content)
-        for part in parts:
-            if part and latex_regex.fullmatch(part):
-                if LATEX_AVAILABLE:
-                    self.render_latex_image(part)
-                else:
-                    # Fallback: convert to readable text
-                    readable = self.latex_to_readable(part)
-                    self.messages_text.insert(tk.END, readable, "latex")
-            elif part:  # Only insert non-empty parts
-                self.insert_with_dollar_salvage(part)
-
-    def insert_with_dollar_salvage(self, text_part):
-        """Second-pass salvage for malformed $...$ segments left in plain text."""
-        if "$" not in text_part:
-            self.messages_text.insert(tk.END, text_part)
+        if path:
+            self.add_cohort(path)
+
+    def clear_cohorts(self):
+        self.compare_cohorts = []
+        self.cohort_list.delete(0, tk.END)
+
+    def run_comparison(self):
+        cohorts = list(self.compare_cohorts)
+        if len(cohorts) < 2:
+            self.compare_status_var.set("⚠ Add at least two cohorts")
             return
+        current = self.chat_store.retain() if self.chat_store else None
+        self.compare_status_var.set("⏳ Aligning queries...")
 
-        chunks = text_part.split("$")
-        if len(chunks) < 3:
-            self.messages_text.insert(tk.END, text_part)
+        def do_compare():
+            loaded = {None: current}
+            try:
+                for cohort in cohorts:
+                    if cohort.path not in loaded:
+                        with trace.span("compare.load", path=os.path.basename(cohort.path)):
+                            loaded[cohort.path] = load_store(cohort.path)
+                with trace.span("compare.align"):
+                    result = compare(cohorts, [loaded[c.path] for c in cohorts], code_results=self.code_results)
+            except Exception as e:
+                error = e
+                self.root.after(0, lambda: self.compare_status_var.set(f"✗ {str(error)[:40]}"))
+                return
+            finally:
+                for path, store in loaded.items():
+                    if path is not None:
+                        store.close()
+                    elif store is not None:
+                        store.release()
+            self.root.after(0, lambda: self.show_comparison(*result))
+
+        threading.Thread(target=do_compare, daemon=True).start()
+
+    def show_comparison(self, rows, groups, queries):
+        if self.compare_window is None or not self.compare_window.winfo_exists():
             return
+        self.compare_tree.delete(*self.compare_tree.get_children())
+        for row in rows:
+            self.compare_tree.insert("", tk.END, values=format_row(row))
+        self.compare_status_var.set(f"✓ {groups} aligned query groups, {queries} queries")
 
-        for idx, chunk in enumerate(chunks):
-            if idx % 2 == 0:
-                if chunk:
-                    self.messages_text.insert(tk.END, chunk)
+    def insert_with_latex(self, content):
+        """Insert text with LaTeX formulas rendered as images"""
+        with trace.span("segment"):
+            segments = list(iter_segments(content))
+        for kind, part in segments:
+            if kind == TEXT:
+                with trace.span("text.insert"):
+                    self.messages_text.insert(tk.END, part)
+            elif LATEX_AVAILABLE:
+                self.render_latex_image(part)
+            elif kind == LATEX:
+                # Fallback: convert to readable text
+                readable = self.latex_to_readable(part)
+                self.messages_text.insert(tk.END, readable, "latex")
             else:
-                candidate = chunk.strip()
-                if not candidate:
-                    continue
-                wrapped = f"${candidate}$"
-                if LATEX_AVAILABLE:
-                    self.render_latex_image(wrapped)
-                else:
-                    self.insert_formatted_latex(wrapped, is_display=("\n" in candidate))
+                # Salvaged $...$ from malformed text
+                self.insert_formatted_latex(part, is_display=("\n" in part))
 
     def render_latex_image(self, latex_str):
         """Render LaTeX string as an image and insert it into the text widget"""
         try:
-            # Clean up the LaTeX string
-            clean_latex = latex_str.strip()
-            
-            # Determine if it's display mode or inline
-            is_display = clean_latex.startswith('$$') or clean_latex.startswith('\\[')
-            
-            # Remove delimiters
-            if clean_latex.startswith('$$') and clean_latex.endswith('$$'):
-                clean_latex = clean_latex[2:-2]
-            elif clean_latex.startswith('$') and clean_latex.endswith('$'):
-                clean_latex = clean_latex[1:-1]
-            elif clean_latex.startswith('\\[') and clean_latex.endswith('\\]'):
-                clean_latex = clean_latex[2:-2]
-            elif clean_latex.startswith('\\(') and clean_latex.endswith('\\)'):
-                clean_latex = clean_latex[2:-2]
-            
-            clean_latex = clean_latex.strip()
-            # Heuristic repair: if a multiline display-looking block is wrapped in single '$',
-            # promote it to display mode handling to avoid raw/glitched output.
-            if clean_latex.startswith('$') and clean_latex.endswith('$') and '\n' in clean_latex:
-                clean_latex = clean_latex[1:-1].strip()
-                is_display = True
-            
+            clean_latex, is_display = strip_delimiters(latex_str)
             if not clean_latex:
                 return
 
@@ -460,7 +884,8 @@ class ChatAnalyzer:
                 self.messages_text.insert(tk.END, "\n")
             
             # Insert the image
-            self.messages_text.image_create(tk.END, image=photo)
+            with trace.span("image_create"):
+                self.messages_text.image_create(tk.END, image=photo)
             
             # Insert newline after display math
             if is_display:
@@ -475,23 +900,20 @@ class ChatAnalyzer:
         cache_key = ("display" if is_display else "inline", latex)
         cached = self.latex_image_cache.get(cache_key)
         if cached is not None:
+            trace.count("photo.cache_hit")
             return cached
 
-        size_command = "\\large " if is_display else ""
-        normalized = " ".join(latex.strip().split())
-        payload = f"{size_command}{normalized}".strip()
-        encoded = urllib.parse.quote(payload, safe="")
-        png_url = f"https://i.upmath.me/png/{encoded}"
+        # Prerendered formulas come from the shared render store (see latex_cache/prerender.py).
+        data = self.render_store.get(latex, is_display)
+        if data is None:
+            data = fetch_png(render_payload(latex, is_display))
+            self.render_store.put(latex, is_display, data)
 
-        request = urllib.request.Request(
-            png_url,
-            headers={"User-Agent": "AIHelperChatAnalyzer/1.0"}
-        )
-        with urllib.request.urlopen(request, timeout=12) as response:
-            data = response.read()
+        from PIL import Image, ImageTk
 
-        pil_image = Image.open(io.BytesIO(data))
-        photo = ImageTk.PhotoImage(pil_image)
+        with trace.span("png.decode", bytes=len(data)):
+            pil_image = Image.open(io.BytesIO(data))
+            photo = ImageTk.PhotoImage(pil_image)
 
         # Small bounded cache to avoid repeated network fetches.
         if len(self.latex_image_cache) > 200:
@@ -666,20 +1088,117 @@ class ChatAnalyzer:
             self.messages_text.insert(tk.END, f" {readable_text} ", "latex")
 
     def copy_session_json(self):
-        """Copy current session messages as JSON to clipboard"""
+        """Copy current session messages as JSON to clipboard (serialized off the Tk thread)"""
         if not self.current_session_messages:
             messagebox.showinfo("Info", "No session selected")
             return
+        # Repeat clicks while a copy is serializing are dropped.
+        if self.copy_running:
+            return
+
+        self.copy_running = True
+        messages = self.current_session_messages
+        self.status_var.set("⏳ Copying...")
+
+        def do_copy():
+            try:
+                json_str = json.dumps([m.to_dict() for m in messages], indent=2, ensure_ascii=False)
+                self.root.after(0, lambda: self.set_clipboard(json_str))
+            except Exception as e:
+                error = e
+                self.root.after(0, lambda: self.status_var.set(f"✗ {str(error)[:25]}"))
+            finally:
+                self.root.after(0, lambda: setattr(self, "copy_running", False))
+
+        threading.Thread(target=do_copy, daemon=True).start()
 
-        json_str = json.dumps(self.current_session_messages, indent=2, ensure_ascii=False)
+    def set_clipboard(self, text):
         self.root.clipboard_clear()
-        self.root.clipboard_append(json_str)
+        self.root.clipboard_append(text)
         self.status_var.set("✓ Copied to clipboard")
 
+    def selected_session_rows(self):
+        """Store rows of the selected sessions (the selection is always on the visible page)."""
+        selected = {int(iid) for iid in self.sessions_tree.selection()}
+        return [row for row in self.session_index.page_rows(self.session_page) if row in selected]
+
+    def show_export_menu(self):
+        if self.export_cancel is not None:
+            self.export_cancel.set()
+            return
+        if not self.session_index:
+            messagebox.showinfo("Info", "No export loaded")
+            return
+        selected = self.selected_session_rows()
+        menu = tk.Menu(self.root, tearoff=0, font=("Consolas", 9))
+        menu.add_command(label=f"Selected sessions ({len(selected)})",
+                         state=tk.NORMAL if selected else tk.DISABLED,
+                         command=lambda: self.start_session_export(selected))
+        menu.add_command(label=f"Filtered list ({len(self.session_index.rows)})",
+                         command=lambda: self.start_session_export(self.session_index.rows))
+        btn = self.export_btn
+        menu.tk_popup(btn.winfo_rootx(), btn.winfo_rooty() + btn.winfo_height())
+
+    def start_session_export(self, rows):
+        path = filedialog.asksaveasfilename(
+            title="Export Sessions",
+            defaultextension=".ndjson",
+            initialfile="chat_sessions.ndjson",
+            filetypes=[("NDJSON", "*.ndjson"), ("NDJSON, gzip", "*.ndjson.gz"),
+                       ("Markdown", "*.md"), ("Markdown, gzip", "*.md.gz")]
+        )
+        if not path:
+            return
+        store = self.chat_store.retain()
+        cancel = self.export_cancel = threading.Event()
+        self.export_btn.config(text="✖ Cancel export")
+
+        def on_progress(done, total):
+            self.root.after(0, lambda: self.status_var.set(f"⏳ Exported {done}/{total} sessions"))
+
+        def do_export():
+            try:
+                with trace.span("export_sessions", sessions=len(rows)):
+                    sessions, messages = export_sessions(store, rows, path, on_progress, cancel)
+                text = f"✓ {sessions} sessions, {messages} messages → {os.path.basename(path)}"
+            except ExportCancelled:
+                text = "Export cancelled"
+            except Exception as e:
+                text = f"✗ Export failed: {str(e)[:25]}"
+            finally:
+                store.release()
+            self.root.after(0, lambda: self.on_session_export_done(text))
+
+        threading.Thread(target=do_export, daemon=True).start()
+
+    def on_session_export_done(self, text):
+        self.export_cancel = None
+        self.export_btn.config(text="💾 Export...")
+        self.status_var.set(text)
+
 
 def main():
+    parser = argparse.ArgumentParser(description="AI Helper WearOS Chat Analyzer")
+    parser.add_argument("--prefetch-workers", type=int, default=4,
+                        help="concurrent background LaTeX fetches (0 disables prefetch)")
+    parser.add_argument("--prefetch-rate", type=float, default=8.0,
+                        help="max background LaTeX fetches per second (0 = unlimited)")
+    parser.add_argument("--trace", nargs="?", const="1", metavar="PATH",
+                        help=f"record hot-path timings (overlay, F12); with PATH also write a "
+                             f"Chrome trace there on exit (same as {trace.ENV_VAR}=PATH)")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="always parse the JSON instead of reopening its <export>.snap snapshot")
+    parser.add_argument("--auto-ingest", action="store_true",
+                        help="pull and load the export as soon as it appears on a connected watch")
+    parser.add_argument("export", nargs="?", help="chat export JSON to load at startup")
+    args = parser.parse_args()
+    trace.configure(args.trace)
+
     root = tk.Tk()
-    app = ChatAnalyzer(root)
+    app = ChatAnalyzer(root, prefetch_workers=args.prefetch_workers, prefetch_rate=args.prefetch_rate,
+                       use_snapshots=not args.no_snapshot, auto_ingest=args.auto_ingest)
+    if args.export:
+        app.load_json_from_path(args.export)
     root.mainloop()
 
 
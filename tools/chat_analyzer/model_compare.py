@@ -0,0 +1,262 @@
+"""
+Cross-export A/B comparison of models.
+Each cohort is an export, optionally restricted to a date range. User queries are
+normalized and aligned across cohorts with MinHash/LSH: one-permutation MinHash
+signatures are bucketed per band and a bucket member is only checked against the
+bucket's first entry, so alignment is linear in the number of distinct queries.
+Replies to aligned queries are then summarized per mode, model and cohort:
+latency, length, LaTeX density and, where cached by code_check, the code pass rate.
+
+Usage: python model_compare.py export_a.json export_b.json@2026-03-01..2026-04-30 [--threshold 0.5]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import unicodedata
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from latex_cache.segments import iter_formulas
+from chat_model import ChatStore
+from chat_snapshot import open_snapshot, snapshot_path
+from code_check import PASS, FAIL, TIMEOUT, ResultStore, extract_code, is_code_session
+from session_index import day_after, parse_day
+
+SHINGLE = 4
+BANDS = 16
+ROWS = 4
+BINS = BANDS * ROWS
+THRESHOLD = 0.5  # estimated Jaccard similarity of query shingles
+_EMPTY = 1 << 40
+_DENSIFY_STEP = 1 << 32  # keeps borrowed values distinct from real ones
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize(text):
+    """Casefolded, accent- and punctuation-free text with single spaces."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def shingle_hashes(text):
+    if len(text) <= SHINGLE:
+        return {zlib.crc32(text.encode("utf-8"))}
+    data = text.encode("utf-8")
+    return {zlib.crc32(data[i:i + SHINGLE]) for i in range(len(data) - SHINGLE + 1)}
+
+
+def signature(hashes):
+    """One-permutation MinHash: the minimum per hash bin, empty bins densified by rotation."""
+    sig = [_EMPTY] * BINS
+    for h in hashes:
+        b = h % BINS
+        value = h // BINS
+        if value < sig[b]:
+            sig[b] = value
+    if _EMPTY in sig:
+        filled = [i for i, v in enumerate(sig) if v != _EMPTY]
+        for i in range(BINS):
+            if sig[i] == _EMPTY:
+                # Borrow from the next filled bin to the right (circularly).
+                j = next((k for k in filled if k > i), filled[0])
+                distance = (j - i) % BINS
+                sig[i] = sig[j] + distance * _DENSIFY_STEP
+    return sig
+
+
+def similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / BINS
+
+
+class Cohort:
+    __slots__ = ("label", "path", "start", "end")
+
+    def __init__(self, label, path=None, start=None, end=None):
+        self.label = label
+        self.path = path
+        self.start = start  # epoch ms, inclusive
+        self.end = end      # epoch ms, exclusive
+
+    @classmethod
+    def parse(cls, spec):
+        """'export.json' or 'export.json@YYYY-MM-DD..YYYY-MM-DD' (either bound may be empty)."""
+        path, _, dates = spec.partition("@")
+        start = end = None
+        if dates:
+            first, _, last = dates.partition("..")
+            start = parse_day(first)
+            end = parse_day(last)
+            end = None if end is None else day_after(end)
+        return cls(os.path.basename(spec), path, start, end)
+
+
+class Exchange:
+    """A user query and the assistant reply that follows it."""
+    __slots__ = ("cohort", "model", "mode", "text", "latency", "length", "formulas", "code_status")
+
+    def __init__(self, cohort, model, mode, text, latency, length, formulas, code_status):
+        self.cohort = cohort
+        self.model = model
+        self.mode = mode
+        self.text = text
+        self.latency = latency
+        self.length = length
+        self.formulas = formulas
+        self.code_status = code_status
+
+
+def load_store(path):
+    """ChatStore for an export, from its snapshot when one is current."""
+    store = open_snapshot(snapshot_path(path), path)
+    if store is None:
+        with open(path, "r", encoding="utf-8") as f:
+            store = ChatStore.from_export(json.load(f))
+    return store
+
+
+def iter_exchanges(store, cohort_index, start=None, end=None, code_results=None):
+    """Exchanges of one store whose query falls in [start, end); one session decoded at a time."""
+    for session in store.sessions():
+        is_code = code_results is not None and is_code_session(session)
+        model = session.model_id or "?"
+        mode = session.mode_id or session.mode or "?"
+        messages = store.session_messages(session.id)
+        for query, reply in zip(messages, messages[1:]):
+            if query.role != "user" or reply.role != "assistant":
+                continue
+            if (start is not None and query.timestamp < start) or (end is not None and query.timestamp >= end):
+                continue
+            text = normalize(query.content)
+            if not text:
+                continue
+            code_status = None
+            if is_code:
+                result = code_results.get(extract_code(reply.content))
+                code_status = result["status"] if result else None
+            yield Exchange(cohort_index, model, mode, text, reply.timestamp - query.timestamp,
+                           len(reply.content), sum(1 for _ in iter_formulas(reply.content)), code_status)
+
+
+def align(exchanges, threshold=THRESHOLD):
+    """
+    Group id per exchange: queries with estimated similarity >= threshold share a group.
+    Identical normalized texts are hashed once; each LSH bucket member is compared
+    only with the bucket's first member, and groups are merged with union-find.
+    """
+    text_ids = {}
+    for ex in exchanges:
+        text_ids.setdefault(ex.text, len(text_ids))
+    sigs = [signature(shingle_hashes(text)) for text in text_ids]
+    parent = list(range(len(sigs)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        lo, hi = band * ROWS, (band + 1) * ROWS
+        buckets = {}
+        for uid, sig in enumerate(sigs):
+            first = buckets.setdefault(tuple(sig[lo:hi]), uid)
+            if first == uid:
+                continue
+            a, b = find(first), find(uid)
+            if a != b and similarity(sigs[first], sig) >= threshold:
+                parent[b] = a
+    return [find(text_ids[ex.text]) for ex in exchanges]
+
+
+def aligned_exchanges(exchanges, groups):
+    """Exchanges whose group has queries from at least two cohorts."""
+    cohorts_by_group = {}
+    for ex, group in zip(exchanges, groups):
+        cohorts_by_group.setdefault(group, set()).add(ex.cohort)
+    shared = {g for g, cohorts in cohorts_by_group.items() if len(cohorts) > 1}
+    return [ex for ex, group in zip(exchanges, groups) if group in shared], len(shared)
+
+
+def summarize(exchanges, cohort_labels):
+    """Metric rows sorted by mode, model and cohort."""
+    buckets = {}
+    for ex in exchanges:
+        buckets.setdefault((ex.mode, ex.model, ex.cohort), []).append(ex)
+
+    rows = []
+    for (mode, model, cohort), group in sorted(buckets.items()):
+        chars = sum(ex.length for ex in group)
+        checked = [ex.code_status for ex in group if ex.code_status in (PASS, FAIL, TIMEOUT)]
+        rows.append({
+            "mode": mode,
+            "model": model,
+            "cohort": cohort_labels[cohort],
+            "queries": len(group),
+            "latency_s": statistics.median(ex.latency for ex in group) / 1000,
+            "length": statistics.median(ex.length for ex in group),
+            "latex_per_1k": 1000 * sum(ex.formulas for ex in group) / max(chars, 1),
+            "code_pass_rate": checked.count(PASS) / len(checked) if checked else None,
+            "code_checked": len(checked),
+        })
+    return rows
+
+
+def compare(cohorts, stores, threshold=THRESHOLD, code_results=None):
+    """
+    cohorts: Cohort list; stores: a ChatStore per cohort (the same store may repeat
+    with different date ranges). Returns (metric rows, aligned groups, aligned queries).
+    """
+    exchanges = []
+    for i, (cohort, store) in enumerate(zip(cohorts, stores)):
+        exchanges.extend(iter_exchanges(store, i, cohort.start, cohort.end, code_results))
+    groups = align(exchanges, threshold)
+    aligned, group_count = aligned_exchanges(exchanges, groups)
+    return summarize(aligned, [c.label for c in cohorts]), group_count, len(aligned)
+
+
+def format_row(row):
+    rate = "-" if row["code_pass_rate"] is None else f"{row['code_pass_rate']:.0%} of {row['code_checked']}"
+    return (row["mode"], row["model"].split("/")[-1], row["cohort"], row["queries"],
+            f"{row['latency_s']:.1f}s", f"{row['length']:.0f}", f"{row['latex_per_1k']:.2f}", rate)
+
+
+COLUMNS = ("Mode", "Model", "Cohort", "Queries", "Latency", "Length", "LaTeX/1k", "Code pass")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare models on similar queries across exports")
+    parser.add_argument("cohorts", nargs="+", metavar="EXPORT[@FROM..TO]",
+                        help="exports to compare, optionally restricted to a YYYY-MM-DD date range")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="minimum estimated Jaccard similarity of aligned queries")
+    parser.add_argument("--json", metavar="PATH", help="also write the metric rows as JSON")
+    args = parser.parse_args()
+    if len(args.cohorts) < 2:
+        parser.error("give at least two exports or date ranges")
+
+    cohorts = [Cohort.parse(spec) for spec in args.cohorts]
+    loaded = {}
+    for cohort in cohorts:
+        if cohort.path not in loaded:
+            loaded[cohort.path] = load_store(cohort.path)
+    stores = [loaded[cohort.path] for cohort in cohorts]
+    rows, groups, queries = compare(cohorts, stores, args.threshold, ResultStore())
+
+    print(f"✓ {groups} aligned query groups, {queries} queries")
+    widths = [max(len(str(v)) for v in [title] + [format_row(r)[i] for r in rows])
+              for i, title in enumerate(COLUMNS)]
+    for values in [COLUMNS] + [format_row(r) for r in rows]:
+        print("  ".join(str(v).ljust(w) for v, w in zip(values, widths)))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Streaming export of many sessions at once.
+Sessions are decoded one at a time and every record is written as soon as it is
+built, so exporting a whole history needs memory for one session, not for the
+output. Output goes to a temporary file that replaces the target only when the
+export completes; a cancelled export leaves nothing behind.
+
+Formats follow the file name: .ndjson/.jsonl (one session record followed by its
+message records, export keys plus "type"), .md (Markdown, LaTeX kept as written);
+a trailing .gz compresses either one.
+
+Usage: python session_export.py chat_export.json history.ndjson.gz [--mode analysis2] [--from 2026-01-01]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from code_check import is_code_session
+
+NDJSON = "ndjson"
+MARKDOWN = "markdown"
+PROGRESS_INTERVAL = 0.1  # seconds between progress callbacks
+ROLE_LABELS = {"user": "👤 You", "assistant": "🤖 AI", "system": "⚙️ System"}
+
+
+def _read_umask():
+    # os.umask can only be read by setting it: done once, before any export thread runs.
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# mkstemp creates 0600 files; exports get the mode open() would have given them.
+FILE_MODE = 0o666 & ~_read_umask()
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def format_for(path):
+    """(format, compressed) for an output path."""
+    compressed = path.endswith(".gz")
+    name = path[:-3] if compressed else path
+    fmt = MARKDOWN if name.endswith((".md", ".markdown")) else NDJSON
+    return fmt, compressed
+
+
+def _date(ts, pattern="%Y-%m-%d %H:%M"):
+    return datetime.fromtimestamp(ts / 1000).strftime(pattern) if ts else "-"
+
+
+def write_ndjson_session(f, session, extra, messages):
+    f.write(json.dumps(dict(session.to_dict(extra), type="session"), ensure_ascii=False) + "\n")
+    for msg in messages:
+        f.write(json.dumps(dict(msg.to_dict(), type="message"), ensure_ascii=False) + "\n")
+
+
+def write_markdown_session(f, session, extra, messages):
+    f.write(f"## {' '.join((session.title or '').split()) or 'Untitled'}\n\n")
+    f.write(f"`{session.model_id or '?'}` · `{session.mode_id or session.mode or '?'}` · "
+            f"{_date(session.timestamp)} · {len(messages)} messages\n\n")
+    code = is_code_session(session)
+    for msg in messages:
+        f.write(f"**{ROLE_LABELS.get(msg.role, msg.role)}** · {_date(msg.timestamp, '%H:%M:%S')}\n\n")
+        content = msg.content
+        if code and msg.role == "assistant" and "```" not in content:
+            content = f"```python\n{content}\n```"
+        f.write(content + "\n\n")
+    f.write("---\n\n")
+
+
+WRITERS = {NDJSON: write_ndjson_session, MARKDOWN: write_markdown_session}
+
+
+def export_sessions(store, rows, path, on_progress=None, cancel=None):
+    """
+    Write the sessions at the given store rows to path, in that order.
+    on_progress(done, total) is called from this thread at most every PROGRESS_INTERVAL
+    and once at the end; setting the cancel Event aborts with ExportCancelled.
+    Returns (sessions, messages) written.
+    """
+    fmt, compressed = format_for(path)
+    write_session = WRITERS[fmt]
+    total = len(rows)
+    messages = 0
+    last_progress = 0.0
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    opener = gzip.open if compressed else open
+    try:
+        with opener(tmp_path, "wt", encoding="utf-8", newline="\n") as f:
+            if fmt == MARKDOWN:
+                f.write(f"# AI Helper WearOS chats ({total} sessions)\n\n")
+            for done, row in enumerate(rows, 1):
+                if cancel is not None and cancel.is_set():
+                    raise ExportCancelled()
+                session = store.session(row)
+                session_messages = store.session_messages(session.id)
+                write_session(f, session, store.session_extras.get(row), session_messages)
+                messages += len(session_messages)
+
+                now = time.perf_counter()
+                if on_progress and now - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = now
+                    on_progress(done, total)
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if on_progress:
+        on_progress(total, total)
+    return total, messages
+
+
+def main():
+    from chat_model import ChatStore
+    from session_index import ALL, SessionIndex, day_after, parse_day
+
+    parser = argparse.ArgumentParser(description="Export sessions of a chat export as NDJSON or Markdown")
+    parser.add_argument("export", help="chat export JSON")
+    parser.add_argument("output", help="target file: .ndjson/.jsonl or .md, optionally with .gz")
+    parser.add_argument("--mode", help="only sessions with this modeId (or legacy mode)")
+    parser.add_argument("--model", help="only sessions with this modelId")
+    parser.add_argument("--from", dest="start", default="", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", default="", help="last day, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    with open(args.export, "r", encoding="utf-8") as f:
+        store = ChatStore.from_export(json.load(f))
+    index = SessionIndex(store)
+    end = parse_day(args.end)
+    index.set_filters(mode=args.mode or ALL, model=args.model or ALL,
+                      start=parse_day(args.start), end=None if end is None else day_after(end))
+
+    def report(done, total):
+        print(f"\r⏳ {done}/{total} sessions", end="", flush=True)
+
+    sessions, messages = export_sessions(store, index.rows, args.output, on_progress=report)
+    print(f"\r✓ {sessions} sessions, {messages} messages → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Sort/filter index over the sessions of a ChatStore.
+Sort keys are taken from the store's columns once (titles only when first sorted
+by title), each column's ascending order is computed once and cached, and a
+filter change is a single pass over that order; the session list then shows one
+page of the result, so no step touches more widgets than fit on screen.
+"""
+
+from array import array
+from datetime import datetime, timedelta
+
+PAGE_SIZE = 200
+SORT_COLUMNS = ("title", "model", "date", "msgs")
+ALL = None  # filter value that matches every session
+NO_MATCH = -2  # code for a filter value the export does not contain
+
+
+def parse_day(text):
+    """Local midnight of a YYYY-MM-DD date in epoch ms, or None for an empty string."""
+    text = text.strip()
+    if not text:
+        return None
+    return int(datetime.strptime(text, "%Y-%m-%d").timestamp() * 1000)
+
+
+def day_after(ms):
+    return int((datetime.fromtimestamp(ms / 1000) + timedelta(days=1)).timestamp() * 1000)
+
+
+class SessionIndex:
+    def __init__(self, store, page_size=PAGE_SIZE):
+        self.store = store
+        self.page_size = page_size
+
+        # Sort/filter keys, one entry per session row
+        self.timestamps = store.session_timestamps
+        self.models = store.session_models
+        self.message_counts = array("l", (store.message_count_for(sid) for sid in store.session_ids))
+        # Mode as the app knows it: modeId, or the legacy ChatMode for old sessions
+        self.modes = array("l", (mode_id if mode_id >= 0 else mode
+                                 for mode_id, mode in zip(store.session_mode_ids, store.session_modes)))
+        self._title_keys = None
+        self._orders = {}
+
+        self.sort_column = "date"
+        self.descending = True
+        self.mode = ALL
+        self.model = ALL
+        self.start = None  # epoch ms, inclusive
+        self.end = None    # epoch ms, exclusive
+        self.rows = array("l")
+        self.apply()
+
+    # ---- keys ----
+
+    def _sort_key(self, column):
+        if column == "title":
+            if self._title_keys is None:
+                titles = self.store.session_titles
+                self._title_keys = [(titles[row] or "").casefold() for row in range(len(self.timestamps))]
+            return self._title_keys
+        if column == "model":
+            # Rank string codes by the model name so "?" (no model) sorts first.
+            strings = self.store.strings
+            codes = sorted(set(self.models), key=lambda code: strings[code] if code >= 0 else "")
+            rank = {code: i for i, code in enumerate(codes)}
+            return [rank[code] for code in self.models]
+        if column == "date":
+            return self.timestamps
+        if column == "msgs":
+            return self.message_counts
+        raise ValueError(f"unknown sort column: {column}")
+
+    def order(self, column):
+        """Session rows in ascending order of a column (stable, cached)."""
+        order = self._orders.get(column)
+        if order is None:
+            key = self._sort_key(column)
+            order = self._orders[column] = array("l", sorted(range(len(self.timestamps)), key=key.__getitem__))
+        return order
+
+    def _code(self, value):
+        if value is ALL:
+            return ALL
+        code = self.store.strings.find(value)
+        return NO_MATCH if code is None else code
+
+    # ---- view ----
+
+    def sort_by(self, column):
+        """Sort by a column; choosing the current column again flips the direction."""
+        if column == self.sort_column:
+            self.descending = not self.descending
+        else:
+            self.sort_column = column
+            self.descending = column in ("date", "msgs")
+        self.apply()
+
+    def set_filters(self, mode=ALL, model=ALL, start=None, end=None):
+        self.mode, self.model, self.start, self.end = mode, model, start, end
+        self.apply()
+
+    def apply(self):
+        """Recompute the visible rows from the cached order and the current filters."""
+        order = self.order(self.sort_column)
+        rows = reversed(order) if self.descending else order
+        mode, model = self._code(self.mode), self._code(self.model)
+        start, end = self.start, self.end
+        if mode is ALL and model is ALL and start is None and end is None:
+            self.rows = array("l", rows)
+            return self.rows
+
+        modes, models, timestamps = self.modes, self.models, self.timestamps
+        result = array("l")
+        for row in rows:
+            if mode is not ALL and modes[row] != mode:
+                continue
+            if model is not ALL and models[row] != model:
+                continue
+            ts = timestamps[row]
+            if start is not None and ts < start:
+                continue
+            if end is not None and ts >= end:
+                continue
+            result.append(row)
+        self.rows = result
+        return result
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self.rows) // self.page_size))
+
+    def page_rows(self, number):
+        """Store rows of one page (0-based) of the current view."""
+        start = number * self.page_size
+        return self.rows[start:start + self.page_size]
+
+    def page(self, number):
+        """SessionRecords of one page (0-based) of the current view."""
+        return [self.store.session(row) for row in self.page_rows(number)]
+
+    def mode_choices(self):
+        return sorted({self.store.strings[code] for code in set(self.modes) if code >= 0})
+
+    def model_choices(self):
+        return sorted({self.store.strings[code] for code in set(self.models) if code >= 0})
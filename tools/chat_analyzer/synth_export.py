@@ -0,0 +1,217 @@
+"""
+Synthetic chat-export generator for scaling tests.
+Produces exports with the app's schema (sessions, messages, nextSessionId,
+nextMessageId) at any size. Assistant replies are sampled from the app's own
+RAG corpora (res/raw), so formula density and length follow real math answers.
+
+Usage: python synth_export.py --messages 100000 --output export_100k.json [--seed 7]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from latex_cache.segments import iter_formulas
+
+RAW_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app", "src", "main", "res", "raw")
+
+AUDIO_DIR = "/data/user/0/com.base.aihelperwearos/files/audio_messages"
+MODEL_IDS = ["openai/gpt-5.5", "google/gemini-3.1-pro-preview", "anthropic/claude-sonnet-4.6"]
+MODEL_WEIGHTS = [5, 3, 2]
+
+# (modeId, legacy ChatMode, corpus file, weight); the general mode has no corpus.
+MODES = [
+    ("analysis2", "ANALYSIS", "esercizi_analisi.json", 4),
+    ("physics", "GENERAL", "esercizi_fisica.json", 2),
+    ("software_engineering", "GENERAL", "ingegneria_software.json", 1),
+    ("metodi_code", "METODI_CODICE", "metodi_codice.json", 1),
+    ("metodi_theory", "METODI_TEORIA", "metodi_teoria.json", 1),
+    ("general", "GENERAL", None, 2),
+]
+
+GENERAL_PROMPTS = [
+    "che tempo fa domani",
+    "riassumi questo paragrafo",
+    "come si calcola la media",
+    "traduci in inglese per favore",
+    "quanto fa il venti per cento di 350",
+]
+GENERAL_REPLIES = [
+    "Certo! Ecco un riassunto breve dei punti principali.",
+    "Il venti per cento di 350 si ottiene come $0.2 \\cdot 350 = 70$.",
+    "La media aritmetica è $\\bar{x} = \\frac{1}{n}\\sum_{i=1}^{n} x_i$.",
+    "Non ho accesso a dati in tempo reale, ma posso aiutarti a trovarli.",
+    "Ecco la traduzione richiesta.",
+]
+INTROS = ["", "", "Ecco lo svolgimento.\n\n", "Procediamo per passi.\n\n", "Risolviamo l'esercizio.\n\n"]
+
+# Literal "\n" in the corpora is a line break unless it starts a LaTeX command.
+_LITERAL_NEWLINE = re.compile(r"\\n(?![a-zA-Z])")
+
+# Session length in messages (user + assistant pairs).
+MIN_TURNS = 1
+MAX_TURNS = 20
+BASE_TIMESTAMP = 1767225600000  # 2026-01-01 00:00 UTC
+
+
+def _clean(text):
+    return _LITERAL_NEWLINE.sub("\n", text or "")
+
+
+def load_templates(raw_dir=RAW_DIR):
+    """{modeId: [(prompt, reply), ...]} sampled from the RAG corpora."""
+    templates = {}
+    for mode_id, _, corpus, _ in MODES:
+        pairs = []
+        if corpus:
+            with open(os.path.join(raw_dir, corpus), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in data.get("exercises") or data.get("examples") or data.get("chunks") or []:
+                prompt = item.get("testo") or item.get("title") or ""
+                reply = item.get("svolgimento") or item.get("code") or item.get("text") or ""
+                if prompt and reply:
+                    pairs.append((_clean(prompt)[:300], _clean(reply)))
+        if not pairs:
+            pairs = list(zip(GENERAL_PROMPTS, GENERAL_REPLIES))
+        templates[mode_id] = pairs
+    return templates
+
+
+def iter_export(n_messages, seed=0, templates=None):
+    """
+    Yield ("session", dict) and ("message", dict) records for an export with
+    exactly n_messages messages; sessions come before their messages.
+    """
+    rng = random.Random(seed)
+    templates = templates or load_templates()
+    mode_weights = [m[3] for m in MODES]
+
+    timestamp = BASE_TIMESTAMP
+    session_id = 1
+    message_id = 1
+    remaining = n_messages
+    while remaining > 0:
+        mode_id, legacy_mode, _, _ = rng.choices(MODES, mode_weights)[0]
+        pairs = templates[mode_id]
+        turns = min(rng.randint(MIN_TURNS, MAX_TURNS), (remaining + 1) // 2)
+        timestamp += rng.randint(60_000, 36 * 3_600_000)
+
+        first_pair = rng.choice(pairs)
+        first_prompt = first_pair[0]
+        yield "session", {
+            "id": session_id,
+            "modelId": rng.choices(MODEL_IDS, MODEL_WEIGHTS)[0],
+            "title": first_prompt[:30] + "..." if len(first_prompt) > 30 else first_prompt,
+            "timestamp": timestamp,
+            "mode": legacy_mode,
+            "modeId": mode_id,
+        }
+
+        for turn in range(turns):
+            prompt, reply = rng.choice(pairs) if turn else first_pair
+            spoken = rng.random() < 0.7
+            timestamp += rng.randint(3_000, 120_000)
+            user_msg = {
+                "id": message_id,
+                "sessionId": session_id,
+                "role": "user",
+                "content": prompt,
+                "timestamp": timestamp,
+            }
+            if spoken:
+                user_msg["audioPath"] = f"{AUDIO_DIR}/voice_{timestamp - rng.randint(2_000, 9_000)}.wav"
+            yield "message", user_msg
+            message_id += 1
+            remaining -= 1
+            if remaining == 0:
+                break
+
+            timestamp += rng.randint(2_000, 40_000)
+            yield "message", {
+                "id": message_id,
+                "sessionId": session_id,
+                "role": "assistant",
+                "content": rng.choice(INTROS) + reply,
+                "timestamp": timestamp,
+            }
+            message_id += 1
+            remaining -= 1
+        session_id += 1
+
+    yield "next", {"nextSessionId": session_id, "nextMessageId": message_id}
+
+
+def generate_export(n_messages, seed=0, templates=None):
+    """Build an export dict in memory."""
+    data = {"sessions": [], "messages": []}
+    for kind, record in iter_export(n_messages, seed, templates):
+        if kind == "next":
+            data.update(record)
+        else:
+            data[kind + "s"].append(record)
+    return data
+
+
+def write_export(path, n_messages, seed=0, templates=None):
+    """
+    Stream an export to disk without holding it in memory: messages go to the
+    file as they are generated, sessions are buffered (they are ~10x fewer).
+    Returns (sessions, messages).
+    """
+    sessions = []
+    counters = {}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"messages": [')
+        first = True
+        for kind, record in iter_export(n_messages, seed, templates):
+            if kind == "session":
+                sessions.append(record)
+            elif kind == "message":
+                f.write(("" if first else ",") + "\n  " + json.dumps(record, ensure_ascii=False))
+                first = False
+            else:
+                counters = record
+        f.write('\n], "sessions": ')
+        json.dump(sessions, f, ensure_ascii=False)
+        f.write(f', "nextSessionId": {counters["nextSessionId"]}, "nextMessageId": {counters["nextMessageId"]}}}\n')
+    return len(sessions), n_messages
+
+
+def latex_density(chat_data):
+    """Formulas per 1000 characters of assistant content."""
+    chars = formulas = 0
+    for msg in chat_data.get("messages", []):
+        if msg.get("role") == "assistant":
+            content = msg.get("content", "")
+            chars += len(content)
+            formulas += sum(1 for _ in iter_formulas(content))
+    return 1000 * formulas / max(chars, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic AI Helper WearOS chat export")
+    parser.add_argument("--messages", type=int, default=1000, help="number of messages (1k .. 1M)")
+    parser.add_argument("--output", default="synthetic_export.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", metavar="EXPORT",
+                        help="real export to compare LaTeX density against")
+    args = parser.parse_args()
+
+    sessions, messages = write_export(args.output, args.messages, args.seed)
+    size_mb = os.path.getsize(args.output) / 1e6
+    print(f"✓ {messages} messages in {sessions} sessions → {args.output} ({size_mb:.1f} MB)")
+
+    if args.compare:
+        sample = generate_export(min(args.messages, 20_000), args.seed)
+        with open(args.compare, "r", encoding="utf-8") as f:
+            real = json.load(f)
+        print(f"LaTeX density (formulas / 1k assistant chars): "
+              f"synthetic {latex_density(sample):.2f}, real {latex_density(real):.2f}")
+
+
+if __name__ == "__main__":
+    main()
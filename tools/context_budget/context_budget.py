@@ -0,0 +1,562 @@
+"""
+AI Helper WearOS - RAG Context Budget Analyzer
+Replays user queries through a Python port of RagRepository + MathContextRetriever
+and reports how large the prompt context gets for each specialized chat mode.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DIR = os.path.join(TOOLS_DIR, "..", "app", "src", "main", "res", "raw")
+DEFAULT_EXPORT = os.path.join(TOOLS_DIR, "chat_analyzer", "chat_export.json")
+
+# Mirrors ExerciseParser / RagRepository / MathContextRetriever constants.
+HARD_MAX_EXERCISES = 300
+DEFAULT_CORPUS_MAX_EXERCISES = 100
+CATEGORY_FILTER_MIN_CONFIDENCE = 0.5
+RULE = "─" * 40
+
+QUERY_STOPWORDS = {
+    "della", "delle", "degli", "dello", "dalla", "dalle", "dagli", "dallo",
+    "nella", "nelle", "negli", "nello", "sulla", "sulle", "sugli", "sullo",
+    "dell", "all", "nell", "sull",
+    "del", "dei", "dai", "dal", "con", "per", "che", "non", "tra", "fra",
+    "una", "uno", "alla", "agli", "allo", "dopo", "prima", "come", "tale",
+    "apri", "chiudi", "tonda", "quadra", "graffa", "parentesi", "valore",
+    "inizio", "fine", "elevato", "elevata", "sopra", "sotto", "quindi",
+    "this", "that", "with", "from", "into", "then", "open", "close",
+}
+
+DEFAULT_SWEEP_LENGTHS = [2048, 3072, 4096, 5200, 6500, 8192]
+DEFAULT_SWEEP_EXERCISES = [1, 2, 3, 4]
+
+
+@dataclass
+class ModeProfile:
+    """Retriever settings used by MainViewModel.getExerciseRagTool for one mode."""
+    mode_id: str
+    corpus: str
+    max_exercises: int
+    max_prompt_length: int
+    context_header: str
+    solution_label: str
+    item_label: str
+
+
+MODE_PROFILES = {
+    "analysis2": ModeProfile(
+        mode_id="analysis2",
+        corpus="esercizi_analisi.json",
+        max_exercises=2,
+        max_prompt_length=4096,
+        context_header="ESEMPI RILEVANTI DALLA PROFESSORESSA:",
+        solution_label="Svolgimento della professoressa",
+        item_label="Esercizio",
+    ),
+    "physics": ModeProfile(
+        mode_id="physics",
+        corpus="esercizi_fisica.json",
+        max_exercises=3,
+        max_prompt_length=5200,
+        context_header="ESEMPI DI FISICA RILEVANTI:",
+        solution_label="Svolgimento di riferimento",
+        item_label="Esercizio",
+    ),
+    "software_engineering": ModeProfile(
+        mode_id="software_engineering",
+        corpus="ingegneria_software.json",
+        max_exercises=4,
+        max_prompt_length=6500,
+        context_header="CONTESTO INGEGNERIA DEL SOFTWARE RILEVANTE:",
+        solution_label="Appunti/esempio del professore",
+        item_label="Riferimento",
+    ),
+}
+
+
+# ---------------------------------------------------------------------------
+# Kotlin string helpers (String.length and take() count UTF-16 code units)
+# ---------------------------------------------------------------------------
+
+def kt_len(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def kt_take(text, n):
+    if kt_len(text) <= n:
+        return text
+    return text.encode("utf-16-le")[:n * 2].decode("utf-16-le", errors="ignore")
+
+
+def ordered_set(items):
+    """LinkedHashSet equivalent: keeps first-seen order, drops duplicates."""
+    return list(dict.fromkeys(items))
+
+
+_LABEL_SPLIT = re.compile(r"[\W_]+")
+_ROMAN = re.compile(r"[ivxlcdm]+")
+
+
+def tokenize_label(label):
+    tokens = _LABEL_SPLIT.sub(" ", label.lower()).split()
+    return ordered_set(t for t in tokens if len(t) > 2 or _ROMAN.fullmatch(t))
+
+
+_QUERY_STRIP = re.compile(r"[$\\{}^_'’`]")
+_QUERY_SPLIT = re.compile(r"[\s,;.!?()\[\]]+")
+_TAXONOMY_SPLIT = re.compile(r"[\s,;.!?()\[\]{}]+")
+
+
+def extract_query_terms(query):
+    terms = _QUERY_SPLIT.split(_QUERY_STRIP.sub(" ", query.lower()))
+    return ordered_set(
+        t.strip() for t in terms
+        if len(t.strip()) > 2 and t.strip() not in QUERY_STOPWORDS
+    )
+
+
+def taxonomy_query_terms(query):
+    return ordered_set(t for t in _TAXONOMY_SPLIT.split(query.lower()) if len(t) > 2)
+
+
+# ---------------------------------------------------------------------------
+# Corpus model (Exercise / Taxonomy ports)
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Exercise:
+    id: str
+    categoria: str
+    sottotipo: str
+    keywords: list
+    testo: str
+    svolgimento: str
+    searchable_terms: list = field(default_factory=list)
+
+    def __post_init__(self):
+        terms = [k.strip().lower() for k in self.keywords if k.strip()]
+        terms.append(self.categoria.lower())
+        terms.append(self.sottotipo.lower())
+        terms.extend(tokenize_label(self.categoria))
+        terms.extend(tokenize_label(self.sottotipo))
+        terms.extend(tokenize_label(self.testo)[:80])
+        self.searchable_terms = ordered_set(terms)
+
+    def format_for_prompt(self, solution_label, item_label):
+        return (
+            f"{item_label} [ID: {self.id} | {self.categoria} - {self.sottotipo}]:\n"
+            f"{self.testo}\n"
+            "\n"
+            f"{solution_label}:\n"
+            f"{self.svolgimento}\n"
+        )
+
+
+@dataclass
+class Category:
+    nome: str
+    keywords: list
+    subtypes: list  # list of (nome, keywords)
+
+    def searchable_terms(self):
+        terms = [k.strip().lower() for k in self.keywords if k.strip()]
+        terms.append(self.nome.lower())
+        terms.extend(tokenize_label(self.nome))
+        for sub_name, sub_keywords in self.subtypes:
+            terms.extend(subtype_terms(sub_name, sub_keywords))
+        return ordered_set(terms)
+
+
+def subtype_terms(nome, keywords):
+    terms = [k.strip().lower() for k in keywords if k.strip()]
+    terms.append(nome.lower())
+    terms.extend(tokenize_label(nome))
+    return ordered_set(terms)
+
+
+def best_match(query_terms, candidates):
+    """Shared loop of Taxonomy.findBestCategory / findBestSubtype."""
+    best, best_score = None, 0
+    for candidate, terms in candidates:
+        score = sum(1 for q in query_terms if any(t in q or q in t for t in terms))
+        if score > best_score:
+            best, best_score = candidate, score
+    return best
+
+
+class CorpusIndex:
+    """Port of RagRepository for a single exercise corpus (no theorem support)."""
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        cap = min(max(data.get("max_exercises", DEFAULT_CORPUS_MAX_EXERCISES), 1), HARD_MAX_EXERCISES)
+        self.exercises = [
+            Exercise(
+                id=e.get("id", ""),
+                categoria=e.get("categoria", ""),
+                sottotipo=e.get("sottotipo", ""),
+                keywords=e.get("keywords", []),
+                testo=e.get("testo", ""),
+                svolgimento=e.get("svolgimento", ""),
+            )
+            for e in data.get("exercises", [])[:cap]
+        ]
+        self.by_id = {e.id: e for e in self.exercises}
+        self.categories = self._synchronized_taxonomy()
+        self.category_terms = [(c, c.searchable_terms()) for c in self.categories]
+
+        self.keyword_index = {}
+        for ex in self.exercises:
+            for term in ex.searchable_terms:
+                self.keyword_index.setdefault(term, []).append(ex.id)
+
+    def _synchronized_taxonomy(self):
+        grouped = {}
+        for ex in self.exercises:
+            grouped.setdefault(ex.categoria, []).append(ex)
+
+        categories = []
+        for cat_name, cat_exercises in grouped.items():
+            cat_keywords = ordered_set(
+                k.strip() for ex in cat_exercises for k in ex.keywords if k.strip()
+            )
+            subtypes = {}
+            for ex in cat_exercises:
+                subtypes.setdefault(ex.sottotipo, []).append(ex)
+            categories.append(Category(
+                nome=cat_name,
+                keywords=ordered_set(cat_keywords + tokenize_label(cat_name)),
+                subtypes=[
+                    (
+                        sub_name,
+                        ordered_set(
+                            [k.strip() for ex in sub_exercises for k in ex.keywords if k.strip()]
+                            + tokenize_label(sub_name)
+                        ),
+                    )
+                    for sub_name, sub_exercises in subtypes.items()
+                ],
+            ))
+        return categories
+
+    def classify(self, query):
+        tax_terms = taxonomy_query_terms(query)
+        if not tax_terms:
+            return None, None, 0.0
+
+        category = best_match(tax_terms, self.category_terms)
+        if category is None:
+            return None, None, 0.0
+        subtype = best_match(
+            tax_terms,
+            [(name, subtype_terms(name, kws)) for name, kws in category.subtypes],
+        )
+
+        query_terms = extract_query_terms(query)
+        matched = [
+            kw for kw in category.keywords
+            if any(kw.lower() in q or q in kw.lower() for q in query_terms)
+        ]
+        if len(matched) >= 3:
+            confidence = 0.9
+        elif len(matched) == 2:
+            confidence = 0.7
+        elif len(matched) == 1:
+            confidence = 0.5
+        else:
+            confidence = 0.3
+        return category.nome, subtype, confidence
+
+    def find_relevant(self, query, limit):
+        category, subtype, confidence = self.classify(query)
+        query_terms = extract_query_terms(query)
+
+        scores = {}
+        for term in query_terms:
+            for ex_id in self.keyword_index.get(term, ()):
+                scores[ex_id] = scores.get(ex_id, 0) + 2
+            for key, ids in self.keyword_index.items():
+                if len(key) > 2 and term in key:
+                    for ex_id in ids:
+                        scores[ex_id] = scores.get(ex_id, 0) + 1
+
+        candidates = [
+            self.by_id[ex_id]
+            for ex_id, _ in sorted(scores.items(), key=lambda kv: -kv[1])
+            if ex_id in self.by_id
+        ]
+
+        def rank(ex):
+            score = 0
+            if category is not None and ex.categoria.lower() == category.lower():
+                score += 10
+            if subtype is not None and ex.sottotipo.lower() == subtype.lower():
+                score += 5
+            score += sum(
+                1 for q in query_terms
+                if any(len(t) > 2 and q in t for t in ex.searchable_terms)
+            )
+            return score
+
+        ranked = sorted(candidates, key=lambda ex: -rank(ex))
+        if category is not None and confidence >= CATEGORY_FILTER_MIN_CONFIDENCE:
+            in_category = [ex for ex in ranked if ex.categoria.lower() == category.lower()]
+            if in_category:
+                ranked = in_category
+        return ranked[:limit]
+
+
+# ---------------------------------------------------------------------------
+# MathContextRetriever.formatContextForPrompt port
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ContextSample:
+    query: str
+    exercise_ids: list
+    length: int
+    full_length: int
+    truncated: bool
+    included: int
+    lost_exercise_chars: int
+
+
+def exercise_text_chars(ex):
+    return kt_len(ex.testo) + kt_len(ex.svolgimento)
+
+
+def format_context(exercises, profile, max_prompt_length):
+    """
+    Formats exercises exactly like formatContextForPrompt.
+    Returns (text, included_exercises, full_length, kept_exercise_chars).
+    """
+    header = profile.context_header
+    blocks = [ex.format_for_prompt(profile.solution_label, profile.item_label) for ex in exercises]
+    formatted = f"\n{header}\n{RULE}\n" + "\n".join(blocks) + f"{RULE}\n"
+    full_length = kt_len(formatted)
+
+    if full_length <= max_prompt_length:
+        return formatted, exercises, full_length, sum(exercise_text_chars(ex) for ex in exercises)
+
+    first = exercises[0]
+    single = (
+        f"\n{header.removesuffix(':')}:\n{RULE}\n"
+        + first.format_for_prompt(profile.solution_label, profile.item_label)
+        + f"{RULE}\n"
+    )
+    if kt_len(single) <= max_prompt_length:
+        return single, exercises[:1], full_length, exercise_text_chars(first)
+
+    short = (
+        f"\n{profile.item_label.upper()} RILEVANTE:\n"
+        f"[{first.categoria}] {kt_take(first.testo, 200)}...\n"
+        f"{profile.solution_label}: {kt_take(first.svolgimento, 500)}...\n"
+    )
+    kept = min(kt_len(first.testo), 200) + min(kt_len(first.svolgimento), 500)
+    return short, exercises[:1], full_length, kept
+
+
+def measure(profile, query, exercises, max_prompt_length):
+    """Measures the context produced for one query's retrieved exercises."""
+    if not exercises:
+        return None
+    text, included, full_length, kept_chars = format_context(exercises, profile, max_prompt_length)
+    return ContextSample(
+        query=query,
+        exercise_ids=[ex.id for ex in exercises],
+        length=kt_len(text),
+        full_length=full_length,
+        truncated=full_length > max_prompt_length,
+        included=len(included),
+        lost_exercise_chars=sum(exercise_text_chars(ex) for ex in exercises) - kept_chars,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Query replay
+# ---------------------------------------------------------------------------
+
+def load_export_queries(paths):
+    """Yields (mode_id, query) for every user message in the given chat exports."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        session_modes = {s.get("id"): s.get("modeId", "") for s in data.get("sessions", [])}
+        for msg in data.get("messages", []):
+            if msg.get("role") != "user":
+                continue
+            yield session_modes.get(msg.get("sessionId"), ""), msg.get("content", "")
+
+
+def collect_queries(args, index_by_mode):
+    queries = {mode_id: [] for mode_id in index_by_mode}
+
+    for mode_id, query in load_export_queries(args.export):
+        target = args.mode or mode_id
+        if target in queries:
+            queries[target].append(query)
+
+    for path in args.query_file:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        for mode_id in queries:
+            if args.mode in (None, mode_id):
+                queries[mode_id].extend(lines)
+
+    if args.self_replay:
+        for mode_id, index in index_by_mode.items():
+            queries[mode_id].extend(ex.testo for ex in index.exercises)
+
+    return queries
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def approx_tokens(chars, chars_per_token):
+    return math.ceil(chars / chars_per_token)
+
+
+def summarize(samples, total_queries, chars_per_token):
+    lengths = sorted(s.length for s in samples)
+    truncated = [s for s in samples if s.truncated]
+    return {
+        "queries": total_queries,
+        "with_context": len(samples),
+        "truncated": len(truncated),
+        "truncation_rate": len(truncated) / len(samples) if samples else 0.0,
+        "length": {
+            "mean": sum(lengths) / len(lengths) if lengths else 0,
+            "p50": percentile(lengths, 50),
+            "p90": percentile(lengths, 90),
+            "p99": percentile(lengths, 99),
+            "max": lengths[-1] if lengths else 0,
+        },
+        "tokens": {
+            "mean": approx_tokens(sum(lengths) / len(lengths), chars_per_token) if lengths else 0,
+            "p90": approx_tokens(percentile(lengths, 90), chars_per_token),
+            "max": approx_tokens(lengths[-1], chars_per_token) if lengths else 0,
+        },
+        "lost_exercise_chars": sum(s.lost_exercise_chars for s in samples),
+        "dropped_exercises": sum(len(s.exercise_ids) - s.included for s in samples),
+    }
+
+
+def print_summary(mode_id, profile, summary):
+    length, tokens = summary["length"], summary["tokens"]
+    print(f"\n== {mode_id} ({profile.corpus}) "
+          f"max_exercises={profile.max_exercises} max_prompt_length={profile.max_prompt_length}")
+    print(f"  queries: {summary['queries']}  with context: {summary['with_context']}  "
+          f"truncated: {summary['truncated']} ({summary['truncation_rate']:.1%})")
+    print(f"  chars   mean {length['mean']:.0f}  p50 {length['p50']:.0f}  "
+          f"p90 {length['p90']:.0f}  p99 {length['p99']:.0f}  max {length['max']}")
+    print(f"  tokens~ mean {tokens['mean']}  p90 {tokens['p90']}  max {tokens['max']}")
+    print(f"  lost exercise text: {summary['lost_exercise_chars']} chars, "
+          f"{summary['dropped_exercises']} exercise(s) dropped")
+
+
+def run_sweep(index, profile, queries, lengths, exercise_counts, chars_per_token):
+    rows = []
+    for max_exercises in exercise_counts:
+        # Retrieval depends only on max_exercises, so reuse it across lengths.
+        selected = [(q, index.find_relevant(q, max_exercises)) for q in queries if q.strip()]
+        for max_len in lengths:
+            samples = [
+                s for s in (measure(profile, q, exercises, max_len) for q, exercises in selected)
+                if s is not None
+            ]
+            rows.append((max_exercises, max_len, summarize(samples, len(queries), chars_per_token)))
+    return rows
+
+
+def print_sweep(mode_id, rows):
+    print(f"\n  sweep for {mode_id}:")
+    print(f"  {'max_ex':>6} {'max_len':>8} {'mean':>7} {'p90':>7} {'tok p90':>8} "
+          f"{'trunc':>7} {'lost chars':>11}")
+    for max_exercises, max_len, s in rows:
+        print(f"  {max_exercises:>6} {max_len:>8} {s['length']['mean']:>7.0f} "
+              f"{s['length']['p90']:>7.0f} {s['tokens']['p90']:>8} "
+              f"{s['truncation_rate']:>6.1%} {s['lost_exercise_chars']:>11}")
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze RAG prompt-context size per chat mode.")
+    parser.add_argument("--export", action="append", default=[],
+                        help="chat export JSON to replay user queries from (repeatable)")
+    parser.add_argument("--query-file", action="append", default=[],
+                        help="text file with one query per line (repeatable)")
+    parser.add_argument("--self-replay", action="store_true",
+                        help="also replay every corpus exercise text as a query")
+    parser.add_argument("--mode", choices=sorted(MODE_PROFILES),
+                        help="restrict to one mode; export queries are routed to it regardless of session mode")
+    parser.add_argument("--raw-dir", default=RAW_DIR, help="directory containing the res/raw corpora")
+    parser.add_argument("--chars-per-token", type=float, default=4.0,
+                        help="heuristic used for the approximate token counts")
+    parser.add_argument("--sweep", action="store_true", help="sweep max-length/max-exercises budgets")
+    parser.add_argument("--sweep-lengths", type=parse_int_list, default=DEFAULT_SWEEP_LENGTHS)
+    parser.add_argument("--sweep-exercises", type=parse_int_list, default=DEFAULT_SWEEP_EXERCISES)
+    parser.add_argument("--json", dest="json_out", help="also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    if not args.export and not args.query_file and not args.self_replay and os.path.exists(DEFAULT_EXPORT):
+        args.export = [DEFAULT_EXPORT]
+
+    profiles = {k: v for k, v in MODE_PROFILES.items() if args.mode in (None, k)}
+    index_by_mode = {
+        mode_id: CorpusIndex(os.path.join(args.raw_dir, profile.corpus))
+        for mode_id, profile in profiles.items()
+    }
+    queries = collect_queries(args, index_by_mode)
+
+    report = {}
+    for mode_id, profile in profiles.items():
+        index = index_by_mode[mode_id]
+        mode_queries = queries[mode_id]
+        samples = [
+            s for s in (
+                measure(profile, q, index.find_relevant(q, profile.max_exercises),
+                        profile.max_prompt_length)
+                for q in mode_queries if q.strip()
+            ) if s is not None
+        ]
+        summary = summarize(samples, len(mode_queries), args.chars_per_token)
+        print_summary(mode_id, profile, summary)
+        report[mode_id] = {"summary": summary}
+
+        if args.sweep and mode_queries:
+            rows = run_sweep(index, profile, mode_queries, args.sweep_lengths,
+                             args.sweep_exercises, args.chars_per_token)
+            print_sweep(mode_id, rows)
+            report[mode_id]["sweep"] = [
+                {"max_exercises": ex, "max_prompt_length": ln, **s} for ex, ln, s in rows
+            ]
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n✓ Report written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
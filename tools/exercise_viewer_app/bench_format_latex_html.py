@@ -0,0 +1,120 @@
+"""
+Benchmark + verifica di equivalenza per latex_html.format_latex_html.
+Confronta l'output con la vecchia implementazione multi-passata su tutti i corpora
+di res/raw e misura il tempo per chiamata (anche con memoizzazione).
+
+Uso: python bench_format_latex_html.py [--raw-dir DIR] [--repeat N]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from latex_html import format_latex_html
+
+RAW_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app', 'src', 'main', 'res', 'raw')
+
+
+def legacy_format_latex_html(text):
+    """Implementazione originale di ExerciseViewer.format_latex_html (riferimento)"""
+    if not text:
+        return "<p>Nessun contenuto</p>"
+
+    result = text
+
+    result = result.replace('&', '&amp;')
+    result = result.replace('<', '&lt;')
+    result = result.replace('>', '&gt;')
+
+    display_formulas = []
+    def save_display(match):
+        display_formulas.append(match.group(1))
+        return f"__DISPLAY_{len(display_formulas)-1}__"
+
+    result = re.sub(r'\$\$(.+?)\$\$', save_display, result, flags=re.DOTALL)
+
+    result = re.sub(r'\$([^$]+?)\$', r'\\(\1\\)', result)
+
+    for i, formula in enumerate(display_formulas):
+        result = result.replace(f"__DISPLAY_{i}__", f"\\[{formula}\\]")
+
+    result = result.replace('\\n', '<br>')
+    result = result.replace('\n', '<br>')
+
+    result = result.replace('PROBLEMA:', '<div class="phase">PROBLEMA:</div>')
+    result = result.replace('FASE 1:', '<div class="phase">FASE 1:</div>')
+    result = result.replace('FASE 2:', '<div class="phase">FASE 2:</div>')
+    result = result.replace('FASE 3:', '<div class="phase">FASE 3:</div>')
+    result = result.replace('FASE 4:', '<div class="phase">FASE 4:</div>')
+    result = result.replace('FASE 5:', '<div class="phase">FASE 5:</div>')
+    result = result.replace('FASE 6:', '<div class="phase">FASE 6:</div>')
+
+    if 'RISPOSTA:' in result:
+        parts = result.split('RISPOSTA:')
+        if len(parts) == 2:
+            result = parts[0] + '<div class="result"><span class="result-label">✅ RISPOSTA:</span><br>' + parts[1] + '</div>'
+
+    return result
+
+
+def load_fields(raw_dir):
+    """[(corpus, id, campo, testo)] per testo/svolgimento di ogni esercizio"""
+    fields = []
+    for path in sorted(glob.glob(os.path.join(raw_dir, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            continue
+        for ex in data.get('exercises', []):
+            fields.append((os.path.basename(path), ex.get('id'), 'testo', ex.get('testo', 'Nessun testo')))
+            fields.append((os.path.basename(path), ex.get('id'), 'svolgimento',
+                           ex.get('svolgimento', 'Nessuno svolgimento')))
+    return fields
+
+
+def time_per_call(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--raw-dir', default=RAW_DIR)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    fields = load_fields(args.raw_dir)
+    texts = [text for _, _, _, text in fields]
+
+    mismatches = [(corpus, ex_id, field) for corpus, ex_id, field, text in fields
+                  if format_latex_html(text) != legacy_format_latex_html(text)]
+    print(f"Campi confrontati: {len(fields)}  differenze: {len(mismatches)}")
+    for corpus, ex_id, field in mismatches[:10]:
+        print(f"  ✗ {corpus} {ex_id} {field}")
+
+    legacy = time_per_call(legacy_format_latex_html, texts, args.repeat)
+    current = time_per_call(format_latex_html, texts, args.repeat)
+
+    cache = {}
+    def memoized(text):
+        html = cache.get(text)
+        if html is None:
+            html = cache[text] = format_latex_html(text)
+        return html
+    memo = time_per_call(memoized, texts, args.repeat)
+
+    print(f"legacy       {legacy * 1e6:8.1f} µs/chiamata")
+    print(f"latex_html   {current * 1e6:8.1f} µs/chiamata  ({legacy / current:.1f}x)")
+    print(f"memoizzato   {memo * 1e6:8.1f} µs/chiamata  ({legacy / memo:.0f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
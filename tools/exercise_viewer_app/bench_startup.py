@@ -0,0 +1,110 @@
+"""
+Benchmark di avvio di ExerciseViewer: tempo di import, primo disegno della finestra,
+dati caricati e QtWebEngine pronto. Ogni misura gira in un interprete nuovo
+(piattaforma Qt "offscreen", nessun display richiesto).
+
+Uso: python bench_startup.py [--json FILE] [--rounds N] [--save FILE] [--baseline FILE] [--max-regression 0.2]
+Con --baseline esce con codice 1 se una mediana peggiora oltre la soglia; una misura
+mancante in un giro rende l'avvio non misurabile (codice 2).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_JSON = os.path.join(APP_DIR, '..', '..', 'app', 'src', 'main', 'res', 'raw', 'esercizi_analisi.json')
+
+# Misure relative all'avvio del processo figlio, in secondi
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import exercise_viewer as ev
+imported = time.perf_counter()
+from PyQt5.QtCore import QCoreApplication, Qt
+from PyQt5.QtWidgets import QApplication
+QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+app = QApplication([])
+viewer = ev.ExerciseViewer(sys.argv[1])
+viewer.show()
+marks = {}
+deadline = time.perf_counter() + 30
+while time.perf_counter() < deadline and len(marks) < 3 and viewer.load_error is None:
+    app.processEvents()
+    now = time.perf_counter()
+    if viewer.first_paint is not None:
+        marks.setdefault("first_paint_s", viewer.first_paint - start)
+    if viewer.data_loaded:
+        marks.setdefault("data_loaded_s", now - start)
+    if viewer.browser is not None:
+        marks.setdefault("browser_ready_s", now - start)
+viewer.loader.wait()
+if viewer.load_error is not None:
+    sys.exit("caricamento fallito: " + viewer.load_error)
+marks["import_s"] = imported - start
+print(json.dumps(marks))
+"""
+
+METRICS = ["import_s", "first_paint_s", "data_loaded_s", "browser_ready_s"]
+
+
+def run_probe(json_path):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    proc = subprocess.run([sys.executable, "-c", PROBE, json_path], cwd=APP_DIR, env=env,
+                          capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "probe fallito")
+    marks = json.loads(proc.stdout.strip().splitlines()[-1])
+    missing = [m for m in METRICS if m not in marks]
+    if missing:
+        raise RuntimeError(f"misure mancanti: {', '.join(missing)}")
+    return marks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--json', default=DEFAULT_JSON, help="JSON degli esercizi da caricare")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--save', metavar='FILE', help="Salva le mediane come nuova baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="Confronta con una baseline salvata")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Peggioramento relativo tollerato rispetto alla baseline")
+    args = parser.parse_args()
+    if not os.path.exists(args.json):
+        parser.error(f"file non trovato: {args.json}")
+
+    try:
+        samples = [run_probe(os.path.abspath(args.json)) for _ in range(args.rounds)]
+    except RuntimeError as e:
+        print(f"❌ Avvio non misurabile: {e}")
+        return 2
+
+    medians = {m: statistics.median(s[m] for s in samples) for m in METRICS}
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    regressions = []
+    for metric, value in medians.items():
+        line = f"{metric:<16} {value * 1000:8.1f} ms"
+        if metric in baseline:
+            delta = value / baseline[metric] - 1
+            line += f"  ({delta:+.0%} vs baseline)"
+            if delta > args.max_regression:
+                regressions.append(metric)
+                line += "  ✗"
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(medians, f, indent=2)
+        print(f"💾 Baseline salvata in {args.save}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
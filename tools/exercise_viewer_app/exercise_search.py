@@ -0,0 +1,136 @@
+"""
+Indice invertito per la ricerca full-text negli esercizi (testo, svolgimento, keywords).
+Indipendente da Qt: viene costruito una volta al caricamento e interrogato ad ogni
+ricerca, senza toccare i widget.
+"""
+
+import bisect
+import math
+import re
+import unicodedata
+
+# Peso di ogni campo nel punteggio (le keywords sono curate a mano, valgono di piu')
+FIELD_WEIGHTS = {"keywords": 3.0, "testo": 2.0, "svolgimento": 1.0}
+
+# BM25
+K1 = 1.2
+B = 0.75
+
+# Il JSON contiene "\n" letterali: sono a capo, tranne quando aprono un comando LaTeX
+LITERAL_NEWLINE = re.compile(r'\\n(?!(?:abla|eq|e|eg|exists|i|mid|ot|otin|u|leq|geq)\b)')
+LATEX_COMMAND = re.compile(r'\\([a-zA-Z]+)')
+WORD = re.compile(r'\w+')
+
+# Comandi di sola impaginazione: non portano significato, non vengono indicizzati
+LAYOUT_COMMANDS = {
+    "left", "right", "quad", "qquad", "text", "mathrm", "mathbf", "displaystyle",
+    "big", "bigg", "cdot", "begin", "end", "frac", "dfrac", "tfrac",
+}
+
+
+def normalize(word):
+    """Minuscolo senza accenti: 'Probabilità' -> 'probabilita'."""
+    decomposed = unicodedata.normalize("NFKD", word.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _replace_command(match):
+    name = match.group(1)
+    return " " if name in LAYOUT_COMMANDS else f" {name} "
+
+
+def tokenize(text):
+    """Token normalizzati; i comandi LaTeX diventano token senza backslash."""
+    text = LITERAL_NEWLINE.sub(" ", text)
+    text = LATEX_COMMAND.sub(_replace_command, text)
+    return [
+        token for token in (normalize(w) for w in WORD.findall(text))
+        if len(token) > 1 and token.strip("_")
+    ]
+
+
+class ExerciseSearchIndex:
+    def __init__(self, exercises):
+        self.exercises = exercises
+        self.postings = {}  # term -> {indice esercizio: frequenza pesata}
+        self.doc_lengths = []
+
+        for doc, ex in enumerate(exercises):
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                value = ex.get(field, "")
+                if isinstance(value, list):
+                    value = " ".join(value)
+                for token in tokenize(value or ""):
+                    postings = self.postings.setdefault(token, {})
+                    postings[doc] = postings.get(doc, 0.0) + weight
+                    length += weight
+            self.doc_lengths.append(length)
+
+        self.vocabulary = sorted(self.postings)
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    def expand(self, token, prefix):
+        """Termini del vocabolario che corrispondono al token (prefisso per l'ultima parola)."""
+        if not prefix:
+            return [token] if token in self.postings else []
+        start = bisect.bisect_left(self.vocabulary, token)
+        end = bisect.bisect_left(self.vocabulary, token + "\uffff")
+        return self.vocabulary[start:end]
+
+    def search(self, query, allowed=None):
+        """
+        Ricerca AND su tutte le parole della query, l'ultima trattata come prefisso
+        (si sta ancora digitando). Ritorna [(indice esercizio, punteggio)] ordinati.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        n_docs = len(self.exercises)
+        scores = None
+        for pos, token in enumerate(tokens):
+            token_scores = {}
+            for term in self.expand(token, prefix=(pos == len(tokens) - 1)):
+                postings = self.postings[term]
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf in postings.items():
+                    norm = K1 * (1 - B + B * self.doc_lengths[doc] / self.avg_length)
+                    bm25 = idf * tf * (K1 + 1) / (tf + norm)
+                    token_scores[doc] = max(token_scores.get(doc, 0.0), bm25)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc: s + token_scores[doc] for doc, s in scores.items() if doc in token_scores}
+            if not scores:
+                return []
+
+        results = [(doc, s) for doc, s in scores.items() if allowed is None or doc in allowed]
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results
+
+    def query_terms(self, query):
+        """Prefissi normalizzati da evidenziare per una query."""
+        return tokenize(query)
+
+
+# Parti dell'HTML da non toccare: tag, entita', formule MathJax
+_PROTECTED = re.compile(r'(<[^>]+>|&\w+;|\\\(.*?\\\)|\\\[.*?\\\])', re.DOTALL)
+
+
+def highlight_html(html_text, terms):
+    """Avvolge in <mark> le parole che iniziano con un termine cercato, fuori da tag e formule."""
+    if not terms:
+        return html_text
+
+    def mark(match):
+        word = match.group(0)
+        normalized = normalize(word)
+        if any(normalized.startswith(term) for term in terms):
+            return f"<mark>{word}</mark>"
+        return word
+
+    parts = _PROTECTED.split(html_text)
+    for i in range(0, len(parts), 2):
+        parts[i] = WORD.sub(mark, parts[i])
+    return "".join(parts)
@@ -3,81 +3,108 @@ Visualizzatore Esercizi Analisi 2 con rendering LaTeX via QtWebEngine
 Autore: AIHelperWearOS Tools
 """
 
+import argparse
+import base64
 import json
 import sys
 import os
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QListWidget, QListWidgetItem, QPushButton,
-                             QLabel, QComboBox, QSplitter, QFrame)
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import Qt, QUrl
-from PyQt5.QtGui import QFont, QPalette, QColor
+                             QLabel, QComboBox, QSplitter, QFrame, QLineEdit, QShortcut,
+                             QFileDialog)
+# QtWebEngineWidgets (il modulo piu' pesante) viene importato dopo il primo disegno
+from PyQt5.QtCore import Qt, QUrl, QTimer, QThread, QCoreApplication, pyqtSignal
+from PyQt5.QtGui import QFont, QPalette, QColor, QKeySequence
 
-# HTML template con MathJax per rendering LaTeX
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <script src="https://polyfill.io/v3/polyfill.min.js?features=es6"></script>
-    <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
-    <style>
-        body {{
-            background-color: #1a1a2e;
-            color: #e0e0e0;
-            font-family: 'Segoe UI', Arial, sans-serif;
-            font-size: 14px;
-            padding: 20px;
-            line-height: 1.6;
-        }}
-        .section-title {{
-            color: #00d4ff;
-            font-size: 18px;
-            font-weight: bold;
-            margin-top: 20px;
-            margin-bottom: 10px;
-            border-bottom: 2px solid #0f3460;
-            padding-bottom: 5px;
-        }}
-        .phase {{
-            color: #4fc3f7;
-            font-weight: bold;
-            margin-top: 15px;
-        }}
-        .result {{
-            background: linear-gradient(135deg, #0f3460 0%, #16213e 100%);
-            border: 2px solid #00d4ff;
-            border-radius: 8px;
-            padding: 15px;
-            margin: 15px 0;
-        }}
-        .result-label {{
-            color: #00ff88;
-            font-weight: bold;
-        }}
-        .testo-box {{
-            background-color: #16213e;
-            border-left: 4px solid #e94560;
-            padding: 15px;
-            margin: 10px 0;
-            border-radius: 0 8px 8px 0;
-        }}
-        .svolgimento-box {{
-            background-color: #16213e;
-            padding: 15px;
-            margin: 10px 0;
-            border-radius: 8px;
-        }}
-        mjx-container {{
-            color: #ffcc00 !important;
-        }}
-    </style>
-</head>
-<body>
-{content}
-</body>
-</html>
-"""
+# Formule prerenderizzate (tools/latex_cache/prerender.py), opzionali
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from latex_cache.store import RenderStore
+except ImportError:
+    RenderStore = None
+from perf_trace import trace
+
+from exercise_search import ExerciseSearchIndex, highlight_html
+import latex_html
+from latex_html import HTML_TEMPLATE, exercise_content_html
+import static_export
+
+# Attesa dopo l'ultimo tasto prima di eseguire la ricerca
+SEARCH_DEBOUNCE_MS = 200
+# Aggiornamento dell'overlay dei tempi (solo con --trace / AIHELPER_TRACE)
+TRACE_OVERLAY_MS = 500
+
+
+def find_exercises_json():
+    """Percorso del JSON degli esercizi (bundle PyInstaller, cartella dello script o res/raw)"""
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    possible_paths = [
+        os.path.join(base_path, 'esercizi_analisi2.json'),
+        os.path.join(script_dir, 'esercizi_analisi2.json'),
+        os.path.join(script_dir, '..', '..', 'app', 'src', 'main', 'res', 'raw', 'esercizi_analisi2.json'),
+        r'c:\Users\Nitesam\AndroidStudioProjects\AIHelperWearOS\app\src\main\res\raw\esercizi_analisi2.json'
+    ]
+    
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_exercise_data(json_path):
+    """Lettura, categorie e indice di ricerca: nessun widget, gira nel thread di caricamento"""
+    with trace.span("json.load", path=os.path.basename(json_path)):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    
+    exercises = data.get('exercises', [])
+    categories = {}
+    for ex in exercises:
+        cat = ex.get('categoria', 'Altro')
+        if cat not in categories:
+            categories[cat] = []
+        categories[cat].append(ex)
+    
+    with trace.span("search_index.build"):
+        search_index = ExerciseSearchIndex(exercises)
+    return exercises, categories, search_index
+
+
+class ExerciseLoader(QThread):
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, json_path, parent=None):
+        super().__init__(parent)
+        self.json_path = json_path
+        
+    def run(self):
+        try:
+            self.loaded.emit(load_exercise_data(self.json_path))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class LoadingLabel(QLabel):
+    """Segnaposto del pannello destro finche' QtWebEngine non e' pronto; segnala il primo disegno"""
+    painted = pyqtSignal()
+    
+    def __init__(self, text, parent=None):
+        super().__init__(text, parent)
+        self.was_painted = False
+        
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.was_painted:
+            self.was_painted = True
+            self.painted.emit()
 
 
 class ExerciseViewer(QMainWindow):
@@ -85,28 +112,65 @@ class ExerciseViewer(QMainWindow):
         super().__init__()
         self.exercises = []
         self.categories = {}
+        self.exercises_by_id = {}
+        self.search_index = ExerciseSearchIndex([])
+        self.search_terms = []
+        self.shown_ids = None
+        self.html_cache = {}
         self.current_exercise = None
+        self.render_store = RenderStore() if RenderStore else None
+        self.page_load_start = None
+        self.trace_overlay = None
+        self.browser = None
+        self.data_loaded = False
+        self.load_error = None
+        self.first_paint = None  # perf_counter() del primo disegno della finestra
         
-        self.load_exercises(json_path)
+        # La finestra compare subito: dati e QtWebEngine arrivano dopo
         self.setup_ui()
+        self.loader = ExerciseLoader(json_path, self)
+        self.loader.loaded.connect(self.on_exercises_loaded)
+        self.loader.failed.connect(self.on_load_failed)
+        self.loader.start()
         
-    def load_exercises(self, json_path):
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            self.exercises = data.get('exercises', [])
-            
-            for ex in self.exercises:
-                cat = ex.get('categoria', 'Altro')
-                if cat not in self.categories:
-                    self.categories[cat] = []
-                self.categories[cat].append(ex)
-                
-            print(f"✅ Caricati {len(self.exercises)} esercizi in {len(self.categories)} categorie")
+    def on_exercises_loaded(self, result):
+        self.exercises, self.categories, self.search_index = result
+        self.exercises_by_id = {ex.get('id'): ex for ex in self.exercises}
+        self.data_loaded = True
+        
+        self.category_combo.addItems(list(self.categories.keys()))
+        self.results_label.setText("")
+        self.shown_ids = None
+        self.run_search()
+        print(f"✅ Caricati {len(self.exercises)} esercizi in {len(self.categories)} categorie")
+        
+    def on_load_failed(self, error):
+        self.load_error = error
+        self.results_label.setText("❌ Errore caricamento")
+        print(f"❌ Errore caricamento: {error}")
+        
+    def on_first_paint(self):
+        self.first_paint = time.perf_counter()
+        QTimer.singleShot(0, self.create_browser)
+        
+    def create_browser(self):
+        """Import e creazione di QtWebEngine, rinviati a dopo il primo disegno della finestra"""
+        if self.browser is not None:
+            return
+        with trace.span("create_browser"):
+            from PyQt5.QtWebEngineWidgets import QWebEngineView
             
-        except Exception as e:
-            print(f"❌ Errore caricamento: {e}")
+            self.browser = QWebEngineView()
+            self.browser.loadFinished.connect(self.on_page_loaded)
+            self.main_layout.replaceWidget(self.loading_label, self.browser)
+            self.loading_label.deleteLater()
+        
+        if trace.enabled():
+            self.setup_trace_overlay()
+        if self.current_exercise:
+            self.display_exercise(self.current_exercise)
+        else:
+            self.browser.setHtml(HTML_TEMPLATE.format(head="", content="<p>Seleziona un esercizio dalla lista</p>"))
             
     def setup_ui(self):
         self.setWindowTitle("📚 Visualizzatore Esercizi Analisi 2 - LaTeX")
@@ -127,6 +191,13 @@ class ExerciseViewer(QMainWindow):
             QListWidget::item:hover { 
                 background-color: #0f3460; 
             }
+            QLineEdit { 
+                background-color: #16213e; 
+                color: white; 
+                border: 1px solid #0f3460;
+                padding: 5px;
+                border-radius: 5px;
+            }
             QComboBox { 
                 background-color: #16213e; 
                 color: white; 
@@ -154,7 +225,7 @@ class ExerciseViewer(QMainWindow):
         # Widget centrale
         central = QWidget()
         self.setCentralWidget(central)
-        layout = QHBoxLayout(central)
+        layout = self.main_layout = QHBoxLayout(central)
         
         # Pannello sinistro
         left_panel = QFrame()
@@ -166,10 +237,24 @@ class ExerciseViewer(QMainWindow):
         title.setStyleSheet("font-size: 16px; font-weight: bold; color: #00d4ff;")
         left_layout.addWidget(title)
         
+        # Ricerca full-text (debounce: l'indice viene interrogato solo a digitazione ferma)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("🔍 Cerca in testo, svolgimento, keywords...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        left_layout.addWidget(self.search_edit)
+        
+        self.results_label = QLabel("⏳ Caricamento esercizi...")
+        self.results_label.setStyleSheet("color: #808080; font-size: 11px;")
+        left_layout.addWidget(self.results_label)
+        
         # Filtro categoria
         self.category_combo = QComboBox()
         self.category_combo.addItem("Tutte le categorie")
-        self.category_combo.addItems(list(self.categories.keys()))
         self.category_combo.currentTextChanged.connect(self.filter_exercises)
         left_layout.addWidget(self.category_combo)
         
@@ -178,8 +263,6 @@ class ExerciseViewer(QMainWindow):
         self.exercise_list.itemClicked.connect(self.on_exercise_selected)
         left_layout.addWidget(self.exercise_list)
         
-        self.populate_list()
-        
         # Pulsanti navigazione
         nav_layout = QHBoxLayout()
         prev_btn = QPushButton("⬅️ Prec")
@@ -195,102 +278,150 @@ class ExerciseViewer(QMainWindow):
         
         layout.addWidget(left_panel)
         
-        # Pannello destro - WebEngine per MathJax
-        self.browser = QWebEngineView()
-        self.browser.setHtml(HTML_TEMPLATE.format(content="<p>Seleziona un esercizio dalla lista</p>"))
-        layout.addWidget(self.browser, stretch=1)
+        # Pannello destro - WebEngine per MathJax (creato in create_browser)
+        self.loading_label = LoadingLabel("⏳ Caricamento...")
+        self.loading_label.setAlignment(Qt.AlignCenter)
+        self.loading_label.setStyleSheet("color: #808080; font-size: 16px;")
+        self.loading_label.painted.connect(self.on_first_paint)
+        layout.addWidget(self.loading_label, stretch=1)
+        
+    def setup_trace_overlay(self):
+        """Tempi degli hot path sopra la pagina (F12 mostra/nasconde, Ctrl+Shift+T esporta)"""
+        self.trace_overlay = QLabel(self.browser)
+        self.trace_overlay.setStyleSheet(
+            "background-color: rgba(22, 33, 62, 220); color: #ffcc00; border: 1px solid #0f3460;"
+            "font-family: Consolas, monospace; font-size: 10px; padding: 4px;"
+        )
+        self.trace_overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+        QShortcut(QKeySequence("F12"), self, self.toggle_trace_overlay)
+        QShortcut(QKeySequence("Ctrl+Shift+T"), self, self.export_trace)
+        self.trace_timer = QTimer(self)
+        self.trace_timer.timeout.connect(self.refresh_trace_overlay)
+        self.trace_timer.start(TRACE_OVERLAY_MS)
+        self.refresh_trace_overlay()
+        
+    def refresh_trace_overlay(self):
+        if self.trace_overlay.isHidden():
+            return
+        lines = trace.summary_lines()
+        self.trace_overlay.setText("\n".join(lines) if lines else "⏱ tracing: nessuno span")
+        self.trace_overlay.adjustSize()
+        self.trace_overlay.move(self.browser.width() - self.trace_overlay.width() - 20, 4)
+        self.trace_overlay.raise_()
+        
+    def toggle_trace_overlay(self):
+        self.trace_overlay.setVisible(self.trace_overlay.isHidden())
+        
+    def export_trace(self):
+        path = trace.output_path()
+        if not path:
+            path, _ = QFileDialog.getSaveFileName(self, "Salva trace Chrome", "exercise_viewer_trace.json",
+                                                  "Chrome trace (*.json)")
+        if path:
+            trace.export_chrome_trace(path)
+            print(f"✅ Trace salvato in {path}")
+        
+    def on_page_loaded(self, ok):
+        # setHtml e' asincrono: lo span copre richiesta -> pagina caricata
+        if self.page_load_start is not None:
+            trace.add_span("page.load", self.page_load_start, trace.now(), {"ok": ok})
+            self.page_load_start = None
         
     def populate_list(self, filter_cat=None):
-        self.exercise_list.clear()
-        for ex in self.exercises:
-            cat = ex.get('categoria', 'Altro')
-            if filter_cat and filter_cat != "Tutte le categorie" and cat != filter_cat:
-                continue
-            item = QListWidgetItem(f"{ex.get('id', '?')} - {ex.get('sottotipo', '')[:25]}")
-            item.setData(Qt.UserRole, ex.get('id'))
-            self.exercise_list.addItem(item)
+        if filter_cat is None:
+            filter_cat = self.category_combo.currentText()
+        by_category = filter_cat and filter_cat != "Tutte le categorie"
+        query = self.search_edit.text().strip()
+        
+        if query:
+            allowed = None
+            if by_category:
+                allowed = {i for i, ex in enumerate(self.exercises) if ex.get('categoria', 'Altro') == filter_cat}
+            with trace.span("search", query=query):
+                results = self.search_index.search(query, allowed)
+            shown = [self.exercises[i] for i, _ in results]
+            self.results_label.setText(f"{len(shown)} risultati")
+        else:
+            shown = [ex for ex in self.exercises
+                     if not by_category or ex.get('categoria', 'Altro') == filter_cat]
+            self.results_label.setText("")
+        
+        # Il QListWidget viene ricostruito solo se il risultato e' cambiato
+        shown_ids = [ex.get('id') for ex in shown]
+        if shown_ids == self.shown_ids:
+            return
+        self.shown_ids = shown_ids
+        
+        with trace.span("populate_list", items=len(shown)):
+            self.exercise_list.clear()
+            for ex in shown:
+                item = QListWidgetItem(f"{ex.get('id', '?')} - {ex.get('sottotipo', '')[:25]}")
+                item.setData(Qt.UserRole, ex.get('id'))
+                self.exercise_list.addItem(item)
             
     def filter_exercises(self, category):
         self.populate_list(category)
         
+    def run_search(self):
+        if not self.data_loaded:
+            return
+        self.search_terms = self.search_index.query_terms(self.search_edit.text())
+        self.populate_list()
+        if self.current_exercise:
+            self.display_exercise(self.current_exercise)
+        
     def on_exercise_selected(self, item):
         exercise_id = item.data(Qt.UserRole)
-        exercise = next((ex for ex in self.exercises if ex.get('id') == exercise_id), None)
+        exercise = self.exercises_by_id.get(exercise_id)
         if exercise:
             self.display_exercise(exercise)
             
     def display_exercise(self, exercise):
         self.current_exercise = exercise
+        if self.browser is None:
+            # Verra' mostrato da create_browser
+            return
         
-        testo = exercise.get('testo', 'Nessun testo')
-        svolgimento = exercise.get('svolgimento', 'Nessuno svolgimento')
+        testo = self.exercise_field_html(exercise, 'testo', 'Nessun testo')
+        svolgimento = self.exercise_field_html(exercise, 'svolgimento', 'Nessuno svolgimento')
         
         # Formatta contenuto HTML
-        content = f"""
-        <div class="section-title">📝 TESTO</div>
-        <div class="testo-box">
-            {self.format_latex_html(testo)}
-        </div>
-        
-        <div class="section-title">✏️ SVOLGIMENTO</div>
-        <div class="svolgimento-box">
-            {self.format_latex_html(svolgimento)}
-        </div>
-        """
+        with trace.span("highlight_html"):
+            content = exercise_content_html(
+                highlight_html(testo, self.search_terms),
+                highlight_html(svolgimento, self.search_terms)
+            )
         
-        html = HTML_TEMPLATE.format(content=content)
-        self.browser.setHtml(html)
+        html = HTML_TEMPLATE.format(head="", content=content)
+        if trace.enabled():
+            self.page_load_start = trace.now()
+        with trace.span("setHtml", bytes=len(html)):
+            self.browser.setHtml(html)
         
     def format_latex_html(self, text):
         """Formatta il testo per HTML con LaTeX"""
-        if not text:
-            return "<p>Nessun contenuto</p>"
-            
-        result = text
-        
-        # Escape HTML (ma NON i backslash del LaTeX)
-        result = result.replace('&', '&amp;')
-        result = result.replace('<', '&lt;')
-        result = result.replace('>', '&gt;')
-        
-        # Prima gestisci $$...$$ (display math) con placeholder
-        import re
-        
-        # Salva le formule display in un placeholder per non confonderle con inline
-        display_formulas = []
-        def save_display(match):
-            display_formulas.append(match.group(1))
-            return f"__DISPLAY_{len(display_formulas)-1}__"
-        
-        result = re.sub(r'\$\$(.+?)\$\$', save_display, result, flags=re.DOTALL)
-        
-        # Ora converti le formule inline $...$ in \(...\)
-        result = re.sub(r'\$([^$]+?)\$', r'\\(\1\\)', result)
-        
-        # Ripristina le formule display come \[...\]
-        for i, formula in enumerate(display_formulas):
-            result = result.replace(f"__DISPLAY_{i}__", f"\\[{formula}\\]")
-        
-        # Converti newline in <br>
-        result = result.replace('\\n', '<br>')
-        result = result.replace('\n', '<br>')
-        
-        # Evidenzia sezioni
-        result = result.replace('PROBLEMA:', '<div class="phase">PROBLEMA:</div>')
-        result = result.replace('FASE 1:', '<div class="phase">FASE 1:</div>')
-        result = result.replace('FASE 2:', '<div class="phase">FASE 2:</div>')
-        result = result.replace('FASE 3:', '<div class="phase">FASE 3:</div>')
-        result = result.replace('FASE 4:', '<div class="phase">FASE 4:</div>')
-        result = result.replace('FASE 5:', '<div class="phase">FASE 5:</div>')
-        result = result.replace('FASE 6:', '<div class="phase">FASE 6:</div>')
-        
-        # Evidenzia risposta
-        if 'RISPOSTA:' in result:
-            parts = result.split('RISPOSTA:')
-            if len(parts) == 2:
-                result = parts[0] + '<div class="result"><span class="result-label">✅ RISPOSTA:</span><br>' + parts[1] + '</div>'
-                
-        return result
+        return latex_html.format_latex_html(text, self.stored_formula_html)
+        
+    def exercise_field_html(self, exercise, field, default):
+        """HTML di un campo dell'esercizio, memoizzato per (id esercizio, campo)"""
+        key = (exercise.get('id'), field)
+        cached = self.html_cache.get(key)
+        if cached is None:
+            with trace.span("format_latex_html", field=field):
+                cached = self.html_cache[key] = self.format_latex_html(exercise.get(field, default))
+        else:
+            trace.count("html_cache.hit")
+        return cached
+        
+    def stored_formula_html(self, formula, is_display):
+        """Immagine dal render store se la formula e' gia' stata prerenderizzata, altrimenti None"""
+        if self.render_store is None:
+            return None
+        data = self.render_store.get(formula, is_display)
+        if data is None:
+            return None
+        img = f'<img class="tex-img" src="data:image/png;base64,{base64.b64encode(data).decode("ascii")}">'
+        return f'<div class="tex-display">{img}</div>' if is_display else img
         
     def prev_exercise(self):
         current = self.exercise_list.currentRow()
@@ -314,33 +445,27 @@ class ExerciseViewer(QMainWindow):
 
 
 def main():
-    if getattr(sys, 'frozen', False):
-        base_path = sys._MEIPASS
-    else:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    possible_paths = [
-        os.path.join(base_path, 'esercizi_analisi2.json'),
-        os.path.join(script_dir, 'esercizi_analisi2.json'),
-        os.path.join(script_dir, '..', 'app', 'src', 'main', 'res', 'raw', 'esercizi_analisi2.json'),
-        r'c:\Users\Nitesam\AndroidStudioProjects\AIHelperWearOS\app\src\main\res\raw\esercizi_analisi2.json'
-    ]
-    
-    json_path = None
-    for path in possible_paths:
-        if os.path.exists(path):
-            json_path = path
-            break
-            
+    parser = argparse.ArgumentParser(add_help=False)
+    static_export.add_export_arguments(parser)
+    parser.add_argument('--trace', nargs='?', const='1', metavar='PATH',
+                        help=f"Registra i tempi degli hot path (overlay, F12); con PATH scrive anche "
+                             f"un trace Chrome all'uscita (come {trace.ENV_VAR}=PATH)")
+    args, qt_argv = parser.parse_known_args()
+    trace.configure(args.trace)
+    if args.export:
+        sys.exit(static_export.run_export(args.export, args.corpus, args.page_size,
+                                          args.pdf, args.pdf_concurrency))
+
+    json_path = find_exercises_json()
     if not json_path:
         print("❌ File non trovato!")
         sys.exit(1)
         
     print(f"📂 Caricamento da: {json_path}")
     
-    app = QApplication(sys.argv)
+    # Permette di importare QtWebEngineWidgets dopo la creazione della QApplication
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    app = QApplication(sys.argv[:1] + qt_argv)
     viewer = ExerciseViewer(json_path)
     viewer.show()
     sys.exit(app.exec_())
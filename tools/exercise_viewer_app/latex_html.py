@@ -0,0 +1,175 @@
+"""
+Template HTML condiviso (viewer ed export statico) e conversione testo esercizio
+-> HTML per MathJax.
+L'escape HTML e gli a capo sono sostituzioni native di str sull'intero testo; una
+regex precompilata converte poi formule $$...$$ e $...$ in un solo passaggio e una
+seconda evidenzia i marcatori di fase. Le formule prerenderizzate vengono sostituite
+prima dell'escape con segnaposto e reinserite alla fine.
+L'output e' identico alla vecchia pipeline a piu' passate (vedi bench_format_latex_html.py).
+"""
+
+import re
+
+# HTML template con MathJax per rendering LaTeX
+HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+{head}
+    <script src="https://polyfill.io/v3/polyfill.min.js?features=es6"></script>
+    <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
+    <style>
+        body {{
+            background-color: #1a1a2e;
+            color: #e0e0e0;
+            font-family: 'Segoe UI', Arial, sans-serif;
+            font-size: 14px;
+            padding: 20px;
+            line-height: 1.6;
+        }}
+        .section-title {{
+            color: #00d4ff;
+            font-size: 18px;
+            font-weight: bold;
+            margin-top: 20px;
+            margin-bottom: 10px;
+            border-bottom: 2px solid #0f3460;
+            padding-bottom: 5px;
+        }}
+        .phase {{
+            color: #4fc3f7;
+            font-weight: bold;
+            margin-top: 15px;
+        }}
+        .result {{
+            background: linear-gradient(135deg, #0f3460 0%, #16213e 100%);
+            border: 2px solid #00d4ff;
+            border-radius: 8px;
+            padding: 15px;
+            margin: 15px 0;
+        }}
+        .result-label {{
+            color: #00ff88;
+            font-weight: bold;
+        }}
+        .testo-box {{
+            background-color: #16213e;
+            border-left: 4px solid #e94560;
+            padding: 15px;
+            margin: 10px 0;
+            border-radius: 0 8px 8px 0;
+        }}
+        .svolgimento-box {{
+            background-color: #16213e;
+            padding: 15px;
+            margin: 10px 0;
+            border-radius: 8px;
+        }}
+        mjx-container {{
+            color: #ffcc00 !important;
+        }}
+        mark {{
+            background-color: #e94560;
+            color: white;
+            border-radius: 3px;
+            padding: 0 2px;
+        }}
+        .tex-img {{
+            vertical-align: middle;
+            filter: url(#tex-tint);
+        }}
+        .tex-display {{
+            text-align: center;
+            margin: 10px 0;
+        }}
+    </style>
+</head>
+<body>
+<!-- Formule prerenderizzate (nere) nello stesso giallo di MathJax; lo sfondo chiaro diventa trasparente -->
+<svg width="0" height="0" style="position: absolute">
+    <filter id="tex-tint" color-interpolation-filters="sRGB">
+        <feColorMatrix type="matrix" values="0 0 0 0 1  0 0 0 0 0.8  0 0 0 0 0  -0.2126 -0.7152 -0.0722 1 0"/>
+    </filter>
+</svg>
+{content}
+</body>
+</html>
+"""
+
+# Contenuto di un esercizio (testo + svolgimento gia' formattati)
+EXERCISE_CONTENT = """
+        <div class="section-title">📝 TESTO</div>
+        <div class="testo-box">
+            {testo}
+        </div>
+        
+        <div class="section-title">✏️ SVOLGIMENTO</div>
+        <div class="svolgimento-box">
+            {svolgimento}
+        </div>
+        """
+
+EMPTY_HTML = "<p>Nessun contenuto</p>"
+ANSWER_MARKER = "RISPOSTA:"
+ANSWER_OPEN = '<div class="result"><span class="result-label">✅ RISPOSTA:</span><br>'
+
+# $$...$$ prima di $...$ per non spezzare le formule display.
+_FORMULA = re.compile(r'\$\$(.+?)\$\$|\$([^$]+?)\$', re.DOTALL)
+# Il lookahead sul primo carattere evita di provare l'alternanza ad ogni posizione.
+_PHASE = re.compile(r'(?=[PF])(?:PROBLEMA:|FASE \d+:)')
+# Segnaposto di una formula prerenderizzata: sopravvive all'escape e ai marcatori
+_PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+
+
+def exercise_content_html(testo_html, svolgimento_html):
+    return EXERCISE_CONTENT.format(testo=testo_html, svolgimento=svolgimento_html)
+
+
+def _escape(text):
+    # Escape HTML (ma NON i backslash del LaTeX) e newline, reali o "\n" letterali
+    return (text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            .replace('\\n', '<br>').replace('\n', '<br>'))
+
+
+def _mathjax(match):
+    display = match.group(1)
+    if display is not None:
+        return f"\\[{display}\\]"
+    return f"\\({match.group(2)}\\)"
+
+
+def format_latex_html(text, formula_html=None):
+    """
+    Formatta il testo per HTML con LaTeX.
+    formula_html(latex, is_display) puo' restituire l'HTML gia' pronto di una
+    formula (es. immagine prerenderizzata); se ritorna None si usa MathJax.
+    """
+    if not text:
+        return EMPTY_HTML
+
+    rendered = []
+    if formula_html is not None and '$' in text:
+        def prerendered(match):
+            display = match.group(1)
+            html = formula_html(match.group(2) if display is None else display, display is not None)
+            if not html:
+                return match.group(0)  # resta per il passaggio MathJax
+            rendered.append(html)
+            return f"\x00{len(rendered) - 1}\x00"
+        text = _FORMULA.sub(prerendered, text)
+
+    html = _escape(text)
+    if '$' in html:
+        html = _FORMULA.sub(_mathjax, html)
+    if 'PROBLEMA:' in html or 'FASE ' in html:
+        html = _PHASE.sub(r'<div class="phase">\g<0></div>', html)
+
+    # Il blocco risposta si apre solo se il marcatore compare esattamente una volta
+    parts = html.split(ANSWER_MARKER)
+    if len(parts) == 2:
+        html = parts[0] + ANSWER_OPEN + parts[1] + "</div>"
+
+    if rendered:
+        html = _PLACEHOLDER.sub(lambda m: rendered[int(m.group(1))], html)
+    return html
@@ -0,0 +1,353 @@
+"""
+Export statico dei corpora di esercizi.
+Scrive un sito HTML paginato (indice generale, indici per categoria, pagine di
+esercizi in cui MathJax tipografa solo le formule visibili) e, opzionalmente, i PDF
+delle pagine tramite una coda di QWebEnginePage.printToPdf eseguite in parallelo.
+Funziona anche headless (piattaforma Qt "offscreen"); senza --pdf non serve Qt.
+
+Uso: python static_export.py --export DIR [--pdf] [--page-size N] [--pdf-concurrency N] [--corpus FILE]
+"""
+
+import argparse
+import glob
+import html
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+
+from latex_html import HTML_TEMPLATE, exercise_content_html, format_latex_html
+
+RAW_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app', 'src', 'main', 'res', 'raw')
+
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_PDF_CONCURRENCY = 4
+# Se MathJax non segnala la fine (es. offline) si stampa comunque dopo questo tempo
+PDF_TYPESET_TIMEOUT_MS = 20000
+PDF_READY_TITLE = "mathjax-ready"
+
+# Sito: MathJax parte senza tipografare e processa ogni esercizio quando entra in vista
+LAZY_MATHJAX_HEAD = """    <script>
+    window.MathJax = {
+        startup: {
+            typeset: false,
+            pageReady: function () {
+                return MathJax.startup.defaultPageReady().then(function () {
+                    var observer = new IntersectionObserver(function (entries) {
+                        entries.forEach(function (entry) {
+                            if (!entry.isIntersecting) return;
+                            observer.unobserve(entry.target);
+                            MathJax.typesetPromise([entry.target]);
+                        });
+                    }, { rootMargin: '300px' });
+                    document.querySelectorAll('.lazy-math').forEach(function (el) {
+                        observer.observe(el);
+                    });
+                });
+            }
+        }
+    };
+    </script>
+    <style>
+        a { color: #4fc3f7; }
+        .exercise { margin-bottom: 40px; }
+        .exercise-title { color: #e94560; font-size: 20px; font-weight: bold; }
+        .nav { margin: 15px 0; }
+        .nav a { margin-right: 15px; }
+    </style>"""
+
+# PDF: tipografia completa, il titolo segnala al processo Qt che si puo' stampare
+PRINT_MATHJAX_HEAD = """    <script>
+    window.MathJax = {
+        startup: {
+            pageReady: function () {
+                return MathJax.startup.defaultPageReady().then(function () {
+                    document.title = '%s';
+                });
+            }
+        }
+    };
+    </script>
+    <style>
+        .exercise { page-break-inside: avoid; margin-bottom: 30px; }
+        .exercise-title { color: #e94560; font-size: 20px; font-weight: bold; }
+        .nav { display: none; }
+    </style>""" % PDF_READY_TITLE
+
+
+def slugify(text):
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r'[^a-zA-Z0-9]+', '-', ascii_text).strip('-').lower() or "altro"
+
+
+def unique_name(name, taken):
+    """name, o name-2, name-3... se gia' in taken (che viene aggiornato)"""
+    unique = name
+    suffix = 2
+    while unique in taken:
+        unique = f"{name}-{suffix}"
+        suffix += 1
+    taken.add(unique)
+    return unique
+
+
+def find_corpora(raw_dir=RAW_DIR):
+    """File JSON di res/raw che contengono una lista 'exercises'"""
+    corpora = []
+    for path in sorted(glob.glob(os.path.join(raw_dir, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get('exercises'):
+            corpora.append(path)
+    return corpora
+
+
+def exercise_section(ex, anchor):
+    content = exercise_content_html(
+        format_latex_html(ex.get('testo', 'Nessun testo')),
+        format_latex_html(ex.get('svolgimento', 'Nessuno svolgimento'))
+    )
+    ex_id = html.escape(str(ex.get('id', '?')))
+    subtitle = html.escape(f"{ex.get('categoria', 'Altro')} - {ex.get('sottotipo', '')}")
+    return (f'<section class="exercise lazy-math" id="{html.escape(anchor)}">'
+            f'<div class="exercise-title">{ex_id}</div><div>{subtitle}</div>{content}</section>')
+
+
+def link_list(items):
+    return "<ul>" + "".join(f'<li><a href="{href}">{html.escape(label)}</a></li>' for href, label in items) + "</ul>"
+
+
+def nav_html(page, pages):
+    links = ['<a href="index.html">⬆️ Indice</a>']
+    if page > 1:
+        links.append(f'<a href="page-{page - 1:03d}.html">⬅️ Prec</a>')
+    links.append(f'Pagina {page}/{pages}')
+    if page < pages:
+        links.append(f'<a href="page-{page + 1:03d}.html">➡️ Succ</a>')
+    return f'<div class="nav">{" ".join(links)}</div>'
+
+
+def write_page(path, content, head=LAZY_MATHJAX_HEAD):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(HTML_TEMPLATE.format(head=head, content=content))
+
+
+def export_site(corpora, out_dir, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Scrive il sito statico. Ritorna (pagine scritte, lavori PDF) dove ogni lavoro PDF
+    e' (html di stampa, percorso .pdf).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    pdf_jobs = []
+    corpus_links = []
+    corpus_names = {'pdf'}  # cartella riservata ai PDF
+
+    for corpus_path in corpora:
+        with open(corpus_path, 'r', encoding='utf-8') as f:
+            exercises = json.load(f).get('exercises', [])
+        # Corpora omonimi da cartelle diverse, id ripetuti o categorie con lo stesso slug
+        # non devono sovrascriversi: nomi di file e ancore sono unici nell'export.
+        name = unique_name(os.path.splitext(os.path.basename(corpus_path))[0], corpus_names)
+        anchor_names = set()
+        anchors = [unique_name(str(ex.get('id', '?')), anchor_names) for ex in exercises]
+        corpus_dir = os.path.join(out_dir, name)
+        pdf_dir = os.path.join(out_dir, 'pdf', name)
+        os.makedirs(corpus_dir, exist_ok=True)
+
+        pages = max(1, (len(exercises) + page_size - 1) // page_size)
+        for page in range(1, pages + 1):
+            first = (page - 1) * page_size
+            chunk = exercises[first:first + page_size]
+            sections = "".join(exercise_section(ex, anchors[first + i]) for i, ex in enumerate(chunk))
+            nav = nav_html(page, pages)
+            write_page(os.path.join(corpus_dir, f'page-{page:03d}.html'), nav + sections + nav)
+            pdf_jobs.append((
+                HTML_TEMPLATE.format(head=PRINT_MATHJAX_HEAD, content=sections),
+                os.path.join(pdf_dir, f'page-{page:03d}.pdf')
+            ))
+            written += 1
+
+        categories = {}
+        for index, ex in enumerate(exercises):
+            categories.setdefault(ex.get('categoria', 'Altro'), []).append(index)
+
+        category_links = []
+        category_slugs = set()
+        for category, indices in categories.items():
+            filename = f'cat-{unique_name(slugify(category), category_slugs)}.html'
+            items = [
+                (f"page-{index // page_size + 1:03d}.html#{html.escape(anchors[index])}",
+                 f"{exercises[index].get('id', '?')} - {exercises[index].get('sottotipo', '')}")
+                for index in indices
+            ]
+            write_page(os.path.join(corpus_dir, filename),
+                       f'<div class="nav"><a href="index.html">⬆️ {html.escape(name)}</a></div>'
+                       f'<div class="section-title">{html.escape(category)}</div>' + link_list(items))
+            category_links.append((filename, f"{category} ({len(indices)})"))
+            written += 1
+
+        page_links = [(f'page-{p:03d}.html', f'Pagina {p}') for p in range(1, pages + 1)]
+        write_page(os.path.join(corpus_dir, 'index.html'),
+                   '<div class="nav"><a href="../index.html">⬆️ Corpora</a></div>'
+                   f'<div class="section-title">📚 {html.escape(name)} — {len(exercises)} esercizi</div>'
+                   + link_list(category_links)
+                   + '<div class="section-title">Pagine</div>' + link_list(page_links))
+        written += 1
+        corpus_links.append((f'{name}/index.html', f"{name} ({len(exercises)} esercizi)"))
+
+    write_page(os.path.join(out_dir, 'index.html'),
+               '<div class="section-title">📚 Corpora</div>' + link_list(corpus_links))
+    written += 1
+    return written, pdf_jobs
+
+
+class PdfPipeline:
+    """
+    Coda di stampa PDF su piu' QWebEnginePage: ogni pagina carica il lavoro successivo
+    appena ha finito il precedente, cosi' caricamento, tipografia e stampa si sovrappongono.
+    """
+
+    def __init__(self, jobs, concurrency=DEFAULT_PDF_CONCURRENCY, timeout_ms=PDF_TYPESET_TIMEOUT_MS):
+        from PyQt5.QtCore import QMarginsF, QTimer
+        from PyQt5.QtGui import QPageLayout, QPageSize
+
+        self.jobs = list(reversed(jobs))
+        self.concurrency = max(1, min(concurrency, len(jobs)))
+        self.timeout_ms = timeout_ms
+        self.layout = QPageLayout(QPageSize(QPageSize.A4), QPageLayout.Portrait, QMarginsF(10, 10, 10, 10))
+        self.QTimer = QTimer
+        self.pages = []
+        self.active = 0
+        self.printed = 0
+        self.failed = []
+        self.loop = None
+
+    def run(self):
+        """Esegue tutti i lavori e ritorna (stampati, falliti)"""
+        from PyQt5.QtCore import QEventLoop
+        from PyQt5.QtWebEngineWidgets import QWebEnginePage
+
+        if not self.jobs:
+            return 0, []
+        self.loop = QEventLoop()
+        for _ in range(self.concurrency):
+            page = QWebEnginePage()
+            state = {"page": page, "job": None, "loaded": False, "ready": False, "timer": None}
+            page.loadFinished.connect(lambda ok, s=state: self._on_loaded(s, ok))
+            page.titleChanged.connect(lambda title, s=state: self._on_title(s, title))
+            page.pdfPrintingFinished.connect(lambda path, ok, s=state: self._on_printed(s, path, ok))
+            self.pages.append(state)
+            self.active += 1
+            self._next(state)
+        self.loop.exec_()
+        return self.printed, self.failed
+
+    def _next(self, state):
+        from PyQt5.QtCore import QUrl
+
+        if not self.jobs:
+            state["job"] = None
+            self.active -= 1
+            if self.active == 0:
+                self.loop.quit()
+            return
+        html_text, pdf_path = state["job"] = self.jobs.pop()
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        state["loaded"] = state["ready"] = False
+        state["page"].setHtml(html_text, QUrl.fromLocalFile(os.path.dirname(pdf_path) + os.sep))
+
+    def _on_loaded(self, state, ok):
+        if state["job"] is None:
+            return
+        if not ok:
+            self.failed.append(state["job"][1])
+            self._next(state)
+            return
+        state["loaded"] = True
+        if state["ready"]:
+            self._print(state)
+        else:
+            timer = self.QTimer()
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda s=state, job=state["job"]: s["job"] is job and self._print(s))
+            timer.start(self.timeout_ms)
+            state["timer"] = timer
+
+    def _on_title(self, state, title):
+        if title != PDF_READY_TITLE or state["job"] is None:
+            return
+        state["ready"] = True
+        if state["loaded"]:
+            self._print(state)
+
+    def _print(self, state):
+        if state["timer"] is not None:
+            state["timer"].stop()
+            state["timer"] = None
+        if state.get("printing") is state["job"]:
+            return
+        state["printing"] = state["job"]
+        state["page"].printToPdf(state["job"][1], self.layout)
+
+    def _on_printed(self, state, path, ok):
+        if ok:
+            self.printed += 1
+        else:
+            self.failed.append(path)
+        self._next(state)
+
+
+def run_export(out_dir, corpora=None, page_size=DEFAULT_PAGE_SIZE, pdf=False,
+               pdf_concurrency=DEFAULT_PDF_CONCURRENCY):
+    """Export completo con statistiche di throughput; ritorna il codice di uscita"""
+    corpora = corpora or find_corpora()
+    start = time.perf_counter()
+    written, pdf_jobs = export_site(corpora, out_dir, page_size)
+    elapsed = time.perf_counter() - start
+    print(f"✅ HTML: {written} pagine da {len(corpora)} corpora in {elapsed:.2f}s "
+          f"({written / max(elapsed, 1e-9):.1f} pagine/s) → {out_dir}")
+
+    if not pdf:
+        return 0
+
+    # Headless: nessuna finestra, basta la piattaforma offscreen
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWebEngineWidgets import QWebEnginePage  # noqa: F401 (va importato prima della QApplication)
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    start = time.perf_counter()
+    printed, failed = PdfPipeline(pdf_jobs, pdf_concurrency).run()
+    elapsed = time.perf_counter() - start
+    print(f"✅ PDF: {printed}/{len(pdf_jobs)} pagine in {elapsed:.1f}s "
+          f"({printed / max(elapsed, 1e-9):.2f} pagine/s, {pdf_concurrency} in parallelo)")
+    for path in failed:
+        print(f"❌ PDF non generato: {path}")
+    del app
+    return 1 if failed else 0
+
+
+def add_export_arguments(parser):
+    parser.add_argument('--export', metavar='DIR', help="Esporta un sito HTML statico in DIR ed esce")
+    parser.add_argument('--pdf', action='store_true', help="Con --export: stampa anche una PDF per pagina")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help="Esercizi per pagina")
+    parser.add_argument('--pdf-concurrency', type=int, default=DEFAULT_PDF_CONCURRENCY,
+                        help="Pagine stampate in parallelo")
+    parser.add_argument('--corpus', action='append', default=[],
+                        help="JSON da esportare (ripetibile, default: tutti quelli di res/raw)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export statico dei corpora di esercizi")
+    add_export_arguments(parser)
+    args = parser.parse_args(argv)
+    if not args.export:
+        parser.error("--export DIR obbligatorio")
+    return run_export(args.export, args.corpus, args.page_size, args.pdf, args.pdf_concurrency)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Shared LaTeX segmentation and on-disk render store for the AI Helper WearOS tools."""
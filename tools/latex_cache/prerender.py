@@ -0,0 +1,147 @@
+"""
+AI Helper WearOS - Batch LaTeX Prerender
+Extracts every formula from the res/raw exercise corpora and chat exports, dedupes
+them by normalized form and renders them in a process pool into the shared
+render store read by chat_analyzer and exercise_viewer.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
+
+from latex_cache.segments import iter_formulas, render_payload, strip_delimiters  # noqa: E402
+from latex_cache.store import DEFAULT_ROOT, RenderStore, fetch_png, payload_key  # noqa: E402
+
+RAW_DIR = os.path.join(TOOLS_DIR, "..", "app", "src", "main", "res", "raw")
+DEFAULT_EXPORT = os.path.join(TOOLS_DIR, "chat_analyzer", "chat_export.json")
+CORPUS_FIELDS = ("testo", "svolgimento")
+
+
+def iter_corpus_texts(raw_dir):
+    """Yield (source, text) for testo/svolgimento of every exercise corpus."""
+    for path in sorted(glob.glob(os.path.join(raw_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            continue
+        name = os.path.basename(path)
+        for ex in data.get("exercises", []):
+            for field in CORPUS_FIELDS:
+                text = ex.get(field)
+                if text:
+                    yield f"{name}:{ex.get('id', '?')}:{field}", text
+
+
+def iter_export_texts(paths):
+    """Yield (source, text) for every message of the given chat exports."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        name = os.path.basename(path)
+        for msg in data.get("messages", []):
+            content = msg.get("content")
+            if content:
+                yield f"{name}:{msg.get('id', '?')}", content
+
+
+def collect_payloads(texts):
+    """Dedupe formulas by renderer payload. Returns {payload: (occurrences, first_source)}."""
+    payloads = {}
+    for source, text in texts:
+        for formula in iter_formulas(text):
+            latex, is_display = strip_delimiters(formula)
+            if not latex:
+                continue
+            payload = render_payload(latex, is_display)
+            count, first = payloads.get(payload, (0, source))
+            payloads[payload] = (count + 1, first)
+    return payloads
+
+
+_worker_store = None
+
+
+def _init_worker(root):
+    global _worker_store
+    _worker_store = RenderStore(root)
+
+
+def _render_one(payload):
+    start = time.perf_counter()
+    try:
+        data = fetch_png(payload)
+        _worker_store.put_key(payload_key(payload), data)
+        return payload, True, len(data), time.perf_counter() - start, None
+    except Exception as e:
+        return payload, False, 0, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prerender every corpus/export formula into the render store.")
+    parser.add_argument("--raw-dir", default=RAW_DIR, help="directory containing the res/raw corpora")
+    parser.add_argument("--export", action="append", default=[],
+                        help="chat export JSON to extract formulas from (repeatable)")
+    parser.add_argument("--store", default=DEFAULT_ROOT, help="render store directory")
+    parser.add_argument("--workers", type=int, default=8, help="render processes")
+    parser.add_argument("--force", action="store_true", help="re-render formulas already in the store")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be rendered")
+    parser.add_argument("--failures", help="write failed formulas to this JSON file")
+    args = parser.parse_args(argv)
+
+    exports = args.export or ([DEFAULT_EXPORT] if os.path.exists(DEFAULT_EXPORT) else [])
+
+    start = time.perf_counter()
+    texts = list(iter_corpus_texts(args.raw_dir)) + list(iter_export_texts(exports))
+    payloads = collect_payloads(texts)
+    store = RenderStore(args.store)
+    pending = [p for p in payloads if args.force or not store.contains_key(payload_key(p))]
+    occurrences = sum(count for count, _ in payloads.values())
+    print(f"📐 {occurrences} formulas in {len(texts)} texts → {len(payloads)} unique, "
+          f"{len(payloads) - len(pending)} already stored, {len(pending)} to render "
+          f"({time.perf_counter() - start:.2f}s extract)")
+
+    if args.dry_run or not pending:
+        return 0
+
+    failures = []
+    rendered_bytes = 0
+    render_start = time.perf_counter()
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(args.store,)) as pool:
+        for done, (payload, ok, size, elapsed, error) in enumerate(
+                pool.imap_unordered(_render_one, pending), start=1):
+            if ok:
+                rendered_bytes += size
+            else:
+                failures.append({"payload": payload, "source": payloads[payload][1], "error": error})
+            if done % 50 == 0 or done == len(pending):
+                rate = done / max(time.perf_counter() - render_start, 1e-9)
+                print(f"  {done}/{len(pending)}  {rate:.1f} formulas/s  {len(failures)} failed", flush=True)
+
+    wall = time.perf_counter() - render_start
+    ok_count = len(pending) - len(failures)
+    print(f"✓ Rendered {ok_count} formulas in {wall:.1f}s "
+          f"({ok_count / max(wall, 1e-9):.1f} formulas/s, {rendered_bytes / 1024 / max(wall, 1e-9):.1f} KB/s) "
+          f"into {args.store}")
+
+    if failures:
+        print(f"✗ {len(failures)} formulas failed to render:")
+        for failure in failures[:20]:
+            print(f"  [{failure['source']}] {failure['payload'][:60]!r}: {failure['error']}")
+        if len(failures) > 20:
+            print(f"  ... and {len(failures) - 20} more")
+        if args.failures:
+            with open(args.failures, "w", encoding="utf-8") as f:
+                json.dump(failures, f, indent=2, ensure_ascii=False)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
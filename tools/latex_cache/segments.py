@@ -0,0 +1,109 @@
+"""
+LaTeX segmentation shared by chat_analyzer and the batch prerenderer.
+Keeps the exact splitting rules of ChatAnalyzer.insert_with_latex so that the
+formulas extracted offline are the same ones the viewer asks for at view time.
+"""
+
+import re
+
+# Pattern for LaTeX:
+# - $$...$$ (display)
+# - $...$ (inline, also multiline when model wraps badly)
+# - \[...\], \(...\)
+# - \begin{...}...\end{...}
+#
+# IMPORTANT: keep $$...$$ before $...$ to avoid partial captures.
+LATEX_PATTERN = (
+    r'(\\begin\{[^}]+\}[\s\S]*?\\end\{[^}]+\}'
+    r'|\\\[[\s\S]*?\\\]'
+    r'|\\\([\s\S]*?\\\)'
+    r'|\$\$[\s\S]*?\$\$'
+    # Inline math must not start/end on a '$' that belongs to '$$...$$'
+    # Multiline inline is allowed because model outputs can wrap badly.
+    # Lookarounds prevent grabbing delimiters that belong to $$...$$ blocks.
+    r'|(?<![\\$])\$(?!\$)[\s\S]*?(?<![\\$])\$(?!\$))'
+)
+LATEX_REGEX = re.compile(LATEX_PATTERN, re.DOTALL)
+
+TEXT = "text"
+LATEX = "latex"
+SALVAGED = "salvaged"
+
+
+def iter_segments(content):
+    """
+    Split message content into (kind, text) pairs.
+    kind is TEXT for plain text, LATEX for a delimited formula and SALVAGED for a
+    `$...$` formula recovered from malformed plain text (already re-wrapped in `$`).
+    """
+    for part in LATEX_REGEX.split(content):
+        if not part:
+            continue
+        if LATEX_REGEX.fullmatch(part):
+            yield LATEX, part
+        else:
+            yield from _salvage_dollars(part)
+
+
+def _salvage_dollars(text_part):
+    """Second-pass salvage for malformed $...$ segments left in plain text."""
+    if "$" not in text_part:
+        yield TEXT, text_part
+        return
+
+    chunks = text_part.split("$")
+    if len(chunks) < 3:
+        yield TEXT, text_part
+        return
+
+    for idx, chunk in enumerate(chunks):
+        if idx % 2 == 0:
+            if chunk:
+                yield TEXT, chunk
+        else:
+            candidate = chunk.strip()
+            if candidate:
+                yield SALVAGED, f"${candidate}$"
+
+
+def iter_formulas(content):
+    """Yield only the formula segments (delimiters included) of a text."""
+    for kind, part in iter_segments(content):
+        if kind != TEXT:
+            yield part
+
+
+def strip_delimiters(latex_str):
+    """
+    Remove math delimiters. Returns (clean_latex, is_display); clean_latex is empty
+    when there is nothing to render.
+    """
+    clean_latex = latex_str.strip()
+
+    # Determine if it's display mode or inline
+    is_display = clean_latex.startswith('$$') or clean_latex.startswith('\\[')
+
+    if clean_latex.startswith('$$') and clean_latex.endswith('$$'):
+        clean_latex = clean_latex[2:-2]
+    elif clean_latex.startswith('$') and clean_latex.endswith('$'):
+        clean_latex = clean_latex[1:-1]
+    elif clean_latex.startswith('\\[') and clean_latex.endswith('\\]'):
+        clean_latex = clean_latex[2:-2]
+    elif clean_latex.startswith('\\(') and clean_latex.endswith('\\)'):
+        clean_latex = clean_latex[2:-2]
+
+    clean_latex = clean_latex.strip()
+    # Heuristic repair: if a multiline display-looking block is wrapped in single '$',
+    # promote it to display mode handling to avoid raw/glitched output.
+    if clean_latex.startswith('$') and clean_latex.endswith('$') and '\n' in clean_latex:
+        clean_latex = clean_latex[1:-1].strip()
+        is_display = True
+
+    return clean_latex, is_display
+
+
+def render_payload(latex, is_display):
+    """Normalized renderer input: whitespace collapsed, display formulas enlarged."""
+    size_command = "\\large " if is_display else ""
+    normalized = " ".join(latex.strip().split())
+    return f"{size_command}{normalized}".strip()
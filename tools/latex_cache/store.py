@@ -0,0 +1,84 @@
+"""
+Content-addressed PNG store for rendered formulas.
+Files are keyed by the SHA-256 of the normalized renderer payload, so the batch
+prerenderer and both viewers agree on where a formula lives without an index.
+"""
+
+import hashlib
+import os
+
+from perf_trace import trace
+
+from .segments import render_payload
+
+DEFAULT_ROOT = os.environ.get(
+    "AIHELPER_RENDER_STORE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "store"),
+)
+UPMATH_PNG_URL = "https://i.upmath.me/png/{}"
+USER_AGENT = "AIHelperChatAnalyzer/1.0"
+
+
+def payload_key(payload):
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def fetch_png(payload, timeout=12):
+    """Render a payload via the upmath PNG endpoint and return the PNG bytes."""
+    # urllib.request pulls in http.client/ssl/email: only pay for it on the first fetch.
+    import urllib.parse
+    import urllib.request
+
+    encoded = urllib.parse.quote(payload, safe="")
+    request = urllib.request.Request(
+        UPMATH_PNG_URL.format(encoded),
+        headers={"User-Agent": USER_AGENT}
+    )
+    trace.count("net.fetch")
+    with trace.span("urlopen"), urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+class RenderStore:
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def path_for_key(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def path_for(self, latex, is_display):
+        return self.path_for_key(payload_key(render_payload(latex, is_display)))
+
+    def get(self, latex, is_display):
+        """Return the stored PNG bytes for a formula, or None on a miss."""
+        try:
+            with open(self.path_for(latex, is_display), "rb") as f:
+                data = f.read()
+        except OSError:
+            trace.count("store.miss")
+            return None
+        trace.count("store.hit")
+        return data
+
+    def contains_key(self, key):
+        return os.path.exists(self.path_for_key(key))
+
+    def put_key(self, key, data):
+        """Atomically write PNG bytes; concurrent writers of the same key are harmless."""
+        import tempfile
+
+        path = self.path_for_key(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def put(self, latex, is_display, data):
+        return self.put_key(payload_key(render_payload(latex, is_display)), data)
@@ -0,0 +1 @@
+"""Opt-in span timers and counters shared by the AI Helper WearOS tools."""
@@ -0,0 +1,174 @@
+"""
+Lightweight hot-path instrumentation.
+Spans and counters are recorded only when tracing is enabled (AIHELPER_TRACE or a
+tool's --trace flag); disabled, span() hands back a shared no-op context manager,
+so an instrumented call costs one global lookup and a function call.
+Recorded runs export to Chrome-trace JSON (chrome://tracing, ui.perfetto.dev).
+"""
+
+import atexit
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+ENV_VAR = "AIHELPER_TRACE"
+# Events kept in memory; the oldest are dropped on very long sessions.
+MAX_EVENTS = 200_000
+
+_enabled = False
+_output_path = None
+_lock = threading.Lock()
+_events = collections.deque(maxlen=MAX_EVENTS)
+_stats = {}     # span name -> [count, total_ns, last_ns, max_ns]
+_counters = {}  # counter name -> value
+_origin_ns = time.perf_counter_ns()
+_pid = os.getpid()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        add_span(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+def enabled():
+    return _enabled
+
+
+def enable(output_path=None):
+    """Start recording; with output_path the trace is written there at exit."""
+    global _enabled, _output_path
+    _enabled = True
+    if output_path and _output_path is None:
+        atexit.register(lambda: export_chrome_trace(output_path))
+    _output_path = output_path or _output_path
+
+
+def configure(flag_value=None):
+    """
+    Enable tracing from a tool's --trace value or the AIHELPER_TRACE variable.
+    "1" only records (overlay); any other value is also the export path.
+    """
+    value = flag_value or os.environ.get(ENV_VAR)
+    if not value:
+        return False
+    enable(None if value == "1" else value)
+    return True
+
+
+def output_path():
+    return _output_path
+
+
+def now():
+    return time.perf_counter_ns()
+
+
+def span(name, **args):
+    """Context manager timing a block: `with trace.span("json.load"): ...`"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def add_span(name, start_ns, end_ns, args=None):
+    """Record a span measured by hand (e.g. from a request to its async callback)."""
+    if not _enabled:
+        return
+    duration = end_ns - start_ns
+    event = {
+        "name": name, "ph": "X", "pid": _pid, "tid": threading.get_ident(),
+        "ts": (start_ns - _origin_ns) / 1000, "dur": duration / 1000,
+    }
+    if args:
+        event["args"] = args
+    with _lock:
+        _events.append(event)
+        stats = _stats.get(name)
+        if stats is None:
+            _stats[name] = [1, duration, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = duration
+            stats[3] = max(stats[3], duration)
+
+
+def count(name, n=1):
+    """Increment a counter; every change is also a counter event in the trace."""
+    if not _enabled:
+        return
+    with _lock:
+        value = _counters[name] = _counters.get(name, 0) + n
+        _events.append({
+            "name": name, "ph": "C", "pid": _pid, "tid": threading.get_ident(),
+            "ts": (time.perf_counter_ns() - _origin_ns) / 1000, "args": {"value": value},
+        })
+
+
+def snapshot():
+    """({name: (count, total_ms, last_ms, max_ms)}, {counter: value}) for overlays."""
+    with _lock:
+        spans = {
+            name: (c, total / 1e6, last / 1e6, peak / 1e6)
+            for name, (c, total, last, peak) in _stats.items()
+        }
+        return spans, dict(_counters)
+
+
+def summary_lines(limit=12):
+    """Text rows for an overlay: slowest spans (by last duration) first, then counters."""
+    spans, counters = snapshot()
+    rows = sorted(spans.items(), key=lambda item: -item[1][2])[:limit]
+    lines = [
+        f"{name:<20.20} {last:8.2f}ms  avg {total / c:7.2f}  max {peak:8.2f}  n={c}"
+        for name, (c, total, last, peak) in rows
+    ]
+    lines.extend(f"{name:<20.20} {value}" for name, value in sorted(counters.items()))
+    return lines
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _stats.clear()
+        _counters.clear()
+
+
+def export_chrome_trace(path):
+    """Write the recorded events as Chrome-trace JSON and return the path."""
+    with _lock:
+        events = list(_events)
+    events.append({
+        "name": "process_name", "ph": "M", "pid": _pid,
+        "args": {"name": os.path.basename(sys.argv[0]) or "python"},
+    })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path